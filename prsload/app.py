@@ -1,13 +1,19 @@
 import logging
+from contextlib import suppress
 
 from flask import Flask
 from flask import render_template
 
+from prsload import duckdb_client
+from prsload.commands import register_commands
 from prsload.exceptions import PRAnalyticsError
+from prsload.exceptions import SettingsError
 from prsload.extensions import register_template_filters
 from prsload.routes.data_fetcher import data_fetcher_bp
 from prsload.routes.home import home_bp
+from prsload.routes.metrics import metrics_bp
 from prsload.routes.top_reviewers import analytics_bp
+from prsload.settings import get_settings
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -24,10 +30,21 @@ def create_app():
     app.register_blueprint(home_bp)
     app.register_blueprint(analytics_bp)
     app.register_blueprint(data_fetcher_bp)
+    app.register_blueprint(metrics_bp)
 
     # Register template filters
     register_template_filters(app)
 
+    # Register CLI commands
+    register_commands(app)
+
+    @app.before_request
+    def apply_filtering_policy():
+        """A changed config.yml applies its ignore lists and vacations in the background, without a resync."""
+        # Without settings, the pages explain what is missing
+        with suppress(SettingsError):
+            duckdb_client.apply_filtering_policy_in_background(get_settings())
+
     # Register error handlers
     @app.errorhandler(PRAnalyticsError)
     def handle_analytics_error(error):
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+
+import duckdb
+
+from prsload import duckdb_client
+from prsload.cache import get_response_cache
+from prsload.fake_github.org import generate_repo_prs
+from prsload.fake_github.org import generate_users
+from prsload.fake_github.org import pr_node
+from prsload.github.prs import PRS_PER_PAGE
+from prsload.github.prs import _process_one_page_of_prs
+from prsload.github.repos import Repo
+from prsload.pr_type import PRBatch
+from prsload.routes.top_reviewers import _get_speed_stats
+from prsload.routes.top_reviewers import _get_workload_stats
+from prsload.settings import Settings
+from prsload.settings import get_settings
+from prsload.sync.cleaner import PRCleaner
+
+if TYPE_CHECKING:
+    from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_ORG = "benchmark-org"
+# A stage is a regression when its throughput drops or its p95 grows by more than the tolerance,
+# p95 differences below the noise floor are ignored
+DEFAULT_TOLERANCE = 0.25
+_NOISE_FLOOR_MS = 1.0
+
+
+@dataclass(frozen=True)
+class BenchmarkProfile:
+    """Size of the synthetic org. Every PR gets 0 to `max_reviews_per_pr` review requests, half of that on average."""
+
+    repos: int
+    prs_per_repo: int
+    max_reviews_per_pr: int
+    users: int
+
+
+PROFILES = {
+    # ~10k review rows, a few seconds
+    "small": BenchmarkProfile(repos=10, prs_per_repo=500, max_reviews_per_pr=4, users=30),
+    # ~200k review rows
+    "medium": BenchmarkProfile(repos=100, prs_per_repo=1000, max_reviews_per_pr=4, users=200),
+    # ~5M review rows, takes a while
+    "large": BenchmarkProfile(repos=1000, prs_per_repo=1700, max_reviews_per_pr=6, users=1000),
+}
+
+
+@dataclass
+class StageResult:
+    """Timings of one stage: every sample handled `items` of `unit`, e.g. a page of 100 PRs."""
+
+    unit: str
+    items: int = 0
+    samples_seconds: list[float] = field(default_factory=list)
+
+    def measure[T](self, run: Callable[..., T], *args: Any, items: int = 1) -> T:
+        started = time.perf_counter()
+        value = run(*args)
+        self.samples_seconds.append(time.perf_counter() - started)
+        self.items += items
+        return value
+
+    def as_dict(self) -> dict[str, Any]:
+        seconds = sum(self.samples_seconds)
+        return {
+            "unit": self.unit,
+            "items": self.items,
+            "samples": len(self.samples_seconds),
+            "seconds": round(seconds, 4),
+            "throughput_per_second": round(self.items / seconds, 1) if seconds else None,
+            "p50_ms": round(_percentile(self.samples_seconds, 50) * 1000, 3),
+            "p95_ms": round(_percentile(self.samples_seconds, 95) * 1000, 3),
+        }
+
+
+@dataclass
+class Regression:
+    stage: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        return f"{self.stage} {self.metric}: {self.baseline} -> {self.current}"
+
+
+def run_benchmark(app: "Flask", profile_name: str, seed: int = 1, repeat: int = 20) -> dict[str, Any]:
+    """Time parsing, cleaning and storing the PRs of a synthetic org, then the analytics and page renders on them.
+
+    Runs on a temporary database, the app's own database is never touched, and without GitHub:
+    the PR pages are generated as GitHub would return them. Analytics and renders run `repeat` times.
+    Returns the results as a dict that can be stored as JSON, e.g. as a baseline."""
+    profile = PROFILES[profile_name]
+    settings = get_settings()
+    stages: dict[str, StageResult] = {
+        "parse": StageResult(unit="prs"),
+        "clean": StageResult(unit="prs"),
+        "ingest": StageResult(unit="prs"),
+        "refresh_stats": StageResult(unit="refreshes"),
+        "reviewer_stats": StageResult(unit="queries"),
+        "reviewer_stats_filtered": StageResult(unit="queries"),
+        "workload_stats": StageResult(unit="calls"),
+        "speed_stats": StageResult(unit="calls"),
+        "pr_stats": StageResult(unit="queries"),
+        "render_top_reviewers": StageResult(unit="pages"),
+        "render_top_reviewers_cached": StageResult(unit="pages"),
+        "render_db_view": StageResult(unit="pages"),
+    }
+    logger.warning(f"Benchmarking profile {profile_name} {profile} {seed=} {repeat=}")
+
+    with tempfile.TemporaryDirectory(prefix="prsload-benchmark-") as directory:
+        db_file_path = os.path.join(directory, "benchmark.duckdb")
+        # Cached pages and stats are keyed by data generation, which the benchmark database counts on its own
+        get_response_cache().clear()
+        with duckdb_client.using_database(db_file_path):
+            now = datetime.now(tz=UTC).replace(microsecond=0)
+            users = generate_users(profile.users)
+            for repo_index in range(profile.repos):
+                # One repo at a time, so even the large profile doesn't have to fit in memory
+                fake_prs = generate_repo_prs(
+                    seed=seed,
+                    repo_index=repo_index,
+                    num_of_prs=profile.prs_per_repo,
+                    users=users,
+                    max_reviews_per_pr=profile.max_reviews_per_pr,
+                    days=settings.NUM_OF_DAYS,
+                    now=now,
+                )
+                repo = Repo(owner=BENCHMARK_ORG, name=f"repo{repo_index}", total_prs=len(fake_prs))
+                for start in range(0, len(fake_prs), PRS_PER_PAGE):
+                    raw_prs = [
+                        pr_node(pr, BENCHMARK_ORG, PRS_PER_PAGE) for pr in fake_prs[start : start + PRS_PER_PAGE]
+                    ]
+                    prs = stages["parse"].measure(_parse_page, raw_prs, repo, items=len(raw_prs))
+                    cleaned_prs = stages["clean"].measure(_clean, prs, settings, items=len(prs))
+                    stages["ingest"].measure(duckdb_client.store_prs, cleaned_prs, items=len(cleaned_prs))
+
+            for _ in range(3):
+                stages["refresh_stats"].measure(duckdb_client.refresh_stats, True)
+            row_counts = duckdb_client.duckdb_health_check().row_counts
+
+            thresholds = settings.REVIEW_TIME_THRESHOLDS_MINUTES
+            # The last week in half of the repos, summed up from the daily rollups
+            review_filter = duckdb_client.ReviewFilter(
+                since=(now - timedelta(days=7)).date(),
+                until=now.date(),
+                repos=tuple(f"{BENCHMARK_ORG}/repo{index}" for index in range(0, profile.repos, 2)),
+            )
+            client = app.test_client()
+            # Untimed, so compiling the templates doesn't count as the first render
+            for path in ("/top_reviewers", "/db_view"):
+                _get_page(client, path)
+            for _ in range(repeat):
+                reviewer_stats = stages["reviewer_stats"].measure(duckdb_client.get_reviewer_stats, thresholds)
+                stages["reviewer_stats_filtered"].measure(duckdb_client.get_reviewer_stats, thresholds, review_filter)
+                stages["workload_stats"].measure(_get_workload_stats, reviewer_stats)
+                stages["speed_stats"].measure(_get_speed_stats, reviewer_stats)
+                stages["pr_stats"].measure(duckdb_client.get_pr_stats)
+
+                get_response_cache().clear()
+                stages["render_top_reviewers"].measure(_get_page, client, "/top_reviewers")
+                stages["render_top_reviewers_cached"].measure(_get_page, client, "/top_reviewers")
+                get_response_cache().clear()
+                stages["render_db_view"].measure(_get_page, client, "/db_view")
+        get_response_cache().clear()
+
+    return {
+        "profile": profile_name,
+        "parameters": {
+            "repos": profile.repos,
+            "prs_per_repo": profile.prs_per_repo,
+            "max_reviews_per_pr": profile.max_reviews_per_pr,
+            "users": profile.users,
+            "seed": seed,
+            "repeat": repeat,
+            "num_of_days": settings.NUM_OF_DAYS,
+        },
+        "dataset": row_counts,
+        "environment": {
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "duckdb_threads": settings.DUCKDB_THREADS,
+            "duckdb_memory_limit": settings.DUCKDB_MEMORY_LIMIT,
+        },
+        "started_at": now.isoformat(),
+        "stages": {name: stage.as_dict() for name, stage in stages.items()},
+    }
+
+
+def compare_with_baseline(
+    result: dict[str, Any], baseline: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE
+) -> list[Regression]:
+    """Stages of `result` that got slower than in the `baseline` run of the same profile."""
+    regressions: list[Regression] = []
+    for name, stage in result["stages"].items():
+        baseline_stage = baseline["stages"].get(name)
+        if not baseline_stage:
+            continue
+
+        baseline_throughput = baseline_stage["throughput_per_second"]
+        throughput = stage["throughput_per_second"]
+        if baseline_throughput and throughput and throughput < baseline_throughput * (1 - tolerance):
+            regressions.append(Regression(name, "throughput_per_second", baseline_throughput, throughput))
+
+        baseline_p95, p95 = baseline_stage["p95_ms"], stage["p95_ms"]
+        if p95 > baseline_p95 * (1 + tolerance) and p95 - baseline_p95 > _NOISE_FLOOR_MS:
+            regressions.append(Regression(name, "p95_ms", baseline_p95, p95))
+    return regressions
+
+
+def load_baselines(path: str) -> dict[str, dict[str, Any]]:
+    """Baseline results by profile."""
+    baseline_path = Path(path)
+    if not baseline_path.exists():
+        return {}
+    return json.loads(baseline_path.read_text(encoding="utf-8"))
+
+
+def save_baseline(path: str, result: dict[str, Any]) -> None:
+    """Store `result` as the baseline of its profile, baselines of the other profiles stay."""
+    baselines = load_baselines(path)
+    baselines[result["profile"]] = result
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def format_result(result: dict[str, Any], baseline: dict[str, Any] | None = None) -> str:
+    """A table of the stages, with the throughput change against the baseline when there is one."""
+    lines = [f"{'stage':<28} {'items':>10} {'per second':>12} {'p50 ms':>10} {'p95 ms':>10} {'vs baseline':>12}"]
+    for name, stage in result["stages"].items():
+        change = ""
+        baseline_stage = (baseline or {}).get("stages", {}).get(name)
+        if baseline_stage and baseline_stage["throughput_per_second"] and stage["throughput_per_second"]:
+            ratio = stage["throughput_per_second"] / baseline_stage["throughput_per_second"]
+            change = f"{(ratio - 1) * 100:+.0f}%"
+        lines.append(
+            f"{name:<28} {stage['items']:>10} {stage['throughput_per_second'] or 0:>12.1f} "
+            f"{stage['p50_ms']:>10.3f} {stage['p95_ms']:>10.3f} {change:>12}"
+        )
+    return "\n".join(lines)
+
+
+def _parse_page(raw_prs: list[dict], repo: Repo) -> PRBatch:
+    return _process_one_page_of_prs(raw_prs, repo)
+
+
+def _clean(prs: PRBatch, settings: Settings) -> PRBatch:
+    return PRCleaner.clean_batch(prs, settings)
+
+
+def _get_page(client, path: str) -> None:
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} answered {response.status_code}")
+
+
+def _percentile(samples: list[float], percentile: int) -> float:
+    """Nearest-rank percentile, 0 without samples."""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percentile - 1]
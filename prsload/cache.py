@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Hashable
+from dataclasses import dataclass
+from datetime import datetime
+from functools import wraps
+from typing import Any
+
+import duckdb
+from flask import Response
+from flask import make_response
+from flask import request
+from werkzeug.http import is_resource_modified
+
+from prsload import duckdb_client
+from prsload import metrics
+from prsload.exceptions import SettingsError
+from prsload.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A least recently used cache, shared by all requests. With `max_entries=0` nothing is cached."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value, or None."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_entries: int) -> None:
+        """Change `max_entries`, the least recently used entries that don't fit anymore are dropped."""
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+
+_response_cache: LRUCache | None = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LRUCache:
+    """The cache of pages and stats, resized when `cache.max_entries` changes in config.yml."""
+    global _response_cache  # noqa: PLW0603
+    max_entries = get_settings().CACHE_MAX_ENTRIES
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LRUCache(max_entries=max_entries)
+        elif _response_cache.max_entries != max_entries:
+            logger.info(f"Resizing the response cache from {_response_cache.max_entries} to {max_entries} entries")
+            _response_cache.resize(max_entries)
+        return _response_cache
+
+
+def _read_response_cache(read: Callable[[LRUCache], float]) -> float:
+    """For the metrics, 0 until a page created the cache, so scraping never needs the settings."""
+    if _response_cache is None:
+        return 0
+    return read(_response_cache)
+
+
+CACHE_HITS = metrics.Counter(
+    "prsload_cache_hits_total",
+    "Pages and stats served from the cache.",
+    function=lambda: _read_response_cache(lambda response_cache: response_cache.hits),
+)
+CACHE_MISSES = metrics.Counter(
+    "prsload_cache_misses_total",
+    "Pages and stats not in the cache.",
+    function=lambda: _read_response_cache(lambda response_cache: response_cache.misses),
+)
+CACHE_ENTRIES = metrics.Gauge(
+    "prsload_cache_entries", "Pages and stats in the cache.", function=lambda: _read_response_cache(len)
+)
+
+
+def cached_by_data_generation[T](
+    key: Hashable,
+    compute: Callable[[], T],
+    cache_if: Callable[[T], bool] | None = None,
+) -> T:
+    """Compute the value once per data generation, e.g. the stats a page is rendered from.
+
+    Values that fail `cache_if` are returned, but not cached."""
+    try:
+        generation = duckdb_client.get_data_generation()
+    except duckdb.Error as exc:
+        logger.warning(f"Could not read the data generation, not caching {key}: {exc}")
+        return compute()
+
+    response_cache = get_response_cache()
+    cache_key = ("data", key, generation.generation)
+    value = response_cache.get(cache_key)
+    if value is None:
+        value = compute()
+        if cache_if is None or cache_if(value):
+            response_cache.put(cache_key, value)
+    return value
+
+
+@dataclass(frozen=True)
+class _CachedPage:
+    body: bytes
+    content_type: str | None
+
+
+def cached_page(*settings_fields: str, extra_key: Callable[[], Hashable] | None = None) -> Callable:
+    """Cache the rendered page until the data generation changes, and let clients revalidate it.
+
+    The page is keyed by its URL with the query string, the data generation,
+    the values of the `settings_fields` it depends on and `extra_key()`, for
+    anything else it shows. Responses carry an ETag of that key and the time
+    the data changed as Last-Modified, so revalidations are answered with
+    304 without rendering anything."""
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                generation = duckdb_client.get_data_generation()
+                settings = get_settings()
+            except (duckdb.Error, SettingsError) as exc:
+                # The view reports what is wrong, e.g. the home page explains missing settings
+                logger.warning(f"Could not read the data generation or settings, not caching {request.path}: {exc}")
+                return view(*args, **kwargs)
+
+            settings_values = repr([getattr(settings, field) for field in settings_fields])
+            extra = repr(extra_key()) if extra_key else ""
+            key = ("page", request.full_path, generation.generation, settings_values, extra)
+            etag = hashlib.sha1(repr(key).encode(), usedforsecurity=False).hexdigest()
+            # What `extra_key` covers changes without a modification time, only the ETag can tell
+            last_modified = None if extra_key else generation.changed_at
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                return _with_validators(Response(status=304), etag, last_modified)
+
+            response_cache = get_response_cache()
+            page: _CachedPage | None = response_cache.get(key)
+            if page is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                page = _CachedPage(body=response.get_data(), content_type=response.content_type)
+                response_cache.put(key, page)
+
+            return _with_validators(Response(page.body, content_type=page.content_type), etag, last_modified)
+
+        return wrapper
+
+    return decorator
+
+
+def _with_validators(response: Response, etag: str, last_modified: datetime | None) -> Response:
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Stored, but always revalidated, so nobody sees a page from before the last sync
+    response.cache_control.no_cache = True
+    return response
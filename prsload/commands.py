@@ -0,0 +1,159 @@
+import json
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import click
+
+from prsload import benchmark as benchmarks
+from prsload import duckdb_client
+from prsload.fake_github import FakeBackend
+from prsload.fake_github import FakeGitHubServer
+from prsload.fake_github import FakeOrg
+from prsload.fake_github import FaultInjection
+from prsload.fake_github import ReplayBackend
+from prsload.fake_github import SyntheticBackend
+from prsload.github.recording import RecordingArchive
+from prsload.settings import get_settings
+
+if TYPE_CHECKING:
+    from flask import Flask
+
+
+def register_commands(app: "Flask") -> None:
+    """Register custom `flask` CLI commands"""
+
+    @app.cli.command("export-parquet")
+    @click.argument("directory", required=False)
+    def export_parquet(directory: str | None) -> None:
+        """Export all PRs and reviews to Parquet files, by default to parquet.directory of config.yml."""
+        transfer = duckdb_client.export_parquet(directory or get_settings().PARQUET_DIRECTORY)
+        click.echo(f"Exported {transfer.prs_count} PRs and {transfer.reviews_count} reviews to {transfer.directory}")
+
+    @app.cli.command("import-parquet")
+    @click.argument("directory", required=False)
+    def import_parquet(directory: str | None) -> None:
+        """Import PRs and reviews from Parquet files, by default from parquet.directory of config.yml."""
+        transfer = duckdb_client.import_parquet(directory or get_settings().PARQUET_DIRECTORY)
+        click.echo(
+            f"Imported {transfer.prs_count} PRs and {transfer.reviews_count} reviews from {transfer.directory}"
+        )
+
+    @app.cli.command("fake-github")
+    @click.option("--host", default="127.0.0.1", show_default=True)
+    @click.option("--port", default=8765, show_default=True)
+    @click.option("--replay", "replay_dir", help="Replay the responses recorded in this directory.")
+    @click.option("--org", "login", default="org", show_default=True, help="Login of the synthetic org.")
+    @click.option("--repos", default=20, show_default=True, help="Repos of the synthetic org.")
+    @click.option("--prs", default=200, show_default=True, help="PRs per repo.")
+    @click.option("--max-reviews", default=3, show_default=True, help="Review requests per PR, at most.")
+    @click.option("--users", default=30, show_default=True, help="Authors and reviewers to pick from.")
+    @click.option("--days", default=365, show_default=True, help="PRs are created within this many days.")
+    @click.option("--seed", default=1, show_default=True, help="Same seed, same data and same injected faults.")
+    @click.option("--latency", default=0.0, show_default=True, help="Seconds added to every response.")
+    @click.option("--latency-per-kb", default=0.0, show_default=True, help="Seconds added per KB of a response.")
+    @click.option("--error-rate", default=0.0, show_default=True, help="Share of requests answered with 502.")
+    @click.option(
+        "--secondary-rate-limit-rate",
+        default=0.0,
+        show_default=True,
+        help="Share of requests refused as over the secondary rate limit.",
+    )
+    @click.option("--retry-after", default=1, show_default=True, help="Retry-After of secondary rate limits.")
+    @click.option("--rate-limit-points", default=5000, show_default=True, help="Budget of the synthetic org.")
+    @click.option("--rate-limit-window", default=3600, show_default=True, help="Seconds until the budget resets.")
+    def fake_github(  # noqa: PLR0913
+        host: str,
+        port: int,
+        replay_dir: str | None,
+        login: str,
+        repos: int,
+        prs: int,
+        max_reviews: int,
+        users: int,
+        days: int,
+        seed: int,
+        latency: float,
+        latency_per_kb: float,
+        error_rate: float,
+        secondary_rate_limit_rate: float,
+        retry_after: int,
+        rate_limit_points: int,
+        rate_limit_window: int,
+    ) -> None:
+        """Serve a fake GitHub GraphQL API, with a synthetic org or replaying recorded responses."""
+        backend: FakeBackend
+        if replay_dir:
+            backend = ReplayBackend(RecordingArchive(replay_dir))
+        else:
+            org = FakeOrg(
+                login=login,
+                num_of_repos=repos,
+                prs_per_repo=prs,
+                max_reviews_per_pr=max_reviews,
+                num_of_users=users,
+                days=days,
+                seed=seed,
+            )
+            backend = SyntheticBackend(org, rate_limit_points, timedelta(seconds=rate_limit_window))
+
+        faults = FaultInjection(
+            latency_seconds=latency,
+            latency_per_kb_seconds=latency_per_kb,
+            error_rate=error_rate,
+            secondary_rate_limit_rate=secondary_rate_limit_rate,
+            retry_after_seconds=retry_after,
+            seed=seed,
+        )
+        server = FakeGitHubServer(backend, faults, host=host, port=port)
+        click.echo(f"Fake GitHub GraphQL API on {server.url}, set it as github.url in config.yml")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+
+    @app.cli.command("benchmark")
+    @click.option("--profile", type=click.Choice(list(benchmarks.PROFILES)), default="small", show_default=True)
+    @click.option("--seed", default=1, show_default=True, help="Same seed, same synthetic data.")
+    @click.option("--repeat", default=20, show_default=True, help="Runs of every analytics query and page render.")
+    @click.option("--output", help="Write the results as JSON to this file.")
+    @click.option("--baseline", "baseline_path", default="benchmarks/baseline.json", show_default=True)
+    @click.option("--save-baseline", is_flag=True, help="Store the results as the baseline of the profile.")
+    @click.option(
+        "--tolerance",
+        default=benchmarks.DEFAULT_TOLERANCE,
+        show_default=True,
+        help="Slowdown against the baseline that counts as a regression.",
+    )
+    def benchmark(  # noqa: PLR0913
+        profile: str,
+        seed: int,
+        repeat: int,
+        output: str | None,
+        baseline_path: str,
+        save_baseline: bool,
+        tolerance: float,
+    ) -> None:
+        """Time ingestion, analytics and page renders on synthetic data, without GitHub, and compare with a baseline."""
+        # The sync and the pages log every step, that would be timed too
+        logging.getLogger("prsload").setLevel(logging.WARNING)
+        result = benchmarks.run_benchmark(app, profile, seed=seed, repeat=repeat)
+
+        baseline = benchmarks.load_baselines(baseline_path).get(profile)
+        click.echo(benchmarks.format_result(result, baseline))
+        if output:
+            with open(output, "w", encoding="utf-8") as output_file:
+                json.dump(result, output_file, indent=2)
+        if save_baseline:
+            benchmarks.save_baseline(baseline_path, result)
+            click.echo(f"Saved as the {profile} baseline in {baseline_path}")
+            return
+
+        if baseline is None:
+            click.echo(f"No {profile} baseline in {baseline_path} to compare with")
+            return
+        regressions = benchmarks.compare_with_baseline(result, baseline, tolerance)
+        for regression in regressions:
+            click.echo(f"Regression: {regression}", err=True)
+        if regressions:
+            raise SystemExit(1)
@@ -1 +1,17 @@
 DEFAULT_NUM_OF_DAYS = 28
+# Reviews ≤ 2h, ≤ 4h and ≤ 1d on the top reviewers page
+DEFAULT_REVIEW_TIME_THRESHOLDS_MINUTES = (120, 240, 1440)
+DEFAULT_SYNC_CONCURRENCY = 4
+DEFAULT_SYNC_REPOS_PER_REQUEST = 10
+DEFAULT_SYNC_WRITE_BATCH_PRS = 1000
+SYNC_STRATEGY_PULL_REQUESTS = "pull_requests"
+SYNC_STRATEGY_SEARCH = "search"
+SYNC_STRATEGIES = (SYNC_STRATEGY_PULL_REQUESTS, SYNC_STRATEGY_SEARCH)
+DEFAULT_CACHE_MAX_ENTRIES = 64
+DEFAULT_PARQUET_DIRECTORY = "parquet"
+DEFAULT_GH_GRAPHQL_URL = "https://api.github.com/graphql"
+DEFAULT_GH_POOL_SIZE = 10
+DEFAULT_GH_CONNECT_TIMEOUT = 5.0
+DEFAULT_GH_READ_TIMEOUT = 30.0
+DEFAULT_GH_MAX_RETRIES = 5
+DEFAULT_GH_MIN_REMAINING_POINTS = 50
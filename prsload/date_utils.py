@@ -1,7 +1,31 @@
+from datetime import UTC
 from datetime import datetime
+from datetime import timedelta
+from typing import overload
+
+# GitHub's DateTime scalar, always in UTC with whole seconds. Timestamps of this fixed width sort like
+# the times they stand for, so they can be compared as strings before anything is parsed.
+GITHUB_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 
 def parse_str_to_date(date_str: str) -> datetime:
-    if date_str.endswith("Z"):
-        date_str = date_str.replace("Z", "+00:00")
+    # Parses the trailing Z of GitHub's timestamps as UTC since Python 3.11
     return datetime.fromisoformat(date_str)
+
+
+@overload
+def parse_github_dates(date_strs: list[str]) -> list[datetime]: ...
+@overload
+def parse_github_dates(date_strs: list[str | None]) -> list[datetime | None]: ...
+def parse_github_dates(date_strs: list[str] | list[str | None]) -> list[datetime] | list[datetime | None]:
+    """Parse a column of GitHub timestamps at once, None stays None."""
+    parse = datetime.fromisoformat
+    return [parse(date_str) if date_str else None for date_str in date_strs]
+
+
+def format_as_github_date(date: datetime) -> str:
+    """The GitHub timestamp that GitHub timestamps before `date` sort before, `date` is rounded up to a second."""
+    date = date.astimezone(UTC)
+    if date.microsecond:
+        date = date.replace(microsecond=0) + timedelta(seconds=1)
+    return date.strftime(GITHUB_DATE_FORMAT)
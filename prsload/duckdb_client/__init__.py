@@ -1,16 +1,66 @@
 # Public API for DuckDB client
 from .client import health_check as duckdb_health_check
 from .client import recreate_tables
+from .client import using_database
+from .data_generation import DataGeneration
+from .data_generation import get_data_generation
+from .parquet import ParquetTransfer
+from .parquet import export_parquet
+from .parquet import import_parquet
+from .policy import apply_filtering_policy_in_background
+from .policy import ensure_filtering_policy
 from .pr_stats import PRStats
 from .pr_stats import get_pr_stats
 from .prs import delete_all_prs
 from .prs import store_pr
+from .prs import store_prs
+from .stats import ReviewerStats
+from .stats import ReviewFilter
+from .stats import ReviewTimeBucket
+from .stats import WeeklyTrends
+from .stats import get_reviewer_stats
+from .stats import get_weekly_trends
+from .stats import refresh_stats
+from .sync_state import RepoWatermark
+from .sync_state import SyncCheckpoint
+from .sync_state import SyncRun
+from .sync_state import finish_sync_run
+from .sync_state import get_repo_watermarks
+from .sync_state import get_sync_checkpoints
+from .sync_state import start_sync_run
+from .sync_state import store_repo_watermark
+from .sync_state import store_sync_metrics
 
 __all__ = [
+    "DataGeneration",
     "PRStats",
+    "ParquetTransfer",
+    "RepoWatermark",
+    "ReviewFilter",
+    "ReviewTimeBucket",
+    "ReviewerStats",
+    "SyncCheckpoint",
+    "SyncRun",
+    "WeeklyTrends",
+    "apply_filtering_policy_in_background",
     "delete_all_prs",
     "duckdb_health_check",
+    "ensure_filtering_policy",
+    "export_parquet",
+    "finish_sync_run",
+    "get_data_generation",
     "get_pr_stats",
+    "get_repo_watermarks",
+    "get_reviewer_stats",
+    "get_sync_checkpoints",
+    "get_weekly_trends",
+    "import_parquet",
     "recreate_tables",
+    "refresh_stats",
+    "start_sync_run",
     "store_pr",
+    "store_prs",
+    "store_repo_watermark",
+    "store_sync_metrics",
+    "using_database",
 ]
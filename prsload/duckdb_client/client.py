@@ -1,108 +1,260 @@
 import logging
 import os
+import threading
+import time
+from collections.abc import Generator
 from contextlib import contextmanager
 from dataclasses import dataclass
 from dataclasses import field
+from datetime import UTC
+from datetime import datetime
 
 import duckdb
 
+from prsload import metrics
+from prsload.settings import get_settings
+
+from .schema import create_tables
+
 logger = logging.getLogger(__name__)
 
 # Use a file-based DuckDB for persistence
 DB_FILE_PATH = "prs_analytics.duckdb"
 
 
-def get_connection_obj():
-    return duckdb.connect(database=DB_FILE_PATH)
+@dataclass
+class ConnectionHealth:
+    is_open: bool
+    opened_at: datetime | None
+    memory_limit: str | None
+    threads: int | None
+    writer_busy: bool
+    active_readers: int
+    last_error: str = ""
+
+
+class ConnectionManager:
+    """Keeps one DuckDB database handle open for the whole process.
+
+    Opening the DuckDB file re-reads its metadata and starts with an empty buffer
+    cache, so we open it once and hand out cursors on that handle instead:
+    - readers get a cursor per thread and run inside a read-only transaction,
+    - there is a single writer at a time, every writer block is one transaction.
+
+    The read-write handle locks the file, no other process can open it meanwhile.
+    So the app runs as one process with threads, several processes on one file are not supported.
+    """
+
+    def __init__(self, db_file_path: str, memory_limit: str | None = None, threads: int | None = None):
+        self.db_file_path = db_file_path
+        self.memory_limit = memory_limit
+        self.threads = threads
+
+        self._handle: duckdb.DuckDBPyConnection | None = None
+        self._writer_cursor: duckdb.DuckDBPyConnection | None = None
+        # Bumped every time the handle is closed, so threads know their cursor is stale
+        self._generation = 0
+        self._opened_at: datetime | None = None
+        self._last_error = ""
+        self._active_readers = 0
+
+        self._handle_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._readers_lock = threading.Lock()
+        self._thread_local = threading.local()
+
+    def _get_handle(self) -> duckdb.DuckDBPyConnection:
+        with self._handle_lock:
+            if self._handle is None:
+                config: dict[str, str | bool | int | float | list[str]] = {}
+                if self.memory_limit:
+                    config["memory_limit"] = self.memory_limit
+                if self.threads:
+                    config["threads"] = self.threads
+
+                try:
+                    self._handle = duckdb.connect(database=self.db_file_path, config=config)
+                except duckdb.Error as exc:
+                    self._last_error = str(exc)
+                    raise
+
+                # TIMESTAMP columns hold UTC. DuckDB converts aware datetimes to the session's time zone,
+                # which is the host's local one unless set, for every cursor of the handle
+                self._handle.execute("SET GLOBAL TimeZone = 'UTC'")
+                self._opened_at = datetime.now(tz=UTC)
+                self._last_error = ""
+                logger.info(f"Opened DuckDB {self.db_file_path} {config=}")
+                create_tables(self._handle)
+
+            return self._handle
+
+    def _get_thread_cursor(self) -> duckdb.DuckDBPyConnection:
+        handle = self._get_handle()
+        local = self._thread_local
+        if getattr(local, "generation", None) != self._generation or local.cursor is None:
+            local.cursor = handle.cursor()
+            local.generation = self._generation
+        return local.cursor
+
+    @contextmanager
+    def reader(self) -> Generator[duckdb.DuckDBPyConnection]:
+        """Yield this thread's cursor inside a read-only transaction.
+
+        A reader within another one of the same thread shares its transaction."""
+        local = self._thread_local
+        if getattr(local, "reading", False) and local.generation == self._generation:
+            yield local.cursor
+            return
+
+        cursor = self._get_thread_cursor()
+        cursor.execute("BEGIN TRANSACTION READ ONLY")
+        local.reading = True
+        with self._readers_lock:
+            self._active_readers += 1
+        try:
+            yield cursor
+        finally:
+            with self._readers_lock:
+                self._active_readers -= 1
+            local.reading = False
+            cursor.execute("ROLLBACK")
+
+    @contextmanager
+    def writer(self) -> Generator[duckdb.DuckDBPyConnection]:
+        """Yield a cursor for writing, one writer at a time, committed as one transaction."""
+        wait_started = time.perf_counter()
+        with self._writer_lock:
+            metrics.DUCKDB_WRITER_WAIT_SECONDS.observe(time.perf_counter() - wait_started)
+            if self._writer_cursor is None:
+                self._writer_cursor = self._get_handle().cursor()
+            cursor = self._writer_cursor
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    @property
+    def generation(self) -> int:
+        """Bumped every time the database handle is closed, e.g. before the file is recreated."""
+        return self._generation
+
+    def close(self) -> None:
+        """Close the database handle. The next reader or writer opens it again."""
+        with self._writer_lock, self._handle_lock:
+            if self._writer_cursor is not None:
+                self._writer_cursor.close()
+                self._writer_cursor = None
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+                self._opened_at = None
+            self._generation += 1
+
+    def health(self) -> ConnectionHealth:
+        return ConnectionHealth(
+            is_open=self._handle is not None,
+            opened_at=self._opened_at,
+            memory_limit=self.memory_limit,
+            threads=self.threads,
+            writer_busy=self._writer_lock.locked(),
+            active_readers=self._active_readers,
+            last_error=self._last_error,
+        )
+
+
+_manager: ConnectionManager | None = None
+_manager_lock = threading.Lock()
+
+DUCKDB_ACTIVE_READERS = metrics.Gauge(
+    "prsload_duckdb_active_readers",
+    "Read transactions in progress.",
+    function=lambda: _manager.health().active_readers if _manager else 0,
+)
+
+
+def get_connection_manager() -> ConnectionManager:
+    global _manager  # noqa: PLW0603
+    with _manager_lock:
+        if _manager is None:
+            settings = get_settings()
+            _manager = ConnectionManager(
+                DB_FILE_PATH,
+                memory_limit=settings.DUCKDB_MEMORY_LIMIT,
+                threads=settings.DUCKDB_THREADS,
+            )
+        return _manager
 
 
 @contextmanager
-def get_connection():
-    conn = get_connection_obj()
+def using_database(db_file_path: str) -> Generator[ConnectionManager]:
+    """Send all readers and writers to another database file until the block ends, e.g. for a benchmark."""
+    global _manager  # noqa: PLW0603
+    settings = get_settings()
+    manager = ConnectionManager(
+        db_file_path,
+        memory_limit=settings.DUCKDB_MEMORY_LIMIT,
+        threads=settings.DUCKDB_THREADS,
+    )
+    with _manager_lock:
+        previous_manager, _manager = _manager, manager
     try:
-        yield conn
+        yield manager
     finally:
-        conn.close()
-
-
-# Table definitions
-TABLE_SCHEMAS = {
-    "prs": """
-        CREATE TABLE IF NOT EXISTS prs (
-            id INTEGER PRIMARY KEY DEFAULT nextval('prs_id_seq'),
-            number INTEGER,
-            repo_slug VARCHAR,
-            title VARCHAR,
-            url VARCHAR,
-            author VARCHAR,
-            created_at TIMESTAMP,
-            merged_at TIMESTAMP,
-            UNIQUE(repo_slug, number)
-        )
-    """,
-    "reviews": """
-        CREATE TABLE IF NOT EXISTS reviews (
-            id INTEGER PRIMARY KEY DEFAULT nextval('reviews_id_seq'),
-            pr_id INTEGER,
-            reviewer VARCHAR,
-            requested_at TIMESTAMP,
-            first_sign_of_life TIMESTAMP,
-            first_approve_or_disapprove TIMESTAMP,
-            FOREIGN KEY (pr_id) REFERENCES prs(id)
-        )
-    """,
-}
+        with _manager_lock:
+            _manager = previous_manager
+        manager.close()
 
 
-def create_tables():
-    """Create all required DuckDB tables."""
-    with get_connection() as conn:
-        # Create sequences first
-        conn.execute("CREATE SEQUENCE IF NOT EXISTS prs_id_seq")
-        conn.execute("CREATE SEQUENCE IF NOT EXISTS reviews_id_seq")
+@contextmanager
+def get_reader() -> Generator[duckdb.DuckDBPyConnection]:
+    with get_connection_manager().reader() as cursor:
+        yield cursor
 
-        for table_name, schema in TABLE_SCHEMAS.items():
-            conn.execute(schema)
-            logger.debug(f"Created/verified table: {table_name}")
 
-        logger.info("All DuckDB tables created/verified")
+@contextmanager
+def get_writer() -> Generator[duckdb.DuckDBPyConnection]:
+    with get_connection_manager().writer() as cursor:
+        yield cursor
 
 
 def recreate_tables():
     """Drop the database file and recreate all tables."""
+    manager = get_connection_manager()
 
-    # Close any existing connections by creating a temporary one and closing it
-    with get_connection():
-        pass
+    # The file can only be removed once our own handle on it is closed
+    manager.close()
 
-    if os.path.exists(DB_FILE_PATH):
-        os.remove(DB_FILE_PATH)
-        logger.debug(f"Deleted database file: {DB_FILE_PATH}")
+    # The file of the manager in use, which is another one within using_database()
+    if os.path.exists(manager.db_file_path):
+        os.remove(manager.db_file_path)
+        logger.debug(f"Deleted database file: {manager.db_file_path}")
 
-    create_tables()
+    # Opening the handle again creates the tables
+    with manager.reader():
+        pass
 
 
 @dataclass
 class HealthState:
     status: str
+    database_file: str
     tables: list[str] = field(default_factory=list)
     row_counts: dict[str, int] = field(default_factory=dict)
     error_msg: str = field(default="")
-
-    @property
-    def database_file(self) -> str:
-        return DB_FILE_PATH
+    connection: ConnectionHealth | None = None
 
 
 def health_check() -> HealthState:
     """Check DuckDB connection and basic functionality."""
-    with get_connection() as conn:
-        try:
+    manager = get_connection_manager()
+    try:
+        with manager.reader() as conn:
             # Test basic query
-            result = conn.execute("SELECT 1 as test").fetchone()
-            test_passed = result[0] == 1
-
-            create_tables()
+            [(result,)] = conn.execute("SELECT 1 as test").fetchall()
+            test_passed = result == 1
 
             tables = conn.execute(
                 "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
@@ -111,16 +263,20 @@ def health_check() -> HealthState:
             table_names: list[str] = [table[0] for table in tables]
 
             row_counts: dict[str, int] = {}
-            for table_name in ["prs", "reviews"]:
+            for table_name in ["prs", "reviews", "repos", "users"]:
                 if table_name in table_names:
-                    count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+                    [(count,)] = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchall()
                     row_counts[table_name] = count
 
-            return HealthState(
-                status="healthy" if test_passed else "error",
-                tables=table_names,
-                row_counts=row_counts,
-            )
+        return HealthState(
+            status="healthy" if test_passed else "error",
+            database_file=manager.db_file_path,
+            tables=table_names,
+            row_counts=row_counts,
+            connection=manager.health(),
+        )
 
-        except Exception as e:
-            return HealthState(status="error", error_msg=str(e))
+    except Exception as e:
+        return HealthState(
+            status="error", database_file=manager.db_file_path, error_msg=str(e), connection=manager.health()
+        )
@@ -0,0 +1,39 @@
+import logging
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+
+import duckdb
+
+from .client import get_reader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DataGeneration:
+    """Version of the data the analytics pages show, bumped every time it changes.
+
+    Anything computed from the data can be cached for as long as the generation stays the same."""
+
+    generation: int
+    changed_at: datetime | None = None
+
+
+def get_data_generation() -> DataGeneration:
+    with get_reader() as conn:
+        rows = conn.execute("SELECT generation, changed_at FROM data_generation WHERE id = 1").fetchall()
+
+    if not rows:
+        return DataGeneration(generation=0)
+    generation, changed_at = rows[0]
+    return DataGeneration(generation=generation, changed_at=changed_at.replace(tzinfo=UTC) if changed_at else None)
+
+
+def bump_data_generation(conn: duckdb.DuckDBPyConnection) -> None:
+    """Move to the next generation with the writer's `conn`, inside the transaction that changed the data."""
+    conn.execute(
+        "UPDATE data_generation SET generation = generation + 1, changed_at = ? WHERE id = 1",
+        [datetime.now(tz=UTC)],
+    )
+    logger.debug("Bumped the data generation")
@@ -0,0 +1,131 @@
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from .client import get_reader
+from .client import get_writer
+from .prs import create_staging_tables
+from .prs import merge_staged_prs
+from .stats import refresh_stats
+
+logger = logging.getLogger(__name__)
+
+# Both tables are split into one directory per repo and month the PR was created in,
+# e.g. prs/repo_slug=org%2Frepo/month=2025-01/data_0.parquet
+PARQUET_TABLES = ("prs", "reviews")
+PARTITION_COLUMNS = "repo_slug, month"
+# Partition values are strings, a repo like org/2024 must not be read back as a number
+_HIVE_TYPES = "{'repo_slug': VARCHAR, 'month': VARCHAR}"
+
+
+@dataclass
+class ParquetTransfer:
+    """What was exported to or imported from a directory of Parquet files."""
+
+    directory: str
+    prs_count: int = 0
+    reviews_count: int = 0
+
+
+def export_parquet(directory: str) -> ParquetTransfer:
+    """Write all PRs and reviews to Parquet files, partitioned by repo and month and compressed with zstd.
+
+    Repos and users are written as slugs and logins instead of ids, so the files can be
+    imported into any database or read by other tools. The previous export in `directory`
+    is replaced. Both tables come from one read-only transaction, which doesn't block
+    the app or a running sync."""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    transfer = ParquetTransfer(directory=directory)
+
+    with get_reader() as conn:
+        [(transfer.prs_count, transfer.reviews_count)] = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM prs), (SELECT COUNT(*) FROM reviews)"
+        ).fetchall()
+        conn.execute(f"""
+            COPY (
+                SELECT
+                    repo.slug AS repo_slug,
+                    strftime(p.created_at, '%Y-%m') AS month,
+                    p.number,
+                    p.title,
+                    u.login AS author,
+                    p.created_at,
+                    p.merged_at
+                FROM prs p
+                JOIN repos repo ON repo.id = p.repo_id
+                LEFT JOIN users u ON u.id = p.author_id
+                ORDER BY repo.slug, p.created_at
+            ) TO '{_table_path(directory, "prs")}'
+            (FORMAT parquet, COMPRESSION zstd, PARTITION_BY ({PARTITION_COLUMNS}), OVERWRITE)
+        """)
+        conn.execute(f"""
+            COPY (
+                SELECT
+                    repo.slug AS repo_slug,
+                    strftime(p.created_at, '%Y-%m') AS month,
+                    p.number,
+                    u.login AS reviewer,
+                    r.requested_at,
+                    r.first_sign_of_life,
+                    r.first_approve_or_disapprove
+                FROM reviews r
+                JOIN prs p ON p.id = r.pr_id
+                JOIN repos repo ON repo.id = p.repo_id
+                LEFT JOIN users u ON u.id = r.reviewer_id
+                ORDER BY repo.slug, p.created_at, p.number
+            ) TO '{_table_path(directory, "reviews")}'
+            (FORMAT parquet, COMPRESSION zstd, PARTITION_BY ({PARTITION_COLUMNS}), OVERWRITE)
+        """)
+
+    logger.info(f"Exported {transfer.prs_count} PRs and {transfer.reviews_count} reviews to {directory}")
+    return transfer
+
+
+def import_parquet(directory: str) -> ParquetTransfer:
+    """Load PRs and reviews exported by `export_parquet()` into the database.
+
+    The files are bulk-loaded by DuckDB into the staging tables of `store_prs()` and merged
+    the same way: stored PRs are updated, their reviews replaced, all in one transaction.
+    The stats of the affected reviewers and repos are refreshed afterwards."""
+    transfer = ParquetTransfer(directory=directory)
+    prs_glob = _parquet_glob(directory, "prs")
+    if prs_glob is None:
+        logger.warning(f"No Parquet files of PRs in {directory}, nothing to import")
+        return transfer
+    reviews_glob = _parquet_glob(directory, "reviews")
+
+    with get_writer() as conn:
+        create_staging_tables(conn)
+        # A PR can only be merged once per statement, files copied over each other may repeat it
+        conn.execute(f"""
+            INSERT INTO staging_prs
+            SELECT number, repo_slug, title, author, created_at, merged_at
+            FROM read_parquet('{prs_glob}', hive_partitioning = true, hive_types = {_HIVE_TYPES})
+            QUALIFY row_number() OVER (PARTITION BY repo_slug, number) = 1
+        """)
+        if reviews_glob:
+            conn.execute(f"""
+                INSERT INTO staging_reviews
+                SELECT repo_slug, number, reviewer, requested_at, first_sign_of_life, first_approve_or_disapprove
+                FROM read_parquet('{reviews_glob}', hive_partitioning = true, hive_types = {_HIVE_TYPES})
+            """)
+        [(transfer.prs_count, transfer.reviews_count)] = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM staging_prs), (SELECT COUNT(*) FROM staging_reviews)"
+        ).fetchall()
+        merge_staged_prs(conn)
+
+    refresh_stats()
+    logger.info(f"Imported {transfer.prs_count} PRs and {transfer.reviews_count} reviews from {directory}")
+    return transfer
+
+
+def _table_path(directory: str, table_name: str) -> str:
+    return str(Path(directory) / table_name).replace("'", "''")
+
+
+def _parquet_glob(directory: str, table_name: str) -> str | None:
+    """Glob of the table's files for `read_parquet()`, None when there are none."""
+    table_dir = Path(directory) / table_name
+    if not any(table_dir.glob("**/*.parquet")):
+        return None
+    return f"{_table_path(directory, table_name)}/**/*.parquet"
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import UTC
+from datetime import datetime
+
+import duckdb
+
+from prsload.exceptions import SettingsError
+from prsload.settings import Settings
+from prsload.settings import get_settings
+
+from .client import ConnectionManager
+from .client import get_connection_manager
+from .client import get_reader
+from .client import get_writer
+from .stats import refresh_all_stats
+
+logger = logging.getLogger(__name__)
+
+# The settings and database the stored policy was last checked against,
+# so a request with unchanged settings costs nothing
+_checked: tuple[Settings, ConnectionManager, int] | None = None
+# The thread applying a changed policy for the requests, see `apply_filtering_policy_in_background()`
+_applying: threading.Thread | None = None
+_applying_lock = threading.Lock()
+
+
+def ensure_filtering_policy(settings: Settings) -> bool:
+    """Make the ignore lists and vacations of `settings` the filtering policy of the analytics.
+
+    PRs and reviews are stored as GitHub returned them, the analytics leave out what the
+    policy says at query time, with anti-joins against the `ignored_users` and `vacations`
+    tables. So a changed config.yml needs no resync: when its policy differs from the stored
+    one, the tables are replaced and the stats rebuilt, in one transaction that bumps the
+    data generation. Returns whether the policy changed."""
+    global _checked  # noqa: PLW0603
+    manager = get_connection_manager()
+    if _is_checked(settings, manager):
+        return False
+
+    fingerprint = _policy_fingerprint(settings)
+    with get_reader() as conn:
+        changed = _get_stored_fingerprint(conn) != fingerprint
+    if changed:
+        changed = _store_filtering_policy(settings, fingerprint)
+    _checked = (settings, manager, manager.generation)
+    return changed
+
+
+def apply_filtering_policy_in_background(settings: Settings) -> None:
+    """`ensure_filtering_policy()` for requests: free once `settings` were checked, otherwise it
+    starts a thread to check and apply them and returns right away.
+
+    Rebuilding the stats takes a while, pages are served with the previous policy meanwhile.
+    Once the stats are rebuilt, the bumped data generation makes the cached pages show the new
+    one. Settings that change while a policy is applied are applied by the same thread right after."""
+    global _applying  # noqa: PLW0603
+    if _is_checked(settings, get_connection_manager()):
+        return
+
+    with _applying_lock:
+        if _applying is not None:
+            # The running thread looks at the settings again before it stops
+            return
+        _applying = threading.Thread(
+            target=_apply_filtering_policy, args=(settings,), name="filtering-policy", daemon=True
+        )
+        _applying.start()
+
+
+def _apply_filtering_policy(settings: Settings) -> None:
+    """Apply `settings`, then the settings that changed meanwhile, until they stop changing."""
+    global _applying  # noqa: PLW0603
+    while True:
+        try:
+            ensure_filtering_policy(settings)
+        except duckdb.Error as exc:
+            logger.warning(f"Could not apply the filtering policy: {exc}")
+        except BaseException:
+            # Let the next request start another thread
+            with _applying_lock:
+                _applying = None
+            raise
+
+        # Under the lock, so a request can't miss this thread stopping
+        with _applying_lock:
+            try:
+                latest = get_settings()
+            except SettingsError:
+                latest = settings
+            if latest is settings or _is_checked(latest, get_connection_manager()):
+                _applying = None
+                return
+        settings = latest
+
+
+def _is_checked(settings: Settings, manager: ConnectionManager) -> bool:
+    checked = _checked
+    return bool(checked and checked[0] is settings and checked[1] is manager and checked[2] == manager.generation)
+
+
+def _get_stored_fingerprint(conn: duckdb.DuckDBPyConnection) -> str | None:
+    rows = conn.execute("SELECT fingerprint FROM filtering_policy WHERE id = 1").fetchall()
+    return rows[0][0] if rows else None
+
+
+def _store_filtering_policy(settings: Settings, fingerprint: str) -> bool:
+    """Replace the stored policy and rebuild the stats, unless another thread stored this policy meanwhile."""
+    ignored_users = [(login, "author") for login in set(settings.PR_AUTHORS_TO_IGNORE)] + [
+        (login, "reviewer") for login in set(settings.REVIEWERS_TO_IGNORE)
+    ]
+    vacations = [(login, start, end) for login, periods in settings.VACATION.items() for start, end in periods]
+
+    with get_writer() as conn:
+        if _get_stored_fingerprint(conn) == fingerprint:
+            return False
+        conn.execute("DELETE FROM ignored_users")
+        if ignored_users:
+            conn.executemany("INSERT INTO ignored_users VALUES (?, ?)", ignored_users)
+        conn.execute("DELETE FROM vacations")
+        if vacations:
+            conn.executemany("INSERT INTO vacations VALUES (?, ?, ?)", vacations)
+        conn.execute(
+            "INSERT OR REPLACE INTO filtering_policy (id, fingerprint, applied_at) VALUES (1, ?, ?)",
+            [fingerprint, datetime.now(tz=UTC)],
+        )
+        num_of_reviewers, num_of_repos = refresh_all_stats(conn)
+
+    logger.info(
+        f"Applied the filtering policy: {len(ignored_users)} ignored users, {len(vacations)} vacations, "
+        f"rebuilt the stats of {num_of_reviewers} reviewers and {num_of_repos} repos"
+    )
+    return True
+
+
+def _policy_fingerprint(settings: Settings) -> str:
+    policy = {
+        "pr_authors_to_ignore": sorted(set(settings.PR_AUTHORS_TO_IGNORE)),
+        "reviewers_to_ignore": sorted(set(settings.REVIEWERS_TO_IGNORE)),
+        "vacation": {
+            login: sorted(f"{start.isoformat()}/{end.isoformat()}" for start, end in periods)
+            for login, periods in sorted(settings.VACATION.items())
+        },
+    }
+    return hashlib.sha1(json.dumps(policy).encode(), usedforsecurity=False).hexdigest()
@@ -3,7 +3,8 @@ from dataclasses import dataclass
 from dataclasses import field
 from datetime import datetime
 
-from prsload.duckdb_client.client import get_connection
+from prsload import metrics
+from prsload.duckdb_client.client import get_reader
 
 logger = logging.getLogger(__name__)
 
@@ -17,34 +18,26 @@ class PRStats:
     error_msg: str | None = None
 
 
+@metrics.DUCKDB_SECONDS.time(operation="pr_stats")
 def get_pr_stats() -> PRStats:
-    """Get basic PR statistics from DuckDB."""
-    with get_connection() as conn:
+    """Get basic PR statistics from the `repo_stats` that the last sync materialized."""
+    with get_reader() as conn:
         try:
-            # Total PRs and repos
-            result = conn.execute("""
-              SELECT COUNT(*) as total_prs, COUNT(DISTINCT repo_slug) as total_repos
-              FROM prs
-            """).fetchone()
-
-            total_prs, total_repos = result
-
             # PRs by repo
             repo_stats = conn.execute("""
-              SELECT repo_slug, COUNT(*) as pr_count
-              FROM prs
-              GROUP BY repo_slug
+              SELECT repo_slug, pr_count, newest_created_at
+              FROM repo_stats
               ORDER BY pr_count DESC, repo_slug ASC
               """).fetchall()
 
             # Latest sync time (most recent PR created_at)
-            latest_sync = conn.execute("""SELECT MAX(created_at) FROM prs""").fetchone()[0]
+            created_ats = [newest_created_at for _, _, newest_created_at in repo_stats if newest_created_at]
 
             return PRStats(
-                total_prs=total_prs,
-                total_repos=total_repos,
-                repos=[(repo, count) for repo, count in repo_stats],
-                youngest_data=latest_sync,
+                total_prs=sum(count for _, count, _ in repo_stats),
+                total_repos=len(repo_stats),
+                repos=[(repo, count) for repo, count, _ in repo_stats],
+                youngest_data=max(created_ats, default=None),
             )
 
         except Exception as e:
@@ -1,104 +1,256 @@
+import json
 import logging
+from collections.abc import Iterable
+from datetime import datetime
 
+import duckdb
+
+from prsload import metrics
+from prsload.exceptions import InvalidDataError
 from prsload.pr_type import PR
+from prsload.pr_type import PRBatch
 
-from .client import get_connection
+from .client import get_writer
+from .data_generation import bump_data_generation
+from .stats import delete_all_stats
+from .stats import mark_stats_stale
+from .sync_state import SyncCheckpoint
+from .sync_state import upsert_sync_checkpoint
 
 logger = logging.getLogger(__name__)
 
+# The columns of a PRBatch that are stored, with the types DuckDB reads them as
+_STAGED_BATCH_COLUMNS = {
+    "numbers": "INTEGER[]",
+    "repo_slugs": "VARCHAR[]",
+    "titles": "VARCHAR[]",
+    "authors": "VARCHAR[]",
+    "created_ats": "TIMESTAMPTZ[]",
+    "merged_ats": "TIMESTAMPTZ[]",
+    "review_prs": "INTEGER[]",
+    "review_users": "VARCHAR[]",
+    "review_requested_ats": "TIMESTAMPTZ[]",
+    "review_first_signs_of_life": "TIMESTAMPTZ[]",
+    "review_first_approves_or_disapproves": "TIMESTAMPTZ[]",
+}
+_STAGED_BATCH_TYPES = json.dumps(_STAGED_BATCH_COLUMNS)
 
-def _insert_pr(pr: PR) -> int:
-    """Insert a single PR into DuckDB and return its ID."""
-    with get_connection() as conn:
-        try:
-            # Insert or update the PR using the UNIQUE constraint
-            conn.execute(
-                """
-                INSERT INTO prs
-                (number, repo_slug, title, url, author, created_at, merged_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT (repo_slug, number) DO UPDATE SET
-                    title = EXCLUDED.title,
-                    url = EXCLUDED.url,
-                    author = EXCLUDED.author,
-                    created_at = EXCLUDED.created_at,
-                    merged_at = EXCLUDED.merged_at
-            """,
-                [
-                    pr.number,
-                    pr.repo_slug,
-                    pr.title,
-                    pr.url,
-                    pr.author,
-                    pr.created_at,
-                    pr.merged_at,
-                ],
-            )
-
-            # Get the PR ID
-            pr_id = conn.execute(
-                "SELECT id FROM prs WHERE repo_slug = ? AND number = ?",
-                [pr.repo_slug, pr.number],
-            ).fetchone()[0]
-
-            logger.debug(f"Inserted PR {pr.repo_slug}#{pr.number} with ID {pr_id}")
-            return pr_id
-
-        except Exception as e:
-            logger.error(f"Error inserting PR {pr.repo_slug}#{pr.number}: {e}")
-            raise
 
+@metrics.DUCKDB_SECONDS.time(operation="store_prs")
+def store_prs(batch: PRBatch, checkpoints: Iterable[SyncCheckpoint] = ()) -> int:
+    """Store a batch of PRs with their reviews in DuckDB and return the number of stored PRs.
 
-def _insert_reviews(pr: PR, pr_id: int) -> None:
-    """Insert reviews for a PR into DuckDB."""
-    if not pr.reviews:
-        return
+    The whole batch is written by the single writer, inside one transaction:
+    the columns of the batch are handed over as one JSON document, which DuckDB unnests
+    into temporary staging tables, then merged into `repos`, `users`, `prs` and `reviews`
+    with a few set-based statements. Reviews of every PR in the batch are replaced by the
+    new ones. The tables have no foreign keys, the batch is validated once instead, before
+    anything is written. The sync `checkpoints` are committed in the same transaction, in
+    order, so they never point past PRs that were not stored. So are the stale markers of
+    the affected reviewer and repo stats, which `refresh_stats()` rebuilds at the end of the sync."""
+    checkpoints = list(checkpoints)
+    if not batch:
+        if checkpoints:
+            with get_writer() as conn:
+                for checkpoint in checkpoints:
+                    upsert_sync_checkpoint(conn, checkpoint)
+        return 0
 
-    with get_connection() as conn:
+    with get_writer() as conn:
         try:
-            # Delete existing reviews for this PR first
-            conn.execute("DELETE FROM reviews WHERE pr_id = ?", [pr_id])
-
-            # Insert all reviews for this PR
-            for review in pr.reviews:
-                conn.execute(
-                    """
-                    INSERT INTO reviews
-                    (pr_id, reviewer, requested_at, first_sign_of_life, first_approve_or_disapprove)
-                    VALUES (?, ?, ?, ?, ?)
-                """,
-                    [
-                        pr_id,
-                        review.user,
-                        review.requested_at,
-                        review.first_sign_of_life,
-                        review.first_approve_or_disapprove,
-                    ],
-                )
-
-            logger.debug(f"Inserted {len(pr.reviews)} reviews for PR {pr.repo_slug}#{pr.number}")
+            create_staging_tables(conn)
+            num_of_prs, num_of_reviews = _stage_batch(conn, batch)
+            merge_staged_prs(conn)
+
+            for checkpoint in checkpoints:
+                upsert_sync_checkpoint(conn, checkpoint)
+
         except Exception as e:
-            logger.error(f"Error inserting reviews for PR {pr.repo_slug}#{pr.number}: {e}")
+            logger.error(f"Error storing a batch of {len(batch)} PRs: {e}")
             raise
 
+    metrics.DUCKDB_PRS_STORED.inc(num_of_prs)
+    metrics.DUCKDB_REVIEWS_STORED.inc(num_of_reviews)
+    logger.debug(f"Stored {num_of_prs} PRs with {num_of_reviews} reviews")
+    return num_of_prs
+
 
-def store_pr(pr: PR):
+def store_pr(pr: PR) -> None:
     """Store a complete PR with reviews in DuckDB."""
-    pr_id = _insert_pr(pr)
-    _insert_reviews(pr, pr_id)
-    logger.debug(f"Stored complete PR {pr.repo_slug}#{pr.number} with {len(pr.reviews)} reviews")
+    store_prs(PRBatch.from_prs([pr]))
 
 
 def delete_all_prs():
     """Delete all PRs and reviews from the database."""
-    with get_connection() as conn:
-        # Delete all reviews first (foreign key constraint)
-        reviews_count = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+    with get_writer() as conn:
+        [(reviews_count,)] = conn.execute("SELECT COUNT(*) FROM reviews").fetchall()
+        [(prs_count,)] = conn.execute("SELECT COUNT(*) FROM prs").fetchall()
         conn.execute("DELETE FROM reviews")
-
-        # Delete all PRs
-        prs_count = conn.execute("SELECT COUNT(*) FROM prs").fetchone()[0]
         conn.execute("DELETE FROM prs")
+        conn.execute("DELETE FROM repos")
+        conn.execute("DELETE FROM users")
+
+        # Without PRs, the sync watermarks and checkpoints would make the next sync skip everything
+        conn.execute("DELETE FROM repo_sync_state")
+        conn.execute("DELETE FROM sync_checkpoints")
+        conn.execute("DELETE FROM sync_runs")
+        delete_all_stats(conn)
+        bump_data_generation(conn)
+
+    logger.info(f"Deleted {prs_count} PRs and {reviews_count} reviews from database")
+    return prs_count, reviews_count
+
+
+def create_staging_tables(conn: duckdb.DuckDBPyConnection) -> None:
+    """Create the empty temporary tables a batch of PRs and reviews is loaded into before `merge_staged_prs()`."""
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staging_prs (
+            number INTEGER,
+            repo_slug VARCHAR,
+            title VARCHAR,
+            author VARCHAR,
+            created_at TIMESTAMP,
+            merged_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staging_reviews (
+            repo_slug VARCHAR,
+            number INTEGER,
+            reviewer VARCHAR,
+            requested_at TIMESTAMP,
+            first_sign_of_life TIMESTAMP,
+            first_approve_or_disapprove TIMESTAMP
+        )
+    """)
+
+
+def merge_staged_prs(conn: duckdb.DuckDBPyConnection) -> None:
+    """Merge the PRs and reviews of the staging tables into the stored ones, with the writer's `conn`.
+
+    Reviews of every staged PR are replaced by the staged ones."""
+    _validate_staged_prs(conn)
+    mark_stats_stale(conn)
+
+    # New repos and users get their ids first, the PRs and reviews below only refer to them
+    conn.execute("""
+        INSERT INTO repos (slug)
+        SELECT DISTINCT s.repo_slug FROM staging_prs s
+        WHERE NOT EXISTS (SELECT 1 FROM repos WHERE repos.slug = s.repo_slug)
+    """)
+    conn.execute("""
+        INSERT INTO users (login)
+        SELECT login FROM (
+            SELECT author AS login FROM staging_prs
+            UNION
+            SELECT reviewer AS login FROM staging_reviews
+        ) s
+        WHERE login IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users WHERE users.login = s.login)
+    """)
+
+    conn.execute("""
+        DELETE FROM reviews
+        WHERE pr_id IN (
+            SELECT p.id
+            FROM prs p
+            JOIN repos r ON r.id = p.repo_id
+            JOIN staging_prs s ON r.slug = s.repo_slug AND p.number = s.number
+        )
+    """)
+    conn.execute("""
+        MERGE INTO prs
+        USING (
+            SELECT r.id AS repo_id, s.number, s.title, u.id AS author_id, s.created_at, s.merged_at
+            FROM staging_prs s
+            JOIN repos r ON r.slug = s.repo_slug
+            LEFT JOIN users u ON u.login = s.author
+        ) s
+        ON prs.repo_id = s.repo_id AND prs.number = s.number
+        WHEN MATCHED THEN UPDATE SET
+            title = s.title,
+            author_id = s.author_id,
+            created_at = s.created_at,
+            merged_at = s.merged_at
+        WHEN NOT MATCHED THEN INSERT
+            (repo_id, number, title, author_id, created_at, merged_at)
+            VALUES (s.repo_id, s.number, s.title, s.author_id, s.created_at, s.merged_at)
+    """)
+    # PR and user ids are looked up with joins instead of a SELECT per review,
+    # sorted by PR so the reviews of a PR are stored next to each other
+    conn.execute("""
+        INSERT INTO reviews
+        (pr_id, reviewer_id, requested_at, first_sign_of_life, first_approve_or_disapprove)
+        SELECT p.id, u.id, s.requested_at, s.first_sign_of_life, s.first_approve_or_disapprove
+        FROM staging_reviews s
+        JOIN repos r ON r.slug = s.repo_slug
+        JOIN prs p ON p.repo_id = r.id AND p.number = s.number
+        LEFT JOIN users u ON u.login = s.reviewer
+        ORDER BY p.id
+    """)
+
+
+def _stage_batch(conn: duckdb.DuckDBPyConnection, batch: PRBatch) -> tuple[int, int]:
+    """Load `batch` into the staging tables, return how many PRs and reviews were staged.
+
+    DuckDB reads the columns from a single JSON parameter, one bound value per row would cost
+    far more than the merge itself. Timestamps are read as TIMESTAMPTZ, so they are stored
+    like bound datetimes are."""
+    document = json.dumps(
+        {name: getattr(batch, name) for name in _STAGED_BATCH_COLUMNS},
+        default=datetime.isoformat,
+    )
+    conn.execute(
+        f"CREATE OR REPLACE TEMP TABLE staging_batch AS SELECT json_transform(?, '{_STAGED_BATCH_TYPES}') AS b",
+        [document],
+    )
+    # A PR can only be merged once per statement, keep the last version of it and its reviews
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staging_batch_prs AS
+        SELECT * FROM (
+            SELECT
+                unnest(range(len(b.numbers))) AS pr_index,
+                unnest(b.numbers) AS number,
+                unnest(b.repo_slugs) AS repo_slug,
+                unnest(b.titles) AS title,
+                unnest(b.authors) AS author,
+                unnest(b.created_ats) AS created_at,
+                unnest(b.merged_ats) AS merged_at
+            FROM staging_batch
+        )
+        QUALIFY pr_index = max(pr_index) OVER (PARTITION BY repo_slug, number)
+    """)
+    conn.execute("""
+        INSERT INTO staging_prs
+        SELECT number, repo_slug, title, author, created_at, merged_at FROM staging_batch_prs ORDER BY pr_index
+    """)
+    conn.execute("""
+        INSERT INTO staging_reviews
+        SELECT p.repo_slug, p.number, r.reviewer, r.requested_at, r.first_sign_of_life, r.first_approve_or_disapprove
+        FROM (
+            SELECT
+                unnest(b.review_prs) AS pr_index,
+                unnest(b.review_users) AS reviewer,
+                unnest(b.review_requested_ats) AS requested_at,
+                unnest(b.review_first_signs_of_life) AS first_sign_of_life,
+                unnest(b.review_first_approves_or_disapproves) AS first_approve_or_disapprove
+            FROM staging_batch
+        ) r
+        JOIN staging_batch_prs p USING (pr_index)
+    """)
+    [(num_of_prs, num_of_reviews)] = conn.execute(
+        "SELECT (SELECT COUNT(*) FROM staging_prs), (SELECT COUNT(*) FROM staging_reviews)"
+    ).fetchall()
+    return num_of_prs, num_of_reviews
+
 
-        logger.info(f"Deleted {prs_count} PRs and {reviews_count} reviews from database")
-        return prs_count, reviews_count
+def _validate_staged_prs(conn: duckdb.DuckDBPyConnection) -> None:
+    """What the foreign keys used to check, for the whole staged batch at once."""
+    [(prs_without_key, orphan_reviews)] = conn.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM staging_prs WHERE repo_slug IS NULL OR number IS NULL),
+            (SELECT COUNT(*) FROM staging_reviews r ANTI JOIN staging_prs p USING (repo_slug, number))
+    """).fetchall()
+    if prs_without_key:
+        raise InvalidDataError(f"{prs_without_key} PRs have no repo or number")
+    if orphan_reviews:
+        raise InvalidDataError(f"{orphan_reviews} reviews belong to no PR of the batch")
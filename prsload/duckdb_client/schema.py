@@ -0,0 +1,293 @@
+import logging
+from datetime import UTC
+from datetime import datetime
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Bumped with every change of the tables that needs a migration of existing database files
+SCHEMA_VERSION = 2
+
+# Table definitions
+TABLE_SCHEMAS = {
+    # Repo slugs and user logins are stored once here, the big tables refer to them by id
+    "repos": """
+        CREATE TABLE IF NOT EXISTS repos (
+            id INTEGER PRIMARY KEY DEFAULT nextval('repos_id_seq'),
+            slug VARCHAR UNIQUE
+        )
+    """,
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY DEFAULT nextval('users_id_seq'),
+            login VARCHAR UNIQUE
+        )
+    """,
+    # The URL is https://github.com/<repos.slug>/pull/<number>
+    "prs": """
+        CREATE TABLE IF NOT EXISTS prs (
+            id INTEGER PRIMARY KEY DEFAULT nextval('prs_id_seq'),
+            repo_id INTEGER,
+            number INTEGER,
+            title VARCHAR,
+            author_id INTEGER,
+            created_at TIMESTAMP,
+            merged_at TIMESTAMP,
+            UNIQUE(repo_id, number)
+        )
+    """,
+    # No foreign keys, they are checked on every insert. store_prs() validates each batch once instead.
+    # No index either: the analytics joins are hash joins, which ART indexes don't speed up. Reviews are
+    # written in `pr_id` order instead, which keeps DuckDB's zonemaps of `pr_id` narrow.
+    "reviews": """
+        CREATE TABLE IF NOT EXISTS reviews (
+            pr_id INTEGER,
+            reviewer_id INTEGER,
+            requested_at TIMESTAMP,
+            first_sign_of_life TIMESTAMP,
+            first_approve_or_disapprove TIMESTAMP
+        )
+    """,
+    "repo_sync_state": """
+        CREATE TABLE IF NOT EXISTS repo_sync_state (
+            repo_slug VARCHAR PRIMARY KEY,
+            last_updated_at TIMESTAMP,
+            synced_at TIMESTAMP
+        )
+    """,
+    "sync_runs": """
+        CREATE TABLE IF NOT EXISTS sync_runs (
+            id VARCHAR PRIMARY KEY,
+            full_resync BOOLEAN,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """,
+    # What the metrics counted while a run synced, see metrics.py. A resumed run adds to it
+    "sync_run_metrics": """
+        CREATE TABLE IF NOT EXISTS sync_run_metrics (
+            run_id VARCHAR,
+            metric VARCHAR,
+            value DOUBLE,
+            PRIMARY KEY (run_id, metric)
+        )
+    """,
+    "sync_checkpoints": """
+        CREATE TABLE IF NOT EXISTS sync_checkpoints (
+            run_id VARCHAR,
+            repo_slug VARCHAR,
+            end_cursor VARCHAR,
+            newest_updated_at TIMESTAMP,
+            is_done BOOLEAN DEFAULT false,
+            PRIMARY KEY (run_id, repo_slug)
+        )
+    """,
+    # Materialized from prs and reviews at the end of every sync, see stats.py
+    "reviewer_stats": """
+        CREATE TABLE IF NOT EXISTS reviewer_stats (
+            reviewer VARCHAR PRIMARY KEY,
+            requested_prs INTEGER,
+            commented_prs INTEGER,
+            finished_prs INTEGER,
+            no_response_prs VARCHAR[],
+            reaction_times_minutes DOUBLE[],
+            refreshed_at TIMESTAMP
+        )
+    """,
+    "repo_stats": """
+        CREATE TABLE IF NOT EXISTS repo_stats (
+            repo_slug VARCHAR PRIMARY KEY,
+            pr_count INTEGER,
+            newest_created_at TIMESTAMP,
+            refreshed_at TIMESTAMP
+        )
+    """,
+    # Reviews per reviewer, repo and day, for the analytics of date ranges, repos and teams.
+    # Reaction times are kept as a sketch: how many fell into each bucket, see stats.py.
+    # One row per (reviewer, repo_slug, day), without a primary key that every refresh would pay for:
+    # stale rows are always deleted before they are rebuilt
+    "reviewer_daily_rollups": """
+        CREATE TABLE IF NOT EXISTS reviewer_daily_rollups (
+            reviewer VARCHAR,
+            repo_slug VARCHAR,
+            day DATE,
+            requested INTEGER,
+            commented INTEGER,
+            finished INTEGER,
+            no_response_prs VARCHAR[],
+            reaction_sketch STRUCT(bucket INTEGER, reviews INTEGER)[]
+        )
+    """,
+    "stale_reviewer_stats": """
+        CREATE TABLE IF NOT EXISTS stale_reviewer_stats (
+            reviewer VARCHAR PRIMARY KEY
+        )
+    """,
+    "stale_repo_stats": """
+        CREATE TABLE IF NOT EXISTS stale_repo_stats (
+            repo_slug VARCHAR PRIMARY KEY
+        )
+    """,
+    "stale_rollups": """
+        CREATE TABLE IF NOT EXISTS stale_rollups (
+            reviewer VARCHAR,
+            repo_slug VARCHAR,
+            day DATE,
+            PRIMARY KEY (reviewer, repo_slug, day)
+        )
+    """,
+    # The ignore lists and vacations of config.yml, applied by the analytics at query time, see policy.py
+    "ignored_users": """
+        CREATE TABLE IF NOT EXISTS ignored_users (
+            login VARCHAR,
+            role VARCHAR,  -- author or reviewer
+            PRIMARY KEY (login, role)
+        )
+    """,
+    "vacations": """
+        CREATE TABLE IF NOT EXISTS vacations (
+            login VARCHAR,
+            starts_at TIMESTAMP,
+            ends_at TIMESTAMP
+        )
+    """,
+    # A single row, the fingerprint of the config the two tables above were filled from
+    "filtering_policy": """
+        CREATE TABLE IF NOT EXISTS filtering_policy (
+            id INTEGER PRIMARY KEY,
+            fingerprint VARCHAR,
+            applied_at TIMESTAMP
+        )
+    """,
+    # A single row, see data_generation.py
+    "data_generation": """
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY,
+            generation BIGINT,
+            changed_at TIMESTAMP
+        )
+    """,
+    "schema_version": """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER
+        )
+    """,
+}
+
+
+def create_tables(conn: duckdb.DuckDBPyConnection) -> None:
+    """Create all required DuckDB tables, migrating the tables of an older database file first."""
+    # Create sequences first
+    for sequence in ["prs_id_seq", "repos_id_seq", "users_id_seq"]:
+        conn.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+
+    existing_tables = _get_existing_tables(conn)
+    if "prs" in existing_tables:
+        _migrate(conn, from_version=_get_schema_version(conn, existing_tables))
+
+    for table_name, schema in TABLE_SCHEMAS.items():
+        conn.execute(schema)
+        logger.debug(f"Created/verified table: {table_name}")
+
+    if not conn.execute("SELECT version FROM schema_version").fetchall():
+        conn.execute("INSERT INTO schema_version VALUES (?)", [SCHEMA_VERSION])
+
+    # The generation starts at the creation time instead of 0,
+    # so a recreated database never repeats a generation of the old one
+    now = datetime.now(tz=UTC)
+    conn.execute(
+        "INSERT OR IGNORE INTO data_generation (id, generation, changed_at) VALUES (1, ?, ?)",
+        [int(now.timestamp() * 1000), now],
+    )
+
+    if "prs" in existing_tables and not {"reviewer_stats", "reviewer_daily_rollups"} <= existing_tables:
+        # A database from before the stats or the rollups were materialized, build them once from what it holds
+        from .stats import rebuild_all_stats  # noqa: PLC0415
+
+        rebuild_all_stats(conn)
+
+    logger.info("All DuckDB tables created/verified")
+
+
+def _get_existing_tables(conn: duckdb.DuckDBPyConnection) -> set[str]:
+    rows = conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall()
+    return {table_name for (table_name,) in rows}
+
+
+def _get_schema_version(conn: duckdb.DuckDBPyConnection, existing_tables: set[str]) -> int:
+    if "schema_version" not in existing_tables:
+        # Files from before the schema was versioned
+        return 1
+    rows = conn.execute("SELECT version FROM schema_version").fetchall()
+    return rows[0][0] if rows else 1
+
+
+def _migrate(conn: duckdb.DuckDBPyConnection, from_version: int) -> None:
+    if from_version >= SCHEMA_VERSION:
+        return
+
+    logger.info(f"Migrating the DuckDB schema from version {from_version} to {SCHEMA_VERSION}")
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        if from_version < 2:
+            _migrate_to_v2(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER)")
+        conn.execute("DELETE FROM schema_version")
+        conn.execute("INSERT INTO schema_version VALUES (?)", [SCHEMA_VERSION])
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+    # Hands the blocks of the dropped tables back to DuckDB, so they are reused instead of growing the file
+    conn.execute("CHECKPOINT")
+    logger.info(f"Migrated the DuckDB schema to version {SCHEMA_VERSION}")
+
+
+def _migrate_to_v2(conn: duckdb.DuckDBPyConnection) -> None:
+    """Move repo slugs and logins into `repos` and `users`, drop the PR URLs and the reviews foreign key.
+
+    PR ids stay the same, so nothing else that refers to a PR has to change."""
+    # The old tables have to go before the new ones take their names, keep their rows meanwhile
+    conn.execute("CREATE TEMP TABLE v1_prs AS SELECT * FROM prs")
+    conn.execute("CREATE TEMP TABLE v1_reviews AS SELECT * FROM reviews")
+    conn.execute("DROP TABLE reviews")
+    conn.execute("DROP TABLE prs")
+    conn.execute("DROP SEQUENCE IF EXISTS reviews_id_seq")
+
+    for table_name in ["repos", "users", "prs", "reviews"]:
+        conn.execute(TABLE_SCHEMAS[table_name])
+
+    conn.execute("""
+        INSERT INTO repos (slug)
+        SELECT DISTINCT repo_slug FROM v1_prs WHERE repo_slug IS NOT NULL ORDER BY repo_slug
+    """)
+    conn.execute("""
+        INSERT INTO users (login)
+        SELECT login FROM (
+            SELECT author AS login FROM v1_prs
+            UNION
+            SELECT reviewer AS login FROM v1_reviews
+        )
+        WHERE login IS NOT NULL
+        ORDER BY login
+    """)
+    conn.execute("""
+        INSERT INTO prs (id, repo_id, number, title, author_id, created_at, merged_at)
+        SELECT p.id, r.id, p.number, p.title, u.id, p.created_at, p.merged_at
+        FROM v1_prs p
+        LEFT JOIN repos r ON r.slug = p.repo_slug
+        LEFT JOIN users u ON u.login = p.author
+        ORDER BY p.id
+    """)
+    conn.execute("""
+        INSERT INTO reviews (pr_id, reviewer_id, requested_at, first_sign_of_life, first_approve_or_disapprove)
+        SELECT r.pr_id, u.id, r.requested_at, r.first_sign_of_life, r.first_approve_or_disapprove
+        FROM v1_reviews r
+        LEFT JOIN users u ON u.login = r.reviewer
+        ORDER BY r.pr_id
+    """)
+
+    conn.execute("DROP TABLE v1_reviews")
+    conn.execute("DROP TABLE v1_prs")
@@ -0,0 +1,538 @@
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from datetime import timedelta
+from typing import Any
+
+import duckdb
+
+from prsload import metrics
+
+from .client import get_reader
+from .client import get_writer
+from .data_generation import bump_data_generation
+
+logger = logging.getLogger(__name__)
+
+# Reaction times in the daily rollups are a sketch: counts per bucket of reaction times within 2% of each other.
+# Bucket 0 holds reactions within a minute, bucket k >= 1 those from GAMMA^(k-1) up to GAMMA^k minutes.
+_SKETCH_GAMMA = 1.02
+_SKETCH_BUCKET_OF_MINUTES = (
+    f"CASE WHEN minutes < 1 THEN 0 ELSE 1 + floor(ln(minutes) / ln({_SKETCH_GAMMA}))::INTEGER END"
+)
+# The middle of a `bucket`, off by at most 1% from the reaction times in it
+_SKETCH_MINUTES_OF_BUCKET = (
+    f"CASE WHEN bucket = 0 THEN 0.5 ELSE pow({_SKETCH_GAMMA}, bucket - 1) * (1 + {_SKETCH_GAMMA}) / 2 END"
+)
+# The end of the bucket of sketch entry `b`, all reaction times in it are below
+_SKETCH_END_OF_BUCKET = f"CASE WHEN b.bucket = 0 THEN 1 ELSE pow({_SKETCH_GAMMA}, b.bucket) END"
+# The bucket of the review at `{rank}` of a `sketch` sorted by bucket, counting down the reviews up to it.
+# The rank goes in with the initial value, DuckDB mixes up the rows of columns a list_reduce() lambda uses.
+_SKETCH_BUCKET_AT_RANK = """
+    list_reduce(
+        sketch,
+        lambda found, b: {{
+            'bucket': COALESCE(found.bucket, CASE WHEN b.reviews >= found.reviews THEN b.bucket END),
+            'reviews': found.reviews - b.reviews
+        }},
+        {{'bucket': NULL::INTEGER, 'reviews': {rank}}}
+    ).bucket
+"""
+# The day a review counts for: when it was requested, or first answered if it never was. Needs `r` reviews.
+_REVIEW_DAY = "COALESCE(r.requested_at, r.first_sign_of_life, r.first_approve_or_disapprove)::DATE"
+
+
+@dataclass
+class ReviewTimeBucket:
+    """Reviews with a reaction time of at most `minutes`, and their share of all requested reviews."""
+
+    minutes: int
+    num_of_reviews: int
+    percentage: float
+
+
+@dataclass
+class ReviewerStats:
+    """Stats of one reviewer, computed by DuckDB from the materialized `reviewer_stats` row."""
+
+    reviewer: str
+    requested_prs: int = 0
+    commented_prs: int = 0
+    finished_prs: int = 0
+    # "<repo_slug>/pull/<number>" of PRs where the review was requested, but the reviewer never responded
+    no_response_prs: list[str] = field(default_factory=list)
+    # PRs with a reaction time, from the review request to the first sign of life
+    reviewed_prs: int = 0
+    median_reaction_minutes: float | None = None
+    reviews_within: list[ReviewTimeBucket] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ReviewFilter:
+    """Reviews the analytics count: those of the days from `since` to `until`, both included, see `_REVIEW_DAY`,
+    in `repos`, by `reviewers` and on PRs of `authors`. Empty tuples don't filter."""
+
+    since: date
+    until: date
+    repos: tuple[str, ...] = ()
+    reviewers: tuple[str, ...] = ()
+    authors: tuple[str, ...] = ()
+
+    @property
+    def weeks(self) -> list[date]:
+        """The Mondays of the weeks the filter spans."""
+        first_week = self.since - timedelta(days=self.since.weekday())
+        return [first_week + timedelta(weeks=index) for index in range((self.until - first_week).days // 7 + 1)]
+
+    def as_params(self) -> dict[str, Any]:
+        return {
+            "since": self.since,
+            "until": self.until,
+            "repos": list(self.repos),
+            "reviewers": list(self.reviewers),
+            "authors": list(self.authors),
+        }
+
+
+@dataclass
+class WeeklyTrends:
+    """Reviews requested from each reviewer per week, for the `weeks` of a filter."""
+
+    weeks: list[date]
+    requested_by_reviewer: dict[str, list[int]] = field(default_factory=dict)
+
+
+@metrics.DUCKDB_SECONDS.time(operation="reviewer_stats")
+def get_reviewer_stats(
+    review_time_thresholds_minutes: Sequence[int] = (), review_filter: ReviewFilter | None = None
+) -> list[ReviewerStats]:
+    """Read the stats of all reviewers, as they were materialized by the last sync.
+
+    With a `review_filter`, they are summed up from the daily rollups of the days, repos and
+    reviewers it selects instead. Medians and reviews within the thresholds then come from the
+    reviews per bucket of the reaction time sketches. Medians are off by at most 1%. Reviews within
+    a threshold only count the buckets that end at or below it, so they can leave out reactions
+    up to 2% faster than the threshold. The rollups don't know the PR authors, a filter by
+    authors is answered from the stored reviews.
+
+    The median and the reviews within each of the thresholds are computed by DuckDB
+    from the reaction times, the reaction times themselves never reach Python."""
+    thresholds = [int(minutes) for minutes in review_time_thresholds_minutes]
+    params: dict[str, Any] = {"thresholds": thresholds}
+    if review_filter and review_filter.authors:
+        per_reviewer = _STATS_OF_REACTION_TIMES.format(source=f"""(
+                SELECT {_REVIEWER_STATS_COLUMNS}
+                {_FILTERED_REVIEWS}
+                GROUP BY u.login
+            )""")
+        params |= review_filter.as_params()
+    elif review_filter:
+        per_reviewer = _SUMMED_ROLLUPS
+        params |= review_filter.as_params()
+    else:
+        per_reviewer = _STATS_OF_REACTION_TIMES.format(source="reviewer_stats")
+
+    with get_reader() as conn:
+        rows = conn.execute(
+            f"""
+            WITH per_reviewer AS ({per_reviewer})
+            SELECT
+                reviewer,
+                requested_prs,
+                commented_prs,
+                finished_prs,
+                no_response_prs,
+                reviewed_prs,
+                median_reaction_minutes,
+                reviews_within,
+                -- round_even rounds halves like Python's round()
+                list_transform(
+                    reviews_within,
+                    lambda num_of_reviews: CASE
+                        WHEN reviewed_prs = 0 THEN 0.0
+                        ELSE round_even(100.0 * num_of_reviews / (reviewed_prs + len(no_response_prs)), 0)
+                    END
+                ) AS percentages_within
+            FROM per_reviewer
+            ORDER BY reviewer
+            """,
+            params,
+        ).fetchall()
+
+    return [
+        ReviewerStats(
+            reviewer=reviewer,
+            requested_prs=requested_prs,
+            commented_prs=commented_prs,
+            finished_prs=finished_prs,
+            no_response_prs=no_response_prs,
+            reviewed_prs=reviewed_prs,
+            median_reaction_minutes=median_reaction_minutes,
+            reviews_within=[
+                ReviewTimeBucket(minutes=minutes, num_of_reviews=num_of_reviews, percentage=percentage)
+                for minutes, num_of_reviews, percentage in zip(
+                    thresholds, reviews_within, percentages_within, strict=True
+                )
+            ],
+        )
+        for (
+            reviewer,
+            requested_prs,
+            commented_prs,
+            finished_prs,
+            no_response_prs,
+            reviewed_prs,
+            median_reaction_minutes,
+            reviews_within,
+            percentages_within,
+        ) in rows
+    ]
+
+
+@metrics.DUCKDB_SECONDS.time(operation="weekly_trends")
+def get_weekly_trends(review_filter: ReviewFilter) -> WeeklyTrends:
+    """Reviews requested from each reviewer per week, summed up from the daily rollups like `get_reviewer_stats()`."""
+    if review_filter.authors:
+        query = f"""
+            SELECT u.login, date_trunc('week', {_REVIEW_DAY}), COUNT(r.requested_at)
+            {_FILTERED_REVIEWS}
+            GROUP BY ALL
+        """
+    else:
+        query = f"SELECT reviewer, date_trunc('week', day), SUM(requested) {_FILTERED_ROLLUPS} GROUP BY ALL"
+    with get_reader() as conn:
+        rows = conn.execute(query, review_filter.as_params()).fetchall()
+
+    trends = WeeklyTrends(weeks=review_filter.weeks)
+    week_indexes = {week: index for index, week in enumerate(trends.weeks)}
+    for reviewer, week, requested in rows:
+        weekly = trends.requested_by_reviewer.setdefault(reviewer, [0] * len(trends.weeks))
+        weekly[week_indexes[week]] = int(requested)
+    return trends
+
+
+@metrics.DUCKDB_SECONDS.time(operation="refresh_stats")
+def refresh_stats(full: bool = False) -> tuple[int, int]:
+    """Rebuild the stats of reviewers and repos whose PRs changed since the last refresh.
+
+    `store_prs` marks them stale in the same transaction as the PRs, so the
+    markers survive an interrupted sync. With `full`, everything is rebuilt.
+    The data generation is bumped when anything was rebuilt.
+    Returns the number of refreshed reviewers and repos."""
+    with get_writer() as conn:
+        if full:
+            _mark_all_stats_stale(conn)
+        num_of_reviewers, num_of_repos = _refresh_stale_stats(conn)
+        if num_of_reviewers or num_of_repos:
+            bump_data_generation(conn)
+
+    logger.info(f"Refreshed stats of {num_of_reviewers} reviewers and {num_of_repos} repos {full=}")
+    return num_of_reviewers, num_of_repos
+
+
+def mark_stats_stale(conn: duckdb.DuckDBPyConnection) -> None:
+    """Mark reviewers and repos of the PRs in `staging_prs` and `staging_reviews` as stale.
+
+    Has to run before the old reviews are replaced, a reviewer who was dropped from a PR needs a refresh too."""
+    conn.execute("""
+        INSERT OR IGNORE INTO stale_reviewer_stats
+        SELECT u.login
+        FROM reviews r
+        JOIN users u ON u.id = r.reviewer_id
+        JOIN prs p ON p.id = r.pr_id
+        JOIN repos repo ON repo.id = p.repo_id
+        JOIN staging_prs s ON repo.slug = s.repo_slug AND p.number = s.number
+        UNION
+        SELECT reviewer FROM staging_reviews WHERE reviewer IS NOT NULL
+    """)
+    conn.execute("INSERT OR IGNORE INTO stale_repo_stats SELECT DISTINCT repo_slug FROM staging_prs")
+    conn.execute(f"""
+        INSERT OR IGNORE INTO stale_rollups
+        SELECT u.login, repo.slug, {_REVIEW_DAY}
+        FROM reviews r
+        JOIN users u ON u.id = r.reviewer_id
+        JOIN prs p ON p.id = r.pr_id
+        JOIN repos repo ON repo.id = p.repo_id
+        JOIN staging_prs s ON repo.slug = s.repo_slug AND p.number = s.number
+        UNION
+        SELECT r.reviewer, r.repo_slug, {_REVIEW_DAY} FROM staging_reviews r WHERE r.reviewer IS NOT NULL
+    """)
+
+
+def refresh_all_stats(conn: duckdb.DuckDBPyConnection) -> tuple[int, int]:
+    """Rebuild the stats of every reviewer and repo and bump the data generation, with the writer's `conn`.
+
+    Returns the number of refreshed reviewers and repos."""
+    _mark_all_stats_stale(conn)
+    num_of_reviewers, num_of_repos = _refresh_stale_stats(conn)
+    bump_data_generation(conn)
+    return num_of_reviewers, num_of_repos
+
+
+def rebuild_all_stats(conn: duckdb.DuckDBPyConnection) -> None:
+    """Build the stats of every reviewer and repo in one transaction, on a connection outside of one."""
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        num_of_reviewers, num_of_repos = refresh_all_stats(conn)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    logger.info(f"Built stats of {num_of_reviewers} reviewers and {num_of_repos} repos")
+
+
+def delete_all_stats(conn: duckdb.DuckDBPyConnection) -> None:
+    for table_name in [
+        "reviewer_stats",
+        "repo_stats",
+        "reviewer_daily_rollups",
+        "stale_reviewer_stats",
+        "stale_repo_stats",
+        "stale_rollups",
+    ]:
+        conn.execute(f"DELETE FROM {table_name}")
+
+
+def _mark_all_stats_stale(conn: duckdb.DuckDBPyConnection) -> None:
+    # Reviewers and repos that are materialized, but have no rows anymore, have to go as well
+    conn.execute("""
+        INSERT OR IGNORE INTO stale_reviewer_stats
+        SELECT u.login FROM users u WHERE EXISTS (SELECT 1 FROM reviews r WHERE r.reviewer_id = u.id)
+        UNION
+        SELECT reviewer FROM reviewer_stats
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO stale_repo_stats
+        SELECT r.slug FROM repos r WHERE EXISTS (SELECT 1 FROM prs p WHERE p.repo_id = r.id)
+        UNION
+        SELECT repo_slug FROM repo_stats
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO stale_rollups
+        SELECT u.login, repo.slug, {_REVIEW_DAY}
+        FROM reviews r
+        JOIN users u ON u.id = r.reviewer_id
+        JOIN prs p ON p.id = r.pr_id
+        JOIN repos repo ON repo.id = p.repo_id
+        UNION
+        SELECT reviewer, repo_slug, day FROM reviewer_daily_rollups
+    """)
+
+
+# Reviews the filtering policy leaves out, see policy.py: reviews of ignored reviewers, of PRs by ignored
+# authors, of the author's own PR and reviews requested while the reviewer was on vacation.
+# DuckDB runs the NOT EXISTS as anti-joins. Needs `r` reviews, `u` reviewers and `p` PRs.
+_REVIEW_POLICY_FILTER = """
+    r.reviewer_id IS DISTINCT FROM p.author_id
+    AND NOT EXISTS (SELECT 1 FROM ignored_users i WHERE i.role = 'reviewer' AND i.login = u.login)
+    AND NOT EXISTS (
+        SELECT 1 FROM ignored_users i JOIN users a ON a.login = i.login WHERE i.role = 'author' AND a.id = p.author_id
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM vacations v WHERE v.login = u.login AND r.requested_at BETWEEN v.starts_at AND v.ends_at
+    )
+"""
+# PRs the filtering policy leaves out: PRs of ignored authors. Needs `p` PRs.
+_PR_POLICY_FILTER = """
+    NOT EXISTS (
+        SELECT 1 FROM ignored_users i JOIN users a ON a.login = i.login WHERE i.role = 'author' AND a.id = p.author_id
+    )
+"""
+# A reviewer_stats row from `r` reviews, `u` reviewers, `p` PRs and their `repo`, grouped by reviewer
+_REVIEWER_STATS_COLUMNS = """
+    u.login AS reviewer,
+    COUNT(DISTINCT p.id) FILTER (WHERE r.requested_at IS NOT NULL) AS requested_prs,
+    COUNT(DISTINCT p.id) FILTER (WHERE r.first_sign_of_life IS NOT NULL) AS commented_prs,
+    COUNT(DISTINCT p.id) FILTER (WHERE r.first_approve_or_disapprove IS NOT NULL) AS finished_prs,
+    COALESCE(
+        list_sort(LIST(DISTINCT repo.slug || '/pull/' || p.number)
+            FILTER (WHERE r.requested_at IS NOT NULL AND r.first_sign_of_life IS NULL)),
+        []
+    ) AS no_response_prs,
+    COALESCE(
+        LIST(GREATEST(EXTRACT(EPOCH FROM (r.first_sign_of_life - r.requested_at)) / 60.0, 0))
+            FILTER (WHERE r.requested_at IS NOT NULL AND r.first_sign_of_life IS NOT NULL),
+        []
+    ) AS reaction_times_minutes
+"""
+# The stats of the reviewers of a reviewer_stats `{source}`, with the median and the reviews within $thresholds
+# of their `reaction_times_minutes`
+_STATS_OF_REACTION_TIMES = """
+    SELECT
+        reviewer,
+        requested_prs,
+        commented_prs,
+        finished_prs,
+        no_response_prs,
+        len(reaction_times_minutes) AS reviewed_prs,
+        list_median(reaction_times_minutes) AS median_reaction_minutes,
+        list_transform(
+            $thresholds::INTEGER[],
+            lambda threshold: list_count(list_filter(reaction_times_minutes, lambda m: m <= threshold))
+        ) AS reviews_within
+    FROM {source}
+"""
+# Reviews and rollups a ReviewFilter selects, its `as_params()` are the parameters
+_FILTERED_REVIEWS = f"""
+    FROM reviews r
+    JOIN users u ON u.id = r.reviewer_id
+    JOIN prs p ON p.id = r.pr_id
+    JOIN repos repo ON repo.id = p.repo_id
+    LEFT JOIN users author ON author.id = p.author_id
+    WHERE {_REVIEW_DAY} BETWEEN $since AND $until
+        AND (len($repos) = 0 OR list_contains($repos, repo.slug))
+        AND (len($reviewers) = 0 OR list_contains($reviewers, u.login))
+        AND (len($authors) = 0 OR list_contains($authors, author.login))
+        AND {_REVIEW_POLICY_FILTER}
+"""
+_FILTERED_ROLLUPS = """
+    FROM reviewer_daily_rollups
+    WHERE day BETWEEN $since AND $until
+        AND (len($repos) = 0 OR list_contains($repos, repo_slug))
+        AND (len($reviewers) = 0 OR list_contains($reviewers, reviewer))
+        AND len($authors) = 0
+"""
+# The stats of the reviewers in the rollups a ReviewFilter selects, like _STATS_OF_REACTION_TIMES but from the
+# sketches. Their buckets are summed up per reviewer first, to at most a few hundred however many days are
+# selected. Medians come from the buckets of the middle reviews, reviews within $thresholds from the buckets
+# that end at or below them.
+_SUMMED_ROLLUPS = f"""
+    WITH totals AS (
+        SELECT
+            reviewer,
+            SUM(requested)::INTEGER AS requested_prs,
+            SUM(commented)::INTEGER AS commented_prs,
+            SUM(finished)::INTEGER AS finished_prs,
+            list_sort(flatten(LIST(no_response_prs))) AS no_response_prs
+        {_FILTERED_ROLLUPS}
+        GROUP BY reviewer
+    ),
+    reactions AS (
+        SELECT
+            reviewer,
+            SUM(reviews)::INTEGER AS reviewed_prs,
+            LIST({{'bucket': bucket, 'reviews': reviews}} ORDER BY bucket) AS sketch
+        FROM (
+            SELECT reviewer, entry.bucket AS bucket, SUM(entry.reviews) AS reviews
+            FROM (SELECT reviewer, unnest(reaction_sketch) AS entry {_FILTERED_ROLLUPS})
+            GROUP BY ALL
+        )
+        GROUP BY reviewer
+    )
+    SELECT
+        reviewer,
+        requested_prs,
+        commented_prs,
+        finished_prs,
+        no_response_prs,
+        COALESCE(reviewed_prs, 0) AS reviewed_prs,
+        -- The same bucket twice for an odd number of reviews
+        list_avg(list_transform(
+            [
+                {_SKETCH_BUCKET_AT_RANK.format(rank="(reviewed_prs + 1) // 2")},
+                {_SKETCH_BUCKET_AT_RANK.format(rank="reviewed_prs // 2 + 1")}
+            ],
+            lambda bucket: {_SKETCH_MINUTES_OF_BUCKET}
+        )) AS median_reaction_minutes,
+        list_transform(
+            $thresholds::INTEGER[],
+            lambda threshold: COALESCE(list_sum(list_transform(
+                list_filter(sketch, lambda b: {_SKETCH_END_OF_BUCKET} <= threshold), lambda b: b.reviews
+            )), 0)::INTEGER
+        ) AS reviews_within
+    FROM totals
+    LEFT JOIN reactions USING (reviewer)
+"""
+
+
+def _refresh_stale_stats(conn: duckdb.DuckDBPyConnection) -> tuple[int, int]:
+    [(num_of_reviewers, num_of_repos)] = conn.execute(
+        "SELECT (SELECT COUNT(*) FROM stale_reviewer_stats), (SELECT COUNT(*) FROM stale_repo_stats)"
+    ).fetchall()
+
+    conn.execute("DELETE FROM reviewer_stats WHERE reviewer IN (SELECT reviewer FROM stale_reviewer_stats)")
+    conn.execute(f"""
+        INSERT INTO reviewer_stats
+        SELECT {_REVIEWER_STATS_COLUMNS}, now() AT TIME ZONE 'UTC'
+        FROM reviews r
+        JOIN users u ON u.id = r.reviewer_id
+        JOIN prs p ON p.id = r.pr_id
+        JOIN repos repo ON repo.id = p.repo_id
+        WHERE u.login IN (SELECT reviewer FROM stale_reviewer_stats) AND {_REVIEW_POLICY_FILTER}
+        GROUP BY u.login
+    """)
+    conn.execute("DELETE FROM stale_reviewer_stats")
+
+    conn.execute("DELETE FROM repo_stats WHERE repo_slug IN (SELECT repo_slug FROM stale_repo_stats)")
+    conn.execute(f"""
+        INSERT INTO repo_stats
+        SELECT r.slug, COUNT(*), MAX(p.created_at), now() AT TIME ZONE 'UTC'
+        FROM prs p
+        JOIN repos r ON r.id = p.repo_id
+        WHERE r.slug IN (SELECT repo_slug FROM stale_repo_stats) AND {_PR_POLICY_FILTER}
+        GROUP BY r.slug
+    """)
+    conn.execute("DELETE FROM stale_repo_stats")
+
+    _refresh_stale_rollups(conn)
+    return num_of_reviewers, num_of_repos
+
+
+def _refresh_stale_rollups(conn: duckdb.DuckDBPyConnection) -> None:
+    """Rebuild the daily rollups of the stale (reviewer, repo, day)s from their reviews."""
+    conn.execute("""
+        DELETE FROM reviewer_daily_rollups d
+        USING stale_rollups s
+        WHERE d.reviewer = s.reviewer AND d.repo_slug = s.repo_slug AND d.day = s.day
+    """)
+    # Grouped by reaction time bucket first, so every rollup gets one sketch entry per bucket
+    conn.execute(f"""
+        INSERT INTO reviewer_daily_rollups
+        SELECT
+            reviewer,
+            repo_slug,
+            day,
+            SUM(requested),
+            SUM(commented),
+            SUM(finished),
+            flatten(LIST(no_response_prs)),
+            COALESCE(LIST({{'bucket': bucket, 'reviews': reviews}}) FILTER (WHERE bucket IS NOT NULL), [])
+        FROM (
+            SELECT
+                reviewer,
+                repo_slug,
+                day,
+                {_SKETCH_BUCKET_OF_MINUTES} AS bucket,
+                COUNT(requested_at) AS requested,
+                COUNT(first_sign_of_life) AS commented,
+                COUNT(first_approve_or_disapprove) AS finished,
+                COALESCE(LIST(pr_slug) FILTER (WHERE requested_at IS NOT NULL AND first_sign_of_life IS NULL), [])
+                    AS no_response_prs,
+                COUNT(*) AS reviews
+            FROM (
+                SELECT
+                    u.login AS reviewer,
+                    repo.slug AS repo_slug,
+                    {_REVIEW_DAY} AS day,
+                    repo.slug || '/pull/' || p.number AS pr_slug,
+                    r.requested_at,
+                    r.first_sign_of_life,
+                    r.first_approve_or_disapprove,
+                    -- GREATEST() skips NULLs, reviews without a reaction time have to stay NULL
+                    CASE WHEN r.requested_at IS NOT NULL AND r.first_sign_of_life IS NOT NULL
+                        THEN GREATEST(EXTRACT(EPOCH FROM (r.first_sign_of_life - r.requested_at)) / 60.0, 0)
+                    END AS minutes
+                FROM reviews r
+                JOIN users u ON u.id = r.reviewer_id
+                JOIN prs p ON p.id = r.pr_id
+                JOIN repos repo ON repo.id = p.repo_id
+                JOIN stale_rollups s ON s.reviewer = u.login AND s.repo_slug = repo.slug AND s.day = {_REVIEW_DAY}
+                WHERE {_REVIEW_POLICY_FILTER}
+            )
+            GROUP BY reviewer, repo_slug, day, bucket
+        )
+        GROUP BY reviewer, repo_slug, day
+    """)
+    conn.execute("DELETE FROM stale_rollups")
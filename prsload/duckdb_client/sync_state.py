@@ -0,0 +1,219 @@
+import logging
+import uuid
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+
+import duckdb
+
+from .client import get_reader
+from .client import get_writer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RepoWatermark:
+    """How far a repo has already been synced.
+
+    `last_updated_at` is the newest PR `updatedAt` we have stored, PRs updated
+    before it are already in the DB and don't need to be fetched again."""
+
+    repo_slug: str
+    last_updated_at: datetime | None
+    synced_at: datetime | None
+
+
+@dataclass
+class SyncRun:
+    """One sync of all repos. It stays unfinished if the sync was interrupted."""
+
+    id: str
+    full_resync: bool
+    started_at: datetime
+    finished_at: datetime | None = None
+
+
+@dataclass
+class SyncCheckpoint:
+    """How far a sync run got with one repo.
+
+    It is stored in the same transaction as the page of PRs it points after,
+    so a resumed run continues from `end_cursor` without fetching stored pages again."""
+
+    run_id: str
+    repo_slug: str
+    end_cursor: str | None = None
+    # Newest `updatedAt` of the pages stored so far, becomes the repo watermark when the repo is done
+    newest_updated_at: datetime | None = None
+    is_done: bool = False
+
+
+def get_repo_watermarks() -> dict[str, RepoWatermark]:
+    """Return watermarks of all repos that were synced before, by repo slug."""
+    with get_reader() as conn:
+        rows = conn.execute("SELECT repo_slug, last_updated_at, synced_at FROM repo_sync_state").fetchall()
+
+    return {
+        repo_slug: RepoWatermark(
+            repo_slug=repo_slug,
+            last_updated_at=_as_utc(last_updated_at),
+            synced_at=_as_utc(synced_at),
+        )
+        for repo_slug, last_updated_at, synced_at in rows
+    }
+
+
+def store_repo_watermark(
+    repo_slug: str,
+    last_updated_at: datetime | None,
+    synced_at: datetime,
+    run_id: str | None = None,
+) -> None:
+    """Remember the newest `updatedAt` seen for the repo.
+
+    If this sync saw no PRs at all (`last_updated_at` is None), the previous
+    watermark is kept and only the sync time moves forward.
+    With `run_id`, the repo is marked as done in that run's checkpoints, in the same transaction."""
+    with get_writer() as conn:
+        if run_id:
+            upsert_sync_checkpoint(
+                conn,
+                SyncCheckpoint(run_id=run_id, repo_slug=repo_slug, newest_updated_at=last_updated_at, is_done=True),
+            )
+        conn.execute(
+            """
+            INSERT INTO repo_sync_state (repo_slug, last_updated_at, synced_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (repo_slug) DO UPDATE SET
+                last_updated_at = COALESCE(EXCLUDED.last_updated_at, repo_sync_state.last_updated_at),
+                synced_at = EXCLUDED.synced_at
+            """,
+            [repo_slug, last_updated_at, synced_at],
+        )
+    logger.debug(f"Stored sync watermark for {repo_slug}: {last_updated_at=} {synced_at=}")
+
+
+def start_sync_run(full_resync: bool) -> tuple[SyncRun, bool]:
+    """Return the interrupted sync run to resume, or start a new one.
+
+    The second value is True when an interrupted run is resumed. A full resync
+    does not resume an interrupted incremental run, it starts over. A resumed
+    full resync also covers an incremental one, so it is resumed either way.
+    A new incremental run takes over the checkpoints of repos that failed in the last run,
+    a new full resync drops them."""
+    with get_writer() as conn:
+        row = conn.execute("""
+            SELECT id, full_resync, started_at FROM sync_runs
+            WHERE finished_at IS NULL
+            ORDER BY started_at DESC
+            LIMIT 1
+        """).fetchone()
+        if row is not None:
+            run = SyncRun(id=row[0], full_resync=row[1], started_at=_as_utc(row[2]) or datetime.now(tz=UTC))
+            if run.full_resync or not full_resync:
+                logger.info(f"Resuming the interrupted sync run {run.id} started at {run.started_at}")
+                return run, True
+
+            logger.info(f"Abandoning the interrupted sync run {run.id}, a full resync was requested")
+            conn.execute("DELETE FROM sync_checkpoints WHERE run_id = ?", [run.id])
+            _mark_sync_run_finished(conn, run.id)
+
+        run = SyncRun(id=uuid.uuid4().hex, full_resync=full_resync, started_at=datetime.now(tz=UTC))
+        conn.execute(
+            "INSERT INTO sync_runs (id, full_resync, started_at) VALUES (?, ?, ?)",
+            [run.id, run.full_resync, run.started_at],
+        )
+        if not full_resync:
+            # Repos that failed in the last run continue after their last stored page
+            conn.execute(
+                """
+                INSERT INTO sync_checkpoints (run_id, repo_slug, end_cursor, newest_updated_at, is_done)
+                SELECT ?, repo_slug, end_cursor, newest_updated_at, is_done FROM sync_checkpoints
+                WHERE run_id IN (SELECT id FROM sync_runs WHERE finished_at IS NOT NULL)
+                """,
+                [run.id],
+            )
+        conn.execute(
+            "DELETE FROM sync_checkpoints WHERE run_id IN (SELECT id FROM sync_runs WHERE finished_at IS NOT NULL)"
+        )
+    return run, False
+
+
+def get_sync_checkpoints(run_id: str) -> dict[str, SyncCheckpoint]:
+    """Return checkpoints of the sync run, by repo slug."""
+    with get_reader() as conn:
+        rows = conn.execute(
+            "SELECT repo_slug, end_cursor, newest_updated_at, is_done FROM sync_checkpoints WHERE run_id = ?",
+            [run_id],
+        ).fetchall()
+
+    return {
+        repo_slug: SyncCheckpoint(
+            run_id=run_id,
+            repo_slug=repo_slug,
+            end_cursor=end_cursor,
+            newest_updated_at=_as_utc(newest_updated_at),
+            is_done=is_done,
+        )
+        for repo_slug, end_cursor, newest_updated_at, is_done in rows
+    }
+
+
+def upsert_sync_checkpoint(conn: duckdb.DuckDBPyConnection, checkpoint: SyncCheckpoint) -> None:
+    """Store the checkpoint with the writer's `conn`, inside the transaction that stored its page."""
+    conn.execute(
+        """
+        INSERT INTO sync_checkpoints (run_id, repo_slug, end_cursor, newest_updated_at, is_done)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (run_id, repo_slug) DO UPDATE SET
+            end_cursor = COALESCE(EXCLUDED.end_cursor, sync_checkpoints.end_cursor),
+            newest_updated_at = COALESCE(EXCLUDED.newest_updated_at, sync_checkpoints.newest_updated_at),
+            is_done = EXCLUDED.is_done
+        """,
+        [
+            checkpoint.run_id,
+            checkpoint.repo_slug,
+            checkpoint.end_cursor,
+            checkpoint.newest_updated_at,
+            checkpoint.is_done,
+        ],
+    )
+
+
+def finish_sync_run(run_id: str, unfinished_repos: Iterable[str] = ()) -> None:
+    """Mark the sync run as finished, the next sync starts a new run.
+
+    Checkpoints of the repos that finished are dropped. Those of `unfinished_repos` are kept,
+    so the next run continues them instead of fetching their stored pages again."""
+    with get_writer() as conn:
+        conn.execute(
+            "DELETE FROM sync_checkpoints WHERE run_id = ? AND NOT list_contains(?::VARCHAR[], repo_slug)",
+            [run_id, list(unfinished_repos)],
+        )
+        _mark_sync_run_finished(conn, run_id)
+    logger.debug(f"Finished sync run {run_id}")
+
+
+def store_sync_metrics(run_id: str, summary: dict[str, float]) -> None:
+    """Add what the metrics counted during the sync run to its stored summary."""
+    if not summary:
+        return
+    with get_writer() as conn:
+        conn.executemany(
+            """
+            INSERT INTO sync_run_metrics (run_id, metric, value) VALUES (?, ?, ?)
+            ON CONFLICT (run_id, metric) DO UPDATE SET value = sync_run_metrics.value + EXCLUDED.value
+            """,
+            [(run_id, metric, value) for metric, value in summary.items()],
+        )
+
+
+def _mark_sync_run_finished(conn: duckdb.DuckDBPyConnection, run_id: str) -> None:
+    conn.execute("UPDATE sync_runs SET finished_at = ? WHERE id = ?", [datetime.now(tz=UTC), run_id])
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # TIMESTAMP columns store UTC, see ConnectionManager, but come back as naive datetimes
+    return value.replace(tzinfo=UTC) if value else None
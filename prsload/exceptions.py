@@ -1,3 +1,6 @@
+from requests import Response
+
+
 class PRAnalyticsError(Exception):
     """Base exception class for PR Analytics application"""
 
@@ -6,19 +9,28 @@ class SettingsError(PRAnalyticsError):
     """Raised when configuration/settings are invalid"""
 
 
+class InvalidDataError(PRAnalyticsError):
+    """Raised when data to be stored in DuckDB breaks the relations between the tables"""
+
+
 class GitHubException(PRAnalyticsError):
     def __init__(
         self,
         msg: str,
+        *,
         gql_errors: list[dict] | None = None,
         query: str | None = None,
         variables: dict | None = None,
+        response: Response | None = None,
     ):
         self.gql_errors = gql_errors
         self.query = query
         self.variables = variables
+        # The failed response, if GitHub answered at all
+        self.status_code: int | None = response.status_code if response is not None else None
+        self.headers: dict[str, str] = dict(response.headers) if response is not None else {}
 
-        if user_msgs := self.user_error_desc():
+        if user_msgs := self._user_error_desc():
             msg = f"{msg} {user_msgs}"
 
         super().__init__(msg)
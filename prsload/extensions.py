@@ -2,6 +2,8 @@ from typing import TYPE_CHECKING
 
 from prsload.templatetags.template_filters import choose_color_for_missing_reviews
 from prsload.templatetags.template_filters import choose_color_for_review_time
+from prsload.templatetags.template_filters import format_minutes
+from prsload.templatetags.template_filters import sparkline_points
 
 if TYPE_CHECKING:
     from flask import Flask
@@ -19,3 +21,15 @@ def register_template_filters(app: "Flask") -> None:
     def colorful_percentage_for_missing_reviews(value: float) -> str:
         color = choose_color_for_missing_reviews(value)
         return f"<span class='bg-[{color}] text-white p-1 rounded'>{value}&nbsp;%</span>"
+
+    @app.template_filter("duration_from_minutes")
+    def duration_from_minutes(value: int) -> str:
+        return format_minutes(value)
+
+    @app.template_filter("sparkline")
+    def sparkline(values: list[int], width: int = 120, height: int = 24) -> str:
+        points = sparkline_points(values, width, height)
+        return (
+            f"<svg width='{width}' height='{height + 2}' viewBox='0 -1 {width} {height + 2}'>"
+            f"<polyline points='{points}' fill='none' stroke='#2563eb' stroke-width='1.5'/></svg>"
+        )
@@ -0,0 +1,16 @@
+# A local stand-in for GitHub's GraphQL API, to sync without network and load-test the sync
+from .org import FakeOrg
+from .server import FakeBackend
+from .server import FakeGitHubServer
+from .server import FaultInjection
+from .server import ReplayBackend
+from .server import SyntheticBackend
+
+__all__ = [
+    "FakeBackend",
+    "FakeGitHubServer",
+    "FakeOrg",
+    "FaultInjection",
+    "ReplayBackend",
+    "SyntheticBackend",
+]
@@ -0,0 +1,322 @@
+import base64
+import logging
+import random
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+
+from prsload.github.recording import get_operation_name
+
+logger = logging.getLogger(__name__)
+
+# Like GitHub's, search never finds more than this many results for one query
+SEARCH_RESULTS_CAP = 1000
+REPOS_PER_PAGE = 100
+_REVIEW_STATES = ("APPROVED", "COMMENTED", "CHANGES_REQUESTED", "COMMENTED")
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_SEARCH_REPO = re.compile(r"repo:(\S+)/(\S+)")
+_SEARCH_UPDATED = re.compile(r"updated:(\S+)\.\.(\S+)")
+# `{ viewer { login } }` and `{ rateLimit { ... } }`, alone or together, the only unnamed queries answered
+_ANONYMOUS_QUERY = re.compile(
+    r"\s*(?:query\s*)?\{\s*(?:viewer\s*\{\s*login\s*\}\s*)?(?:rateLimit\s*\{[\w\s]*\}\s*)?\}\s*"
+)
+
+
+class FakeQueryError(Exception):
+    """The query can't be answered, it's returned in the `errors` of the response like GitHub does."""
+
+    def __init__(self, message: str, error_type: str | None = None):
+        self.error_type = error_type
+        super().__init__(message)
+
+
+@dataclass
+class FakePR:
+    """A PR with all its reviews and review requests, pages of them are cut out per query."""
+
+    node_id: str
+    repo_name: str
+    number: int
+    title: str
+    author: str
+    created_at: datetime
+    updated_at: datetime
+    merged_at: datetime | None
+    reviews: list[dict] = field(default_factory=list)
+    review_requests: list[dict] = field(default_factory=list)
+
+
+def generate_repo_prs(  # noqa: PLR0913
+    *,
+    seed: int,
+    repo_index: int,
+    num_of_prs: int,
+    users: list[str],
+    max_reviews_per_pr: int,
+    days: int,
+    now: datetime,
+) -> list[FakePR]:
+    """PRs of one repo, most recently updated first.
+
+    Every repo has its own random generator seeded by `seed` and its index,
+    so a repo is always the same, whether or not the repos before it are generated."""
+    rnd = random.Random(f"{seed}:{repo_index}")
+    prs = [
+        _generate_pr(
+            rnd, users, repo_index=repo_index, number=number, max_reviews=max_reviews_per_pr, days=days, now=now
+        )
+        for number in range(1, num_of_prs + 1)
+    ]
+    prs.sort(key=lambda pr: pr.updated_at, reverse=True)
+    return prs
+
+
+def _generate_pr(  # noqa: PLR0913
+    rnd: random.Random,
+    users: list[str],
+    *,
+    repo_index: int,
+    number: int,
+    max_reviews: int,
+    days: int,
+    now: datetime,
+) -> FakePR:
+    created_at = now - timedelta(minutes=rnd.randint(60, days * 24 * 60))
+    updated_at = min(created_at + timedelta(minutes=rnd.randint(0, 14 * 24 * 60)), now)
+    merged_at = updated_at if rnd.random() < 0.75 else None
+    author = rnd.choice(users)
+    pr = FakePR(
+        node_id=_node_id("PR", repo_index, number),
+        repo_name=f"repo{repo_index}",
+        number=number,
+        title=f"Change number {number}",
+        author=author,
+        created_at=created_at,
+        updated_at=updated_at,
+        merged_at=merged_at,
+    )
+
+    candidates = [user for user in users if user != author]
+    reviewers = rnd.sample(candidates, k=min(rnd.randint(0, max_reviews), len(candidates)))
+    for reviewer in reviewers:
+        requested_at = created_at + timedelta(minutes=rnd.randint(0, 60))
+        pr.review_requests.append(
+            {
+                "__typename": "ReviewRequestedEvent",
+                "requestedReviewer": {"__typename": "User", "login": reviewer},
+                "createdAt": _format_date(requested_at),
+            }
+        )
+        if rnd.random() < 0.8:
+            published_at = requested_at + timedelta(minutes=rnd.randint(1, 3 * 24 * 60))
+            pr.reviews.append(
+                {
+                    "author": {"login": reviewer},
+                    "publishedAt": _format_date(min(published_at, now)),
+                    "state": rnd.choice(_REVIEW_STATES),
+                }
+            )
+    if rnd.random() < 0.05:
+        # Teams have no login, the sync has to skip them
+        pr.review_requests.append(
+            {
+                "__typename": "ReviewRequestedEvent",
+                "requestedReviewer": {"__typename": "Team"},
+                "createdAt": _format_date(created_at),
+            }
+        )
+    return pr
+
+
+def generate_users(num_of_users: int) -> list[str]:
+    return [f"user{index}" for index in range(num_of_users)]
+
+
+def pr_node(pr: FakePR, login: str, items_limit: int) -> dict:
+    """The PR as GitHub returns it for the `PRFields` fragment, with the first page of its reviews."""
+    return {
+        "id": pr.node_id,
+        "number": pr.number,
+        "title": pr.title,
+        "url": f"https://github.com/{login}/{pr.repo_name}/pull/{pr.number}",
+        "createdAt": _format_date(pr.created_at),
+        "updatedAt": _format_date(pr.updated_at),
+        "mergedAt": _format_date(pr.merged_at) if pr.merged_at else None,
+        "closedAt": _format_date(pr.merged_at) if pr.merged_at else None,
+        "author": {"login": pr.author},
+        "reviews": _page(pr.reviews, items_limit, None),
+        "timelineItems": _page(pr.review_requests, items_limit, None),
+    }
+
+
+class FakeOrg:
+    """A synthetic GitHub organization that answers the GraphQL queries of the sync.
+
+    The same `seed` always generates the same repos, PRs and reviews, with dates
+    relative to `now`. Queries are recognised by their operation name and answered
+    with the shape GitHub would return, paged with opaque cursors. Only the queries
+    in prsload/github and the viewer check of the home page are supported, anything else
+    is answered with an error."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        login: str = "org",
+        num_of_repos: int = 20,
+        prs_per_repo: int = 200,
+        max_reviews_per_pr: int = 3,
+        num_of_users: int = 30,
+        days: int = 365,
+        seed: int = 1,
+        now: datetime | None = None,
+    ):
+        self.login = login
+        self.now = (now or datetime.now(tz=UTC)).replace(microsecond=0)
+
+        users = generate_users(num_of_users)
+        # In the order the repos query returns them
+        self.repos: dict[str, list[FakePR]] = {}
+        self._prs_by_node_id: dict[str, FakePR] = {}
+        for repo_index in range(num_of_repos):
+            prs = generate_repo_prs(
+                seed=seed,
+                repo_index=repo_index,
+                num_of_prs=prs_per_repo,
+                users=users,
+                max_reviews_per_pr=max_reviews_per_pr,
+                days=days,
+                now=self.now,
+            )
+            self.repos[f"repo{repo_index}"] = prs
+            self._prs_by_node_id.update((pr.node_id, pr) for pr in prs)
+
+        logger.info(f"Generated fake org {login} with {num_of_repos} repos of {prs_per_repo} PRs {seed=}")
+
+    def answer(self, query: str, variables: dict) -> tuple[dict, int]:
+        """The response body of the query, and what it costs in rate limit points."""
+        operation = get_operation_name(query)
+        try:
+            match operation:
+                case "GetRepos":
+                    return {"data": self._get_repos(variables)}, 1
+                case "GetPRsWithReviews":
+                    data = {"repository": self._repository(variables["owner"], variables["name"], variables)}
+                    return {"data": data}, _page_cost(variables["limit"])
+                case "GetPRsOfRepos":
+                    return self._get_prs_of_repos(variables)
+                case "SearchPRs":
+                    return {"data": {"search": self._search(variables)}}, _page_cost(variables["limit"])
+                case "GetPRsNestedItems":
+                    return {"data": self._get_nested_items(query, variables)}, 1
+                case "" if _ANONYMOUS_QUERY.fullmatch(query):
+                    # The home page's `{ viewer { login } }`, or a bare rateLimit, which the server fills in
+                    return {"data": {"viewer": {"login": self.login}} if "viewer" in query else {}}, 1
+                case _:
+                    raise FakeQueryError(f"The fake server doesn't know the operation {operation or query[:40]!r}")
+        except FakeQueryError as exc:
+            error: dict = {"message": str(exc)}
+            if exc.error_type:
+                error["type"] = exc.error_type
+            return {"data": None, "errors": [error]}, 1
+
+    def _get_repos(self, variables: dict) -> dict:
+        if variables.get("login") != self.login:
+            raise FakeQueryError(
+                f"Could not resolve to an Organization with the login of '{variables.get('login')}'.", "NOT_FOUND"
+            )
+        nodes = [
+            {"name": name, "owner": {"login": self.login}, "pullRequests": {"totalCount": len(prs)}}
+            for name, prs in self.repos.items()
+        ]
+        return {"organization": {"repositories": _page(nodes, REPOS_PER_PAGE, variables.get("afterCursor"))}}
+
+    def _get_prs_of_repos(self, variables: dict) -> tuple[dict, int]:
+        data: dict = {}
+        index = 0
+        while f"name{index}" in variables:
+            data[f"repo{index}"] = self._repository(variables[f"owner{index}"], variables[f"name{index}"], variables)
+            index += 1
+        return {"data": data}, _page_cost(variables["limit"]) * max(index, 1)
+
+    def _repository(self, owner: str, name: str, variables: dict) -> dict:
+        if owner != self.login or name not in self.repos:
+            raise FakeQueryError(f"Could not resolve to a Repository with the name '{owner}/{name}'.", "NOT_FOUND")
+        prs = _page(self.repos[name], variables["limit"], variables.get("afterCursor"))
+        prs["nodes"] = [pr_node(pr, self.login, variables["itemsLimit"]) for pr in prs["nodes"]]
+        return {"name": name, "pullRequests": prs}
+
+    def _search(self, variables: dict) -> dict:
+        search_query: str = variables["searchQuery"]
+        repo_match = _SEARCH_REPO.search(search_query)
+        updated_match = _SEARCH_UPDATED.search(search_query)
+        if not repo_match or not updated_match:
+            raise FakeQueryError(f"The fake server only searches by repo and updated date, got {search_query!r}")
+
+        owner, name = repo_match.groups()
+        updated_from, updated_to = (_parse_date(raw_date) for raw_date in updated_match.groups())
+        prs = self.repos.get(name, []) if owner == self.login else []
+        matches = [pr for pr in prs if updated_from <= pr.updated_at <= updated_to]
+
+        search = _page(matches[:SEARCH_RESULTS_CAP], variables["limit"], variables.get("afterCursor"))
+        search["nodes"] = [pr_node(pr, self.login, variables["itemsLimit"]) for pr in search["nodes"]]
+        search["issueCount"] = len(matches)
+        return search
+
+    def _get_nested_items(self, query: str, variables: dict) -> dict:
+        data: dict = {}
+        index = 0
+        while f"id{index}" in variables:
+            pr = self._prs_by_node_id.get(variables[f"id{index}"])
+            if pr is None:
+                raise FakeQueryError(f"Could not resolve to a node with the global id of '{variables[f'id{index}']}'")
+            node: dict = {}
+            for connection, items in (("reviews", pr.reviews), ("timelineItems", pr.review_requests)):
+                if f"${connection}After{index}" in query:
+                    node[connection] = _page(
+                        items, variables["itemsLimit"], variables.get(f"{connection}After{index}")
+                    )
+            data[f"pr{index}"] = node
+            index += 1
+        return data
+
+
+def _page(items: list, limit: int, after_cursor: str | None) -> dict:
+    """A connection of up to `limit` items after the cursor, with its `pageInfo`."""
+    start = _decode_cursor(after_cursor) if after_cursor else 0
+    nodes = items[start : start + limit]
+    end = start + len(nodes)
+    return {
+        "pageInfo": {"endCursor": _encode_cursor(end) if nodes else after_cursor, "hasNextPage": end < len(items)},
+        "nodes": nodes,
+    }
+
+
+def _page_cost(limit: int) -> int:
+    # GitHub's formula, one point per 100 requested connections: the PRs, and reviews and review requests of each
+    return max(1, round((1 + 2 * limit) / 100))
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.b64encode(f"cursor:v2:{offset}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.b64decode(cursor).decode().removeprefix("cursor:v2:"))
+    except ValueError as exc:
+        raise FakeQueryError(f"`{cursor}` does not appear to be a valid cursor.") from exc
+
+
+def _node_id(kind: str, *parts: int) -> str:
+    return base64.b64encode(f"{kind}:{':'.join(map(str, parts))}".encode()).decode()
+
+
+def _format_date(date: datetime) -> str:
+    return date.strftime(_DATE_FORMAT)
+
+
+def _parse_date(raw_date: str) -> datetime:
+    return datetime.strptime(raw_date, _DATE_FORMAT).replace(tzinfo=UTC)
@@ -0,0 +1,264 @@
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Protocol
+
+from prsload.github.recording import RecordingArchive
+from prsload.github.recording import get_operation_name
+from prsload.github.recording import recording_key
+
+from .org import FakeOrg
+
+logger = logging.getLogger(__name__)
+
+_JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+@dataclass
+class FakeResponse:
+    status_code: int
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def _json_response(status_code: int, payload: dict, headers: dict[str, str] | None = None) -> FakeResponse:
+    return FakeResponse(
+        status_code=status_code,
+        body=json.dumps(payload).encode(),
+        headers={"Content-Type": _JSON_CONTENT_TYPE, **(headers or {})},
+    )
+
+
+class FakeBackend(Protocol):
+    def respond(self, query: str, variables: dict) -> FakeResponse: ...
+
+
+class SyntheticBackend:
+    """Answers with the data of a `FakeOrg`, within a simulated rate limit budget.
+
+    Every query costs what GitHub would charge, the budget resets every `rate_limit_window`.
+    Once it is spent, queries are refused with GitHub's RATE_LIMITED error until the reset."""
+
+    def __init__(
+        self, org: FakeOrg, rate_limit_points: int = 5000, rate_limit_window: timedelta = timedelta(hours=1)
+    ):
+        self.org = org
+        self.rate_limit_points = rate_limit_points
+        self.rate_limit_window = rate_limit_window
+
+        self._remaining = rate_limit_points
+        self._reset_at = datetime.now(tz=UTC) + rate_limit_window
+        self._lock = threading.Lock()
+
+    def respond(self, query: str, variables: dict) -> FakeResponse:
+        body, cost = self.org.answer(query, variables)
+
+        with self._lock:
+            now = datetime.now(tz=UTC)
+            if now >= self._reset_at:
+                self._remaining = self.rate_limit_points
+                self._reset_at = now + self.rate_limit_window
+            is_rate_limited = self._remaining < cost
+            if not is_rate_limited:
+                self._remaining -= cost
+            remaining, reset_at = self._remaining, self._reset_at
+
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit_points),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Used": str(self.rate_limit_points - remaining),
+            "X-RateLimit-Reset": str(int(reset_at.timestamp())),
+            "X-RateLimit-Resource": "graphql",
+        }
+        if is_rate_limited:
+            error = {"type": "RATE_LIMITED", "message": "API rate limit exceeded for the fake GitHub."}
+            return _json_response(200, {"data": None, "errors": [error]}, headers)
+
+        if "rateLimit" in query and body.get("data") is not None:
+            body["data"]["rateLimit"] = {
+                "cost": cost,
+                "remaining": remaining,
+                "limit": self.rate_limit_points,
+                "resetAt": reset_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        return _json_response(200, body, headers)
+
+
+class ReplayBackend:
+    """Answers with the responses recorded in a `RecordingArchive`.
+
+    A request that was recorded several times gets the recorded responses in order,
+    then the last one again, so a replay retries where the recorded sync retried.
+    Requests that were never recorded are answered with 404."""
+
+    def __init__(self, archive: RecordingArchive):
+        self.archive = archive
+        self._recordings = archive.load()
+        self._replayed: dict[str, int] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Loaded {sum(map(len, self._recordings.values()))} recordings from {archive.directory}")
+
+    def respond(self, query: str, variables: dict) -> FakeResponse:
+        key = recording_key(query, variables)
+        recordings = self._recordings.get(key)
+        if not recordings:
+            logger.warning(f"No recording of {get_operation_name(query)} {variables=}")
+            return _json_response(404, {"message": "No recording of this query with these variables"})
+
+        with self._lock:
+            index = min(self._replayed.get(key, 0), len(recordings) - 1)
+            self._replayed[key] = index + 1
+
+        recording = recordings[index]
+        return FakeResponse(
+            status_code=recording.status_code,
+            body=self.archive.read_body(recording),
+            headers=dict(recording.headers),
+        )
+
+
+@dataclass
+class FaultInjection:
+    """Trouble the fake server causes on purpose, to test the sync against a slow and flaky GitHub."""
+
+    # Added to every response, and per KB of the response body, so bigger pages are slower
+    latency_seconds: float = 0.0
+    latency_per_kb_seconds: float = 0.0
+    # Share of requests answered with 502 Bad Gateway
+    error_rate: float = 0.0
+    # Share of requests refused as over the secondary rate limit, with a Retry-After
+    secondary_rate_limit_rate: float = 0.0
+    retry_after_seconds: int = 1
+    seed: int | None = None
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    bad_gateways: int = 0
+    secondary_rate_limits: int = 0
+    body_bytes: int = 0
+
+
+class FakeGitHubServer:
+    """A local stand-in for GitHub's GraphQL API, answered by a `SyntheticBackend` or a `ReplayBackend`.
+
+    Point `github.url` of config.yml at `url` and sync as usual, any token is accepted.
+    Connections are kept alive and responses are gzipped when the client asks for it, like GitHub does."""
+
+    def __init__(
+        self,
+        backend: FakeBackend,
+        faults: FaultInjection | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.backend = backend
+        self.faults = faults or FaultInjection()
+        self.stats = FakeServerStats()
+
+        self._random = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._host = host
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._httpd.server_port}/graphql"
+
+    def serve_forever(self) -> None:
+        logger.info(f"Fake GitHub GraphQL API listening on {self.url}")
+        self._httpd.serve_forever()
+
+    def start(self) -> "FakeGitHubServer":
+        """Serve from a background thread, e.g. for a benchmark in the same process."""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def respond(self, query: str, variables: dict) -> FakeResponse:
+        with self._lock:
+            self.stats.requests += 1
+            roll = self._random.random()
+
+        if roll < self.faults.error_rate:
+            with self._lock:
+                self.stats.bad_gateways += 1
+            time.sleep(self.faults.latency_seconds)
+            return FakeResponse(status_code=502, body=b"<html><body><h1>502 Bad Gateway</h1></body></html>")
+
+        if roll < self.faults.error_rate + self.faults.secondary_rate_limit_rate:
+            with self._lock:
+                self.stats.secondary_rate_limits += 1
+            message = {"message": "You have exceeded a secondary rate limit. Please wait a few minutes."}
+            return _json_response(403, message, {"Retry-After": str(self.faults.retry_after_seconds)})
+
+        response = self.backend.respond(query, variables)
+        with self._lock:
+            self.stats.body_bytes += len(response.body)
+        time.sleep(self.faults.latency_seconds + self.faults.latency_per_kb_seconds * len(response.body) / 1024)
+        return response
+
+
+def _make_handler(server: FakeGitHubServer) -> type[BaseHTTPRequestHandler]:
+    class FakeGitHubHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so the client's connection pool works like it does against GitHub
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw_body = self.rfile.read(length)
+
+            if not self.headers.get("Authorization"):
+                self._send(_json_response(401, {"message": "This endpoint requires you to be authenticated."}))
+                return
+            try:
+                request = json.loads(raw_body)
+                query: str = request["query"]
+                variables: dict = request.get("variables") or {}
+            except (ValueError, KeyError):
+                self._send(_json_response(400, {"message": "Problems parsing JSON"}))
+                return
+
+            self._send(server.respond(query, variables))
+
+        def do_GET(self) -> None:
+            # Not GitHub's, lets a benchmark read what the server did
+            self._send(_json_response(200, server.stats.__dict__))
+
+        def _send(self, response: FakeResponse) -> None:
+            body = response.body
+            headers = dict(response.headers)
+            if "gzip" in self.headers.get("Accept-Encoding", "") and body:
+                body = gzip.compress(body, compresslevel=1)
+                headers["Content-Encoding"] = "gzip"
+
+            self.send_response(response.status_code)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A002
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return FakeGitHubHandler
@@ -1,5 +1,19 @@
 from . import client as github_client
+from . import scheduler as github_scheduler
+from .prs import PRPage
+from .prs import fetch_first_pr_pages
+from .prs import fetch_pr_pages
 from .prs import fetch_prs_with_reviews
+from .prs import search_pr_pages
 from .repos import fetch_all_repos
 
-__all__ = ["fetch_all_repos", "fetch_prs_with_reviews", "github_client"]
+__all__ = [
+    "PRPage",
+    "fetch_all_repos",
+    "fetch_first_pr_pages",
+    "fetch_pr_pages",
+    "fetch_prs_with_reviews",
+    "github_client",
+    "github_scheduler",
+    "search_pr_pages",
+]
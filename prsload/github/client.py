@@ -1,70 +1,223 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from dataclasses import dataclass
+from functools import cache
 
 import requests
 from requests import Response
-
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+
+from prsload import metrics
+from prsload.constants import DEFAULT_GH_GRAPHQL_URL
 from prsload.exceptions import GitHubException
+from prsload.github.recording import RecordingArchive
 from prsload.github.response_utils import check_status_code_of_response
 from prsload.github.response_utils import extract_json_body
 from prsload.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
-_GQL_URL = "https://api.github.com/graphql"
+
+@dataclass
+class RequestTiming:
+    """Where the time of one request went.
+
+    `connect_seconds` covers DNS, TCP and TLS and is 0 when a pooled
+    keep-alive connection was reused."""
+
+    connect_seconds: float
+    ttfb_seconds: float
+    download_seconds: float
+    wire_bytes: int
+    body_bytes: int
+
+    @property
+    def total_seconds(self) -> float:
+        return self.connect_seconds + self.ttfb_seconds + self.download_seconds
+
+    @property
+    def reused_connection(self) -> bool:
+        return self.connect_seconds == 0
 
 
 @dataclass
 class GHResponse:
     response: Response
     data: dict
+    timing: RequestTiming | None = None
 
 
-def post_gql_query(query: str, variables: dict | None = None) -> GHResponse:
-    logger.info(f"Calling Github GraphQL {variables=}")
-    token = get_settings().GH_TOKEN
-    try:
-        response: Response = requests.post(
-            url=_GQL_URL,
-            json={"query": query, "variables": variables or {}},
-            headers={
-                "Accept": "application/vnd.github.moondragon+json",
-                "Authorization": f"Bearer {token}",
-            },
-            timeout=30,
-        )
-    except Exception as exc:
-        logger.warning(f"Exception occurred: {exc}", exc_info=exc)
-        raise GitHubException("Request to GitHub raised an exception") from exc
+# urllib3 opens connections in the thread that sends the request,
+# so the connect time of the current request can be passed along in a thread local.
+_connect_timing = threading.local()
 
-    check_status_code_of_response(response)
-    response_data, json_err = extract_json_body(response)
 
-    if json_err:
-        raise GitHubException("Response is not a valid JSON", query=query, variables=variables) from json_err
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - started
 
-    if response_data is None:
-        raise GitHubException("Response was None", query=query, variables=variables)
 
-    gql_data: dict | None = response_data.get("data")
-    gql_errors: list[dict] | None = response_data.get("errors")
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - started
 
-    if gql_data is None:
-        raise GitHubException(
-            "Response did not contain any data.",
-            gql_errors=gql_errors,
-            query=query,
-            variables=variables,
-        )
 
-    if gql_errors:
-        raise GitHubException(
-            "Errors in response.",
-            gql_errors=gql_errors,
-            query=query,
-            variables=variables,
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class GitHubClient:
+    """GitHub GraphQL client that keeps its TCP+TLS connections alive between requests.
+
+    The session is safe to share between sync workers, `pool_size` is the number
+    of connections it keeps open, so it should be at least the sync concurrency.
+    With an `archive`, every response is recorded to it, see `recording.py`."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        token: str,
+        *,
+        pool_size: int,
+        connect_timeout: float,
+        read_timeout: float,
+        url: str = DEFAULT_GH_GRAPHQL_URL,
+        archive: RecordingArchive | None = None,
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.archive = archive
+
+        self._session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update(
+            {
+                "Accept": "application/vnd.github.moondragon+json",
+                "Accept-Encoding": "gzip, deflate",
+                "Authorization": f"Bearer {token}",
+            }
         )
 
-    return GHResponse(data=gql_data, response=response)
+    def post_gql_query(self, query: str, variables: dict | None = None) -> GHResponse:
+        logger.info(f"Calling Github GraphQL {variables=}")
+        response, timing = self._post(query, variables)
+
+        check_status_code_of_response(response)
+        with metrics.GH_JSON_DECODE_SECONDS.time():
+            response_data, json_err = extract_json_body(response)
+
+        if json_err:
+            raise GitHubException("Response is not a valid JSON", query=query, variables=variables) from json_err
+
+        if response_data is None:
+            raise GitHubException("Response was None", query=query, variables=variables)
+
+        gql_data: dict | None = response_data.get("data")
+        gql_errors: list[dict] | None = response_data.get("errors")
+
+        if gql_data is None:
+            raise GitHubException(
+                "Response did not contain any data.",
+                gql_errors=gql_errors,
+                query=query,
+                variables=variables,
+                response=response,
+            )
+
+        if gql_errors:
+            raise GitHubException(
+                "Errors in response.",
+                gql_errors=gql_errors,
+                query=query,
+                variables=variables,
+                response=response,
+            )
+
+        return GHResponse(data=gql_data, response=response, timing=timing)
+
+    def _post(self, query: str, variables: dict | None) -> tuple[Response, RequestTiming]:
+        _connect_timing.seconds = 0.0
+        try:
+            with metrics.GH_REQUESTS_IN_FLIGHT.track_in_progress():
+                response: Response = self._session.post(
+                    url=self.url,
+                    json={"query": query, "variables": variables or {}},
+                    timeout=self.timeout,
+                    stream=True,
+                )
+                # Headers are in, now download (and decompress) the body
+                download_started = time.perf_counter()
+                body_bytes = len(response.content)
+                download_seconds = time.perf_counter() - download_started
+        except Exception as exc:
+            metrics.GH_REQUESTS.inc(status="error")
+            logger.warning(f"Exception occurred: {exc}", exc_info=exc)
+            raise GitHubException("Request to GitHub raised an exception") from exc
+
+        connect_seconds: float = _connect_timing.seconds
+        timing = RequestTiming(
+            connect_seconds=connect_seconds,
+            ttfb_seconds=max(response.elapsed.total_seconds() - connect_seconds, 0.0),
+            download_seconds=download_seconds,
+            # bytes as they came over the wire, before gzip/deflate decoding
+            wire_bytes=response.raw.tell(),
+            body_bytes=body_bytes,
+        )
+        _record_metrics(response.status_code, timing)
+        if self.archive:
+            self.archive.record(query, variables, response.status_code, dict(response.headers), response.content)
+        logger.info(
+            f"GitHub responded {response.status_code} in {timing.total_seconds:.3f}s: "
+            f"connect={timing.connect_seconds:.3f}s{' (reused)' if timing.reused_connection else ''} "
+            f"ttfb={timing.ttfb_seconds:.3f}s download={timing.download_seconds:.3f}s "
+            f"wire_bytes={timing.wire_bytes} body_bytes={timing.body_bytes} "
+            f"encoding={response.headers.get('Content-Encoding', 'identity')}"
+        )
+        return response, timing
+
+
+def _record_metrics(status_code: int, timing: RequestTiming) -> None:
+    metrics.GH_REQUESTS.inc(status=str(status_code))
+    metrics.GH_REQUEST_SECONDS.observe(timing.connect_seconds, phase="connect")
+    metrics.GH_REQUEST_SECONDS.observe(timing.ttfb_seconds, phase="ttfb")
+    metrics.GH_REQUEST_SECONDS.observe(timing.download_seconds, phase="download")
+    metrics.GH_WIRE_BYTES.inc(timing.wire_bytes)
+    metrics.GH_BODY_BYTES.inc(timing.body_bytes)
+
+
+@cache
+def get_github_client() -> GitHubClient:
+    settings = get_settings()
+    return GitHubClient(
+        token=settings.GH_TOKEN,
+        pool_size=settings.GH_POOL_SIZE,
+        connect_timeout=settings.GH_CONNECT_TIMEOUT,
+        read_timeout=settings.GH_READ_TIMEOUT,
+        url=settings.GH_GRAPHQL_URL,
+        archive=RecordingArchive(settings.GH_RECORD_DIR) if settings.GH_RECORD_DIR else None,
+    )
@@ -24,6 +24,11 @@ def extract_gql_query_from_file(file_path: str) -> str:
     return gql_query
 
 
+def extract_gql_query_with_fragments(file_path: str, *fragment_file_paths: str) -> str:
+    """Read the query and append the fragments it uses."""
+    return "\n".join(extract_gql_query_from_file(path) for path in (file_path, *fragment_file_paths))
+
+
 def parse_page_info(
     item_with_page_info: dict | None,
 ) -> tuple[THasMorePages, TAfterCursor]:
@@ -37,3 +42,34 @@ def parse_page_info(
     has_more_page: THasMorePages = page_info["hasNextPage"]
     after: TAfterCursor = page_info["endCursor"]
     return has_more_page, after
+
+
+RATE_LIMIT_SELECTION = "rateLimit { cost remaining limit resetAt }"
+
+
+def add_rate_limit_to_query(query: str) -> str:
+    """Ask for the GraphQL rate limit budget as part of the query.
+
+    The selection is added at the end of the top level selection set of the operation,
+    so it works for named queries, for the short `{ viewer { login } }` form
+    and for queries followed by fragments."""
+    if "rateLimit" in query:
+        return query
+
+    end = _find_end_of_operation(query)
+    if end is None:
+        raise ValueError(f"Can't add rateLimit to a query without a selection set: {query[:50]}")
+    return f"{query[:end]}  {RATE_LIMIT_SELECTION}\n{query[end:]}"
+
+
+def _find_end_of_operation(query: str) -> int | None:
+    """Index of the `}` that closes the operation, the first top level selection set."""
+    depth = 0
+    for index, char in enumerate(query):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+    return None
@@ -0,0 +1,84 @@
+import logging
+from dataclasses import dataclass
+from dataclasses import replace
+
+logger = logging.getLogger(__name__)
+
+# GitHub doesn't allow more than 100 items per connection
+MAX_PAGE_SIZE = 100
+MIN_PRS_PER_PAGE = 5
+MIN_ITEMS_PER_PAGE = 10
+
+# Pages slower than this shrink, pages faster than FAST_PAGE_SECONDS grow
+SLOW_PAGE_SECONDS = 10.0
+FAST_PAGE_SECONDS = 3.0
+SHRINK_FACTOR = 0.5
+GROW_FACTOR = 1.5
+
+
+@dataclass(frozen=True)
+class PageSize:
+    """How many PRs a page asks for, and how many reviews and review requests per PR."""
+
+    prs: int
+    items: int
+
+    @property
+    def estimated_nodes(self) -> int:
+        # Every PR asks for `items` reviews and `items` review requests
+        return self.prs + 2 * self.prs * self.items
+
+    @property
+    def estimated_cost(self) -> int:
+        """Rate limit points, by GitHub's formula: one point per 100 requested connections.
+
+        The PR connection is one, every PR adds its reviews and timeline connections."""
+        return max(1, round((1 + 2 * self.prs) / 100))
+
+    def scaled(self, factor: float) -> "PageSize":
+        return replace(
+            self,
+            prs=_clamp(round(self.prs * factor), MIN_PRS_PER_PAGE, MAX_PAGE_SIZE),
+            items=_clamp(round(self.items * factor), MIN_ITEMS_PER_PAGE, MAX_PAGE_SIZE),
+        )
+
+    def __str__(self) -> str:
+        return f"prs={self.prs} items={self.items} est_nodes={self.estimated_nodes} est_cost={self.estimated_cost}"
+
+
+class PageSizer:
+    """Adapts the page size of one repo to how fast GitHub answers.
+
+    Slow or failed pages halve the PRs per page and the items per PR, fast pages
+    grow them again. Reviews and review requests that don't fit into a smaller
+    page are fetched with follow-up queries, so a smaller page never loses data."""
+
+    def __init__(self, repo_slug: str, initial: PageSize):
+        self.repo_slug = repo_slug
+        self.size = initial
+
+    @property
+    def can_shrink(self) -> bool:
+        return self.size.scaled(SHRINK_FACTOR) != self.size
+
+    def record_page(self, seconds: float, cost: int | None) -> None:
+        logger.info(f"Page of {self.repo_slug} with {self.size} took {seconds:.2f}s, cost={cost}")
+
+        if seconds > SLOW_PAGE_SECONDS:
+            self._resize(SHRINK_FACTOR, reason=f"slow page, {seconds:.2f}s")
+        elif seconds < FAST_PAGE_SECONDS:
+            self._resize(GROW_FACTOR, reason=f"fast page, {seconds:.2f}s")
+
+    def record_failure(self, exc: Exception) -> None:
+        self._resize(SHRINK_FACTOR, reason=f"failed page, {exc}")
+
+    def _resize(self, factor: float, reason: str) -> None:
+        new_size = self.size.scaled(factor)
+        if new_size == self.size:
+            return
+        logger.info(f"Page size of {self.repo_slug}: {self.size} -> {new_size} ({reason})")
+        self.size = new_size
+
+
+def _clamp(value: int, lowest: int, highest: int) -> int:
+    return max(lowest, min(value, highest))
@@ -1,18 +1,30 @@
 from __future__ import annotations
 
+import itertools
 import logging
+import time
 from collections.abc import Generator
+from dataclasses import dataclass
+from datetime import UTC
 from datetime import datetime
+from datetime import timedelta
+from operator import itemgetter
 
-from prsload.date_utils import parse_str_to_date
+from prsload import metrics
+from prsload.date_utils import format_as_github_date
+from prsload.date_utils import parse_github_dates
 from prsload.dict_utils import safe_traverse
-from prsload.github import client
+from prsload.exceptions import GitHubException
+from prsload.github import scheduler
 from prsload.github.client import GHResponse
 from prsload.github.gql_utils import extract_gql_query_from_file
+from prsload.github.gql_utils import extract_gql_query_with_fragments
 from prsload.github.gql_utils import parse_page_info
+from prsload.github.page_sizing import PageSize
+from prsload.github.page_sizing import PageSizer
 from prsload.github.repos import Repo
 from prsload.pr_type import PR
-from prsload.pr_type import PRReview
+from prsload.pr_type import PRBatch
 
 logger = logging.getLogger(__name__)
 
@@ -20,111 +32,454 @@ THasMorePages = bool
 TAfterCursor = str | None
 
 PRS_PER_PAGE = 100
+# Only repos with this few PRs are batched, their first page is small and most likely the only one.
+# A repo block then asks for up to 10 PRs x (100 reviews + 100 timeline items) = ~2k nodes,
+# so even a full batch stays far below the 500k nodes GitHub allows per query.
+MAX_PRS_OF_BATCHED_REPO = 10
+MAX_REPOS_PER_REQUEST = 20
 
+# PRs whose reviews or review requests didn't fit into the PR query, completed per follow-up request
+PRS_PER_FOLLOW_UP_REQUEST = 25
+NESTED_ITEMS_PER_PAGE = 100
 
-def fetch_prs_with_reviews(repo: Repo) -> Generator[PR]:
-    logger.info(f"---------- Fetching PRs from repo `{repo.slug}`")
-    query: str = extract_gql_query_from_file("prsload/github/prs.graphql")
+# GitHub refuses queries with unused fragments, every connection brings the fragment of its items along
+_NESTED_CONNECTION_FRAGMENT_FILES = {
+    "reviews": "prsload/github/review_fields.graphql",
+    "timelineItems": "prsload/github/review_request_fields.graphql",
+}
+_PR_FRAGMENT_FILES = ("prsload/github/pr_fields.graphql", *_NESTED_CONNECTION_FRAGMENT_FILES.values())
+_PRS_PAGE_FRAGMENT_FILES = ("prsload/github/repo_prs_page.graphql", *_PR_FRAGMENT_FILES)
 
-    has_more_pages: THasMorePages = True
-    after_cursor: TAfterCursor = None
+# The fields of PRFields and ReviewFields that `_process_one_page_of_prs` reads, in the order it unpacks them
+_PR_FIELDS = itemgetter(
+    "number", "title", "url", "createdAt", "updatedAt", "mergedAt", "closedAt", "author", "timelineItems", "reviews"
+)
+_REVIEW_FIELDS = itemgetter("author", "publishedAt", "state")
+_APPROVE_OR_DISAPPROVE_STATES = frozenset({"APPROVED", "CHANGES_REQUESTED"})
 
-    while has_more_pages:
-        one_page_response = client.post_gql_query(
-            query=query,
-            variables=dict(
-                owner=repo.owner,
-                name=repo.name,
-                limit=PRS_PER_PAGE,
-                **dict(afterCursor=after_cursor) if after_cursor else {},
-            ),
+# The search API never returns more results than this for one query, no matter how we page
+SEARCH_RESULTS_CAP = 1000
+# Windows with more results are split, down to slices this short
+MIN_SEARCH_SLICE = timedelta(hours=1)
+_SEARCH_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_FOLLOW_UP_SELECTIONS = {
+    "reviews": """
+      reviews(first: $itemsLimit, after: $reviewsAfter{i}) {{
+        pageInfo {{ endCursor hasNextPage }}
+        nodes {{ ...ReviewFields }}
+      }}""",
+    "timelineItems": """
+      timelineItems(first: $itemsLimit, after: $timelineItemsAfter{i}, itemTypes: [REVIEW_REQUESTED_EVENT]) {{
+        pageInfo {{ endCursor hasNextPage }}
+        nodes {{ __typename ...ReviewRequestFields }}
+      }}""",
+}
+
+
+@dataclass
+class PRPage:
+    """One page of PRs, `end_cursor` is where the next page starts."""
+
+    prs: PRBatch
+    end_cursor: TAfterCursor
+    is_last: bool
+    # How many PRs the search found, only set on the first page of a search
+    total_count: int | None = None
+    # Time spent turning the response into `prs`, the rest of fetching the page was spent on GitHub
+    parse_seconds: float = 0.0
+
+
+def fetch_prs_with_reviews(repo: Repo, updated_since: datetime | None = None) -> Generator[PR]:
+    """Yield PRs of the repo, most recently updated first.
+
+    If `updated_since` is given, paging stops at the first PR that was last
+    updated before it. PRs are ordered by `updatedAt`, so all following PRs
+    are older as well and are already stored from a previous sync."""
+    for page in fetch_pr_pages(repo, updated_since=updated_since):
+        yield from page.prs
+
+
+def fetch_pr_pages(
+    repo: Repo,
+    updated_since: datetime | None = None,
+    after_cursor: TAfterCursor = None,
+) -> Generator[PRPage]:
+    """Yield PRs of the repo page by page, starting after `after_cursor`.
+
+    Same as `fetch_prs_with_reviews`, but the cursor of every page is kept,
+    so an interrupted sync can continue from the last page it stored.
+    The page size adapts to how fast GitHub answers for this repo, see `PageSizer`."""
+    logger.info(f"---------- Fetching PRs from repo `{repo.slug}` {updated_since=} {after_cursor=}")
+    query: str = extract_gql_query_with_fragments("prsload/github/prs.graphql", *_PRS_PAGE_FRAGMENT_FILES)
+    sizer = PageSizer(repo.slug, initial=PageSize(prs=PRS_PER_PAGE, items=NESTED_ITEMS_PER_PAGE))
+
+    is_last_page = False
+
+    while not is_last_page:
+        one_page_response = _post_sized_page_query(
+            query, {"owner": repo.owner, "name": repo.name}, after_cursor, sizer
         )
-        yield from _process_one_page_of_prs(one_page_response, repo)
-        has_more_pages, after_cursor = _extract_page_info(one_page_response)
+        page = _parse_pr_page(one_page_response.data["repository"]["pullRequests"], repo, updated_since)
+        # Only the parsed page is kept while the consumer works on it, the raw response can go
+        del one_page_response
+        yield page
+        is_last_page, after_cursor = page.is_last, page.end_cursor
     return
 
 
-def _process_one_page_of_prs(response: GHResponse, repo: Repo) -> Generator[PR]:
-    raw_prs: list[dict] = response.data["repository"]["pullRequests"]["nodes"]
+def search_pr_pages(
+    repo: Repo,
+    updated_since: datetime,
+    after_cursor: TAfterCursor = None,
+) -> Generator[PRPage]:
+    """Yield PRs of the repo updated since `updated_since`, most recently updated first.
 
-    logger.info(f"Processing PRs for {repo.slug}.")
+    Unlike `fetch_pr_pages`, PRs are found with the search API, so GitHub only returns
+    PRs in the window and nothing older is downloaded. Search returns at most
+    `SEARCH_RESULTS_CAP` results per query, a window with more PRs is split into date
+    slices, newest first. `end_cursor` of a page knows the slice it belongs to, so
+    the search can be continued from it like a `fetch_pr_pages` cursor."""
+    logger.info(f"---------- Searching PRs of repo `{repo.slug}` {updated_since=} {after_cursor=}")
+    query: str = extract_gql_query_with_fragments("prsload/github/search_prs.graphql", *_PR_FRAGMENT_FILES)
+    sizer = PageSizer(repo.slug, initial=PageSize(prs=PRS_PER_PAGE, items=NESTED_ITEMS_PER_PAGE))
 
-    for pr_data in raw_prs:
-        merged_at: str = pr_data["mergedAt"]
-        closed_at: str = pr_data["closedAt"]
+    # Date slices still to search, newest first, they cover the window without gaps
+    slices: list[tuple[datetime, datetime]]
+    cursor_in_slice: TAfterCursor = None
+    if after_cursor:
+        slice_start, slice_end, cursor_in_slice = _parse_search_cursor(after_cursor)
+        slices = [(slice_start, slice_end)]
+        if slice_start > updated_since:
+            slices.append((updated_since, slice_start - timedelta(seconds=1)))
+    else:
+        slices = [(updated_since, datetime.now(tz=UTC))]
 
-        pr_author: str = pr_data["author"]["login"]
-        pr_number: int = int(pr_data["number"])
-        pr = PR(
-            number=pr_number,
-            repo_slug=repo.slug,
-            title=pr_data["title"],
-            url=pr_data["url"],
-            author=pr_author,
-            created_at=parse_str_to_date(pr_data["createdAt"]),
-            merged_at=(parse_str_to_date(merged_at or closed_at) if merged_at or closed_at else None),
+    while slices:
+        slice_start, slice_end = slices.pop(0)
+        search_query = (
+            f"repo:{repo.slug} is:pr sort:updated-desc "
+            f"updated:{slice_start.strftime(_SEARCH_DATE_FORMAT)}..{slice_end.strftime(_SEARCH_DATE_FORMAT)}"
         )
+        is_first_page = True
 
-        logger.info(f"Found PR(number={pr_number}), url={pr.url}, {pr.merged_at=}")
+        while True:
+            response = _post_sized_page_query(query, {"searchQuery": search_query}, cursor_in_slice, sizer)
+            raw_search: dict = response.data["search"]
+            total_count: int = raw_search["issueCount"]
+
+            if is_first_page and not cursor_in_slice and total_count > SEARCH_RESULTS_CAP:
+                if slice_end - slice_start > MIN_SEARCH_SLICE:
+                    middle = slice_start + (slice_end - slice_start) / 2
+                    logger.info(f"{total_count} PRs of {repo.slug} between {slice_start} and {slice_end}, splitting")
+                    slices[:0] = [(middle + timedelta(seconds=1), slice_end), (slice_start, middle)]
+                    break
+                logger.warning(
+                    f"{total_count} PRs of {repo.slug} between {slice_start} and {slice_end}, "
+                    f"only the first {SEARCH_RESULTS_CAP} can be found"
+                )
+
+            page = _parse_pr_page(raw_search, repo, updated_since=None)
+            del response, raw_search
+            has_more_in_slice = not page.is_last
+            cursor_in_slice = page.end_cursor if has_more_in_slice else None
+
+            if has_more_in_slice:
+                page.end_cursor = _build_search_cursor(slice_start, slice_end, cursor_in_slice)
+            elif slices:
+                # The next page is the first one of the next slice
+                page.end_cursor = _build_search_cursor(*slices[0], None)
+            page.is_last = not has_more_in_slice and not slices
+            page.total_count = total_count if is_first_page else None
+
+            yield page
+            is_first_page = False
+            if not has_more_in_slice:
+                break
+    return
+
+
+def _build_search_cursor(slice_start: datetime, slice_end: datetime, cursor: TAfterCursor) -> str:
+    return f"{slice_start.isoformat()}..{slice_end.isoformat()}|{cursor or ''}"
 
-        has_too_many_timeline_items = pr_data["timelineItems"]["pageInfo"]["hasNextPage"]
-        if has_too_many_timeline_items > 100:
-            logger.warning(
-                f"We never implemented a solution for when timelineItems.totalCount > 100. "
-                f"{repo.slug} {pr_number=}"
-            )
 
-        reviews_by_user: dict[str, PRReview] = {}
-        for raw_review_request in pr_data["timelineItems"]["nodes"]:
-            user = safe_traverse(raw_review_request, "requestedReviewer.login")
-            raw_date = raw_review_request.get("createdAt")
-            if not user or not raw_date or user == pr_author:
-                continue
-
-            requested_at: datetime = parse_str_to_date(raw_date)
-            if user in reviews_by_user:
-                user_review = reviews_by_user[user]
-                user_review.requested_at = _min_of_two(user_review.requested_at, requested_at)
-            else:
-                reviews_by_user[user] = PRReview(user=user, requested_at=requested_at)
-
-        has_too_many_reviews = pr_data["reviews"]["pageInfo"]["hasNextPage"]
-        if has_too_many_reviews > 100:
-            logger.warning(
-                f"We never implemented a solution for when the reviews.totalCount > 100. {repo.slug} {pr_number=}"
+def _parse_search_cursor(search_cursor: str) -> tuple[datetime, datetime, TAfterCursor]:
+    slice_dates, _, cursor = search_cursor.partition("|")
+    raw_start, _, raw_end = slice_dates.partition("..")
+    return datetime.fromisoformat(raw_start), datetime.fromisoformat(raw_end), cursor or None
+
+
+def _post_sized_page_query(
+    query: str,
+    variables: dict,
+    after_cursor: TAfterCursor,
+    sizer: PageSizer,
+) -> GHResponse:
+    """Ask for one page at the sizer's page size, with smaller pages while GitHub times out."""
+    while True:
+        started = time.perf_counter()
+        try:
+            response: GHResponse = scheduler.post_gql_query(
+                query=query,
+                variables=dict(
+                    **variables,
+                    limit=sizer.size.prs,
+                    itemsLimit=sizer.size.items,
+                    **dict(afterCursor=after_cursor) if after_cursor else {},
+                ),
+                # As long as the page can get smaller, that's a better retry than the same page again
+                retry_overloaded=not sizer.can_shrink,
             )
+        except GitHubException as exc:
+            if not sizer.can_shrink or not scheduler.is_overload_error(exc):
+                raise
+            sizer.record_failure(exc)
+            continue
+
+        seconds = response.timing.total_seconds if response.timing else time.perf_counter() - started
+        sizer.record_page(seconds, cost=safe_traverse(response.data, "rateLimit.cost"))
+        return response
+
+
+def fetch_first_pr_pages(repos: list[Repo], updated_since: dict[str, datetime | None]) -> dict[str, PRPage]:
+    """Fetch the first page of PRs of several small repos with a single request, by repo slug.
+
+    Every repo gets an aliased `repository` block with the same selection as
+    `fetch_pr_pages`. Repos with up to `MAX_PRS_OF_BATCHED_REPO` PRs usually
+    have them all on their first page; repos whose page is not the last one continue
+    with `fetch_pr_pages` from the page's `end_cursor`. The page size adapts like
+    the one of a single repo, see `PageSizer`."""
+    if len(repos) > MAX_REPOS_PER_REQUEST:
+        raise ValueError(f"Can't fetch more than {MAX_REPOS_PER_REQUEST} repos per request, got {len(repos)}")
+    if too_big := [repo.slug for repo in repos if repo.total_prs > MAX_PRS_OF_BATCHED_REPO]:
+        raise ValueError(f"Only repos with up to {MAX_PRS_OF_BATCHED_REPO} PRs are batched, got {too_big}")
+    if not repos:
+        return {}
+
+    logger.info(f"---------- Fetching the first page of PRs from {len(repos)} repos")
+    variables: dict = {}
+    for index, repo in enumerate(repos):
+        variables[f"owner{index}"] = repo.owner
+        variables[f"name{index}"] = repo.name
+    # Small repos don't need room for 100 PRs, a smaller page is cheaper on the rate limit
+    sizer = PageSizer(
+        f"batch of {len(repos)} repos",
+        initial=PageSize(prs=max(1, *(repo.total_prs for repo in repos)), items=NESTED_ITEMS_PER_PAGE),
+    )
+
+    response = _post_sized_page_query(_build_repos_batch_query(len(repos)), variables, None, sizer)
+
+    return {
+        repo.slug: _parse_pr_page(response.data[f"repo{index}"]["pullRequests"], repo, updated_since.get(repo.slug))
+        for index, repo in enumerate(repos)
+    }
+
+
+def _build_repos_batch_query(num_of_repos: int) -> str:
+    variable_definitions = "".join(f", $owner{i}: String!, $name{i}: String!" for i in range(num_of_repos))
+    repository_blocks = "".join(
+        f"  repo{i}: repository(owner: $owner{i}, name: $name{i}) {{\n    ...RepoPRsPage\n  }}\n"
+        for i in range(num_of_repos)
+    )
+    fragments = "\n".join(extract_gql_query_from_file(path) for path in _PRS_PAGE_FRAGMENT_FILES)
+    return (
+        f"query GetPRsOfRepos($limit: Int!, $itemsLimit: Int!, $afterCursor: String{variable_definitions}) {{\n"
+        f"{repository_blocks}"
+        f"}}\n"
+        f"{fragments}"
+    )
+
 
-        for raw_review in pr_data["reviews"]["nodes"]:
-            user = raw_review["author"]["login"]
-            published_at = parse_str_to_date(raw_review["publishedAt"])
-            state = raw_review["state"]
+def _parse_pr_page(raw_connection: dict, repo: Repo, updated_since: datetime | None) -> PRPage:
+    """Parse a page of PRs, `raw_connection` holds the `pageInfo` and the PR `nodes`."""
+    has_more_pages, end_cursor = parse_page_info(raw_connection)
 
-            if user == pr_author:
-                continue
+    raw_prs: list[dict] = []
+    # Compared as GitHub timestamps, `updatedAt` is only parsed once, with the rest of the page
+    raw_updated_since = format_as_github_date(updated_since) if updated_since else None
+    # Search results can hold other node types, they come back as empty objects
+    for pr_data in filter(None, raw_connection["nodes"]):
+        if raw_updated_since and pr_data["updatedAt"] < raw_updated_since:
+            logger.info(f"Reached PRs updated before {updated_since}, stopping for {repo.slug}")
+            has_more_pages = False
+            break
+        raw_prs.append(pr_data)
 
-            if user not in reviews_by_user:
-                reviews_by_user[user] = PRReview(user=user, requested_at=None)
+    _fetch_remaining_nested_items(raw_prs, repo)
+    parse_started = time.perf_counter()
+    prs = _process_one_page_of_prs(raw_prs, repo)
+    parse_seconds = time.perf_counter() - parse_started
+    metrics.SYNC_PARSE_SECONDS.observe(parse_seconds)
+    metrics.SYNC_PAGES.inc()
+    metrics.SYNC_PRS.inc(len(prs))
+    metrics.SYNC_REVIEWS.inc(prs.num_of_reviews)
+
+    return PRPage(prs=prs, end_cursor=end_cursor, is_last=not has_more_pages, parse_seconds=parse_seconds)
+
+
+def _fetch_remaining_nested_items(raw_prs: list[dict], repo: Repo) -> None:
+    """Page through reviews and review requests that didn't fit into the PR query.
+
+    Only the overflowing PRs are asked for, by node id, with each connection
+    continuing from its own `endCursor`. The fetched items are appended to the
+    raw PRs, so they are parsed as if they had come with the PR page."""
+    while overflowing_prs := [pr_data for pr_data in raw_prs if _nested_connections_with_more_pages(pr_data)]:
+        logger.info(f"Fetching more reviews and review requests of {len(overflowing_prs)} PRs of {repo.slug}")
+
+        for prs_batch in itertools.batched(overflowing_prs, PRS_PER_FOLLOW_UP_REQUEST, strict=False):
+            query, variables = _build_nested_items_query(prs_batch)
+            response: GHResponse = scheduler.post_gql_query(query=query, variables=variables)
+
+            for index, pr_data in enumerate(prs_batch):
+                raw_pr_items: dict = response.data[f"pr{index}"]
+                for connection in _NESTED_CONNECTION_FRAGMENT_FILES:
+                    if connection not in raw_pr_items:
+                        continue
+                    pr_data[connection]["nodes"].extend(raw_pr_items[connection]["nodes"])
+                    pr_data[connection]["pageInfo"] = raw_pr_items[connection]["pageInfo"]
+
+
+def _nested_connections_with_more_pages(pr_data: dict) -> list[str]:
+    connections = []
+    for connection in _NESTED_CONNECTION_FRAGMENT_FILES:
+        page_info: dict | None = (pr_data.get(connection) or {}).get("pageInfo")
+        if page_info and page_info.get("hasNextPage"):
+            connections.append(connection)
+    return connections
+
+
+def _build_nested_items_query(raw_prs: tuple[dict, ...]) -> tuple[str, dict]:
+    variable_definitions: list[str] = ["$itemsLimit: Int!"]
+    variables: dict = {"itemsLimit": NESTED_ITEMS_PER_PAGE}
+    node_blocks: list[str] = []
+    fragment_files: set[str] = set()
+
+    for i, pr_data in enumerate(raw_prs):
+        variable_definitions.append(f"$id{i}: ID!")
+        variables[f"id{i}"] = pr_data["id"]
+
+        selections: list[str] = []
+        for connection in _nested_connections_with_more_pages(pr_data):
+            variable_definitions.append(f"${connection}After{i}: String")
+            variables[f"{connection}After{i}"] = pr_data[connection]["pageInfo"]["endCursor"]
+            selections.append(_FOLLOW_UP_SELECTIONS[connection].format(i=i))
+            fragment_files.add(_NESTED_CONNECTION_FRAGMENT_FILES[connection])
+
+        pr_selection = "".join(selections)
+        node_blocks.append(f"  pr{i}: node(id: $id{i}) {{\n    ... on PullRequest {{{pr_selection}\n    }}\n  }}\n")
+
+    fragments = "\n".join(extract_gql_query_from_file(path) for path in sorted(fragment_files))
+    query = (
+        f"query GetPRsNestedItems({', '.join(variable_definitions)}) {{\n"
+        f"{''.join(node_blocks)}"
+        f"}}\n"
+        f"{fragments}"
+    )
+    return query, variables
+
+
+def _process_one_page_of_prs(raw_prs: list[dict], repo: Repo) -> PRBatch:
+    """Turn the raw PR nodes of a page into a batch of PRs with one review per reviewer.
+
+    Every node is read with one precompiled `itemgetter` call instead of a lookup per field,
+    and the per-PR log line is only formatted when INFO is enabled. The columns of the batch
+    are filled directly, no PR objects are built on the way.
+
+    Timestamps stay strings while the page is walked, the first review of a reviewer is found
+    by comparing them as such. Each timestamp column is then parsed in bulk, see `parse_github_dates()`."""
+    log_prs = logger.isEnabledFor(logging.INFO)
+    if log_prs:
+        logger.info(f"Processing PRs for {repo.slug}.")
+
+    batch = PRBatch()
+    created_ats: list[str] = []
+    updated_ats: list[str | None] = []
+    merged_ats: list[str | None] = []
+    requested_ats: list[str | None] = []
+    first_signs_of_life: list[str | None] = []
+    first_approves_or_disapproves: list[str | None] = []
+    for pr_index, pr_data in enumerate(raw_prs):
+        (
+            number,
+            title,
+            url,
+            raw_created_at,
+            raw_updated_at,
+            raw_merged_at,
+            raw_closed_at,
+            raw_author,
+            raw_review_requests,
+            raw_reviews,
+        ) = _PR_FIELDS(pr_data)
+        raw_merged_at = raw_merged_at or raw_closed_at
+
+        pr_author: str = raw_author["login"]
+        batch.numbers.append(int(number))
+        batch.repo_slugs.append(repo.slug)
+        batch.titles.append(title)
+        batch.urls.append(url)
+        batch.authors.append(pr_author)
+        created_ats.append(raw_created_at)
+        updated_ats.append(raw_updated_at)
+        merged_ats.append(raw_merged_at)
+
+        if log_prs:
+            logger.info(f"Found PR(number={number}), url={url}, merged_at={raw_merged_at}")
+
+        reviews_by_user = _get_first_reviews_by_user(raw_review_requests, raw_reviews, pr_author)
+        for user, (requested_at, first_sign_of_life, first_approve_or_disapprove) in reviews_by_user.items():
+            batch.review_prs.append(pr_index)
+            batch.review_users.append(user)
+            requested_ats.append(requested_at)
+            first_signs_of_life.append(first_sign_of_life)
+            first_approves_or_disapproves.append(first_approve_or_disapprove)
+
+    batch.created_ats = parse_github_dates(created_ats)
+    batch.updated_ats = parse_github_dates(updated_ats)
+    batch.merged_ats = parse_github_dates(merged_ats)
+    batch.review_requested_ats = parse_github_dates(requested_ats)
+    batch.review_first_signs_of_life = parse_github_dates(first_signs_of_life)
+    batch.review_first_approves_or_disapproves = parse_github_dates(first_approves_or_disapproves)
+    return batch
+
+
+def _get_first_reviews_by_user(
+    raw_review_requests: dict, raw_reviews: dict, pr_author: str
+) -> dict[str, list[str | None]]:
+    """Per reviewer: when they were requested, first commented and first approved or disapproved, as timestamps."""
+    reviews_by_user: dict[str, list[str | None]] = {}
+    for raw_review_request in raw_review_requests["nodes"]:
+        # Teams have no login, and other timeline items no reviewer at all
+        requested_reviewer: dict | None = raw_review_request.get("requestedReviewer")
+        user = requested_reviewer.get("login") if requested_reviewer else None
+        raw_date = raw_review_request.get("createdAt")
+        if not user or not raw_date or user == pr_author:
+            continue
+
+        if user in reviews_by_user:
             user_review = reviews_by_user[user]
+            user_review[0] = _min_of_two(user_review[0], raw_date)
+        else:
+            reviews_by_user[user] = [raw_date, None, None]
 
-            user_review.first_sign_of_life = _min_of_two(user_review.first_sign_of_life, published_at)
+    for raw_review in raw_reviews["nodes"]:
+        raw_reviewer, raw_published_at, state = _REVIEW_FIELDS(raw_review)
+        user = raw_reviewer["login"]
+        if user == pr_author:
+            continue
 
-            if state in {"APPROVED", "CHANGES_REQUESTED"}:
-                user_review.first_approve_or_disapprove = _min_of_two(
-                    user_review.first_approve_or_disapprove, published_at
-                )
+        if user not in reviews_by_user:
+            reviews_by_user[user] = [None, None, None]
+        user_review = reviews_by_user[user]
+
+        user_review[1] = _min_of_two(user_review[1], raw_published_at)
 
-        pr.reviews = list(reviews_by_user.values())
-        yield pr
+        if state in _APPROVE_OR_DISAPPROVE_STATES:
+            user_review[2] = _min_of_two(user_review[2], raw_published_at)
 
+    return reviews_by_user
 
-def _min_of_two(one: datetime | None, second: datetime) -> datetime:
+
+def _min_of_two(one: str | None, second: str) -> str:
     if one is None:
         return second
     return min(one, second)
-
-
-def _extract_page_info(
-    one_page_response: GHResponse,
-) -> tuple[THasMorePages, TAfterCursor]:
-    pr_data: dict | None = safe_traverse(one_page_response.data, "repository.pullRequests")
-    return parse_page_info(pr_data)
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from dataclasses import asdict
+from dataclasses import dataclass
+from datetime import UTC
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "index.jsonl"
+# Response headers worth replaying, the body is stored decoded, so encoding and length are left out
+RECORDED_HEADERS = ("content-type", "retry-after")
+RECORDED_HEADER_PREFIXES = ("x-ratelimit-",)
+
+_OPERATION_NAME = re.compile(r"^\s*(?:query|mutation)\s+(\w+)")
+
+
+@dataclass(frozen=True)
+class Recording:
+    """One GraphQL request and GitHub's response to it, as stored in the archive index.
+
+    Request headers are never recorded, so the archive holds no token."""
+
+    key: str
+    query_hash: str
+    operation: str
+    variables: dict
+    status_code: int
+    headers: dict[str, str]
+    # Path of the gzipped response body, relative to the archive
+    body_file: str
+    recorded_at: str
+
+
+def hash_query(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def recording_key(query: str, variables: dict | None) -> str:
+    """The same query with the same variables always has the same key, whatever the order of the variables."""
+    canonical_variables = json.dumps(variables or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{hash_query(query)}:{canonical_variables}".encode()).hexdigest()
+
+
+def get_operation_name(query: str) -> str:
+    match = _OPERATION_NAME.match(query)
+    return match.group(1) if match else ""
+
+
+class RecordingArchive:
+    """A directory of recorded GitHub GraphQL responses.
+
+    - `index.jsonl` lists every request in the order it was sent, one `Recording` per line,
+    - `queries/<query hash>.graphql` holds the text of each distinct query,
+    - `bodies/<body hash>.json.gz` holds the gzipped response bodies, identical bodies are stored once.
+
+    A request that was sent several times, e.g. retried after a 502, has a recording per attempt."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def record(self, query: str, variables: dict | None, status_code: int, headers: dict, body: bytes) -> None:
+        """Add a response to the archive, safe to call from several sync workers at once."""
+        query_hash = hash_query(query)
+        body_file = f"bodies/{hashlib.sha256(body).hexdigest()}.json.gz"
+        recording = Recording(
+            key=recording_key(query, variables),
+            query_hash=query_hash,
+            operation=get_operation_name(query),
+            variables=variables or {},
+            status_code=status_code,
+            headers=_filter_headers(headers),
+            body_file=body_file,
+            recorded_at=datetime.now(tz=UTC).isoformat(),
+        )
+
+        with self._lock:
+            (self.directory / "queries").mkdir(parents=True, exist_ok=True)
+            (self.directory / "bodies").mkdir(parents=True, exist_ok=True)
+
+            query_path = self.directory / "queries" / f"{query_hash}.graphql"
+            if not query_path.exists():
+                query_path.write_text(query, encoding="utf-8")
+            body_path = self.directory / body_file
+            if not body_path.exists():
+                body_path.write_bytes(gzip.compress(body))
+
+            with open(self.directory / INDEX_FILE_NAME, "a", encoding="utf-8") as index_file:
+                index_file.write(json.dumps(asdict(recording), sort_keys=True) + "\n")
+
+        logger.debug(f"Recorded {recording.operation} {status_code} as {recording.key[:12]}")
+
+    def load(self) -> dict[str, list[Recording]]:
+        """All recordings by key, each key's recordings in the order they were made."""
+        recordings: dict[str, list[Recording]] = defaultdict(list)
+        index_path = self.directory / INDEX_FILE_NAME
+        if not index_path.exists():
+            return {}
+
+        with open(index_path, encoding="utf-8") as index_file:
+            for line in index_file:
+                if line.strip():
+                    recording = Recording(**json.loads(line))
+                    recordings[recording.key].append(recording)
+        return dict(recordings)
+
+    def read_body(self, recording: Recording) -> bytes:
+        return gzip.decompress((self.directory / recording.body_file).read_bytes())
+
+
+def _filter_headers(headers: dict) -> dict[str, str]:
+    return {
+        name: value
+        for name, value in headers.items()
+        if name.lower() in RECORDED_HEADERS or name.lower().startswith(RECORDED_HEADER_PREFIXES)
+    }
@@ -2,8 +2,11 @@ from collections.abc import Generator
 from dataclasses import dataclass
 
 from prsload.dict_utils import safe_traverse
-from prsload.github import client
+from prsload.github import scheduler
+from prsload.github.gql_utils import TAfterCursor
+from prsload.github.gql_utils import THasMorePages
 from prsload.github.gql_utils import extract_gql_query_from_file
+from prsload.github.gql_utils import parse_page_info
 from prsload.settings import get_settings
 
 
@@ -21,13 +24,22 @@ class Repo:
 def fetch_all_repos() -> Generator[Repo]:
     repo_query: str = extract_gql_query_from_file("prsload/github/repos.graphql")
     user_login_name = get_settings().GH_LOGIN
-    response = client.post_gql_query(query=repo_query, variables={"login": user_login_name})
 
-    raw_repos: list[dict] = response.data["organization"]["repositories"]["nodes"]
+    has_more_pages: THasMorePages = True
+    after_cursor: TAfterCursor = None
 
-    for repo_data in raw_repos:
-        yield Repo(
-            owner=repo_data["owner"]["login"],
-            name=repo_data["name"],
-            total_prs=safe_traverse(repo_data, "pullRequests.totalCount"),
+    while has_more_pages:
+        response = scheduler.post_gql_query(
+            query=repo_query,
+            variables={"login": user_login_name, **({"afterCursor": after_cursor} if after_cursor else {})},
         )
+        raw_repositories: dict = response.data["organization"]["repositories"]
+
+        for repo_data in raw_repositories["nodes"]:
+            yield Repo(
+                owner=repo_data["owner"]["login"],
+                name=repo_data["name"],
+                total_prs=safe_traverse(repo_data, "pullRequests.totalCount"),
+            )
+
+        has_more_pages, after_cursor = parse_page_info(raw_repositories)
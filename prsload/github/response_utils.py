@@ -1,3 +1,5 @@
+import json
+
 from requests import Response
 
 from prsload.exceptions import GitHubException
@@ -12,7 +14,8 @@ def check_status_code_of_response(response: Response) -> None:
     raise GitHubException(
         f"Provider returned code: {response.status_code} "
         f"for {response.request.method} url {response.request.url}. "
-        f"Response.text: {short_response_text}"
+        f"Response.text: {short_response_text}",
+        response=response,
     )
 
 
@@ -23,7 +26,8 @@ def extract_json_body(response: Response) -> tuple[dict | None, ValueError | Non
         return {}, None
 
     try:
-        response_data: dict = response.json()
+        # Straight from the bytes, without decoding them to a str copy first, JSON is UTF-8
+        response_data: dict = json.loads(response.content)
         return response_data, None
     except ValueError as exc:
         return None, exc
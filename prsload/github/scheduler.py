@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import replace
+from datetime import UTC
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import cache
+
+import requests
+
+from prsload import metrics
+from prsload.date_utils import parse_str_to_date
+from prsload.exceptions import GitHubException
+from prsload.github.client import GHResponse
+from prsload.github.client import GitHubClient
+from prsload.github.client import get_github_client
+from prsload.github.gql_utils import add_rate_limit_to_query
+from prsload.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_MAX_SECONDS = 60.0
+# Below this share of the budget, requests are spread evenly until the budget resets
+_THROTTLE_BELOW_SHARE = 0.2
+_SECONDARY_RATE_LIMIT_MARKERS = ("secondary rate limit", "abuse")
+_TRANSIENT_GQL_ERROR_MARKERS = ("something went wrong", "timeout", "timed out")
+
+
+@dataclass
+class RateLimitBudget:
+    """The GraphQL point budget, as GitHub reported it in the last response."""
+
+    limit: int | None = None
+    remaining: int | None = None
+    reset_at: datetime | None = None
+    last_cost: int = 1
+    updated_at: datetime | None = None
+
+    @property
+    def is_known(self) -> bool:
+        return self.remaining is not None
+
+    @property
+    def used_percentage(self) -> int:
+        if not self.limit or self.remaining is None:
+            return 0
+        return int(100 * (self.limit - self.remaining) / self.limit)
+
+    def seconds_until_reset(self, now: datetime) -> float:
+        if self.reset_at is None:
+            return 0.0
+        return max((self.reset_at - now).total_seconds(), 0.0)
+
+
+class RequestScheduler:
+    """Sends GraphQL queries through the client, within GitHub's rate limits.
+
+    - every query also asks for `rateLimit`, so we always know the remaining point budget,
+    - requests wait for the reset when the budget is (almost) spent and are spread out
+      when it runs low, which matters when several sync workers share the budget,
+    - 5xx responses, timeouts and secondary rate limits are retried with jittered
+      exponential backoff, honouring `Retry-After`.
+    """
+
+    def __init__(self, client: GitHubClient, max_retries: int, min_remaining_points: int):
+        self.client = client
+        self.max_retries = max_retries
+        self.min_remaining_points = min_remaining_points
+
+        self._budget = RateLimitBudget()
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> RateLimitBudget:
+        with self._lock:
+            return replace(self._budget)
+
+    def post_gql_query(
+        self,
+        query: str,
+        variables: dict | None = None,
+        max_retries: int | None = None,
+        retry_overloaded: bool = True,
+    ) -> GHResponse:
+        """Send the query, retrying what can be retried.
+
+        With `retry_overloaded=False`, timeouts and 5xx responses are raised right
+        away, for callers that would rather retry with a lighter query."""
+        query = add_rate_limit_to_query(query)
+        max_retries = self.max_retries if max_retries is None else max_retries
+
+        attempt = 0
+        while True:
+            self._wait_for_budget()
+            try:
+                gh_response = self.client.post_gql_query(query, variables)
+            except GitHubException as exc:
+                self._update_budget_from_headers(exc.headers)
+                if not retry_overloaded and is_overload_error(exc):
+                    raise
+                retry_in = self._retry_delay(exc, attempt)
+                if retry_in is None or attempt >= max_retries:
+                    raise
+                attempt += 1
+                metrics.GH_RETRIES.inc()
+                logger.warning(
+                    f"GitHub request failed ({exc.status_code=}), "
+                    f"retry {attempt}/{max_retries} in {retry_in:.1f}s: {exc}"
+                )
+                time.sleep(retry_in)
+                continue
+
+            self._update_budget(gh_response.data.get("rateLimit"))
+            return gh_response
+
+    def _wait_for_budget(self) -> None:
+        with self._lock:
+            budget = self._budget
+            now = datetime.now(tz=UTC)
+            if not budget.is_known or budget.seconds_until_reset(now) == 0:
+                return
+
+            remaining: int = budget.remaining or 0
+            until_reset = budget.seconds_until_reset(now)
+
+            if remaining - budget.last_cost < self.min_remaining_points:
+                wait_seconds = until_reset + 1
+                logger.warning(
+                    f"GitHub budget almost spent ({remaining=}), waiting {wait_seconds:.0f}s for the reset"
+                )
+            elif budget.limit and remaining < budget.limit * _THROTTLE_BELOW_SHARE:
+                # spread the requests we can still afford evenly over the time left
+                affordable_requests = max(remaining // max(budget.last_cost, 1), 1)
+                wait_seconds = until_reset / affordable_requests
+                logger.info(f"GitHub budget is low ({remaining=}), throttling by {wait_seconds:.1f}s")
+            else:
+                return
+
+            # Count the request in now, so parallel workers don't all see the same budget
+            budget.remaining = remaining - budget.last_cost
+
+        metrics.GH_BUDGET_WAIT_SECONDS.inc(wait_seconds)
+        time.sleep(wait_seconds)
+
+    def _update_budget(self, raw_rate_limit: dict | None) -> None:
+        if not raw_rate_limit:
+            return
+
+        metrics.GH_POINTS_SPENT.inc(raw_rate_limit.get("cost") or 0)
+        with self._lock:
+            self._budget = RateLimitBudget(
+                limit=raw_rate_limit.get("limit"),
+                remaining=raw_rate_limit.get("remaining"),
+                reset_at=parse_str_to_date(raw_rate_limit["resetAt"]) if raw_rate_limit.get("resetAt") else None,
+                last_cost=raw_rate_limit.get("cost") or 1,
+                updated_at=datetime.now(tz=UTC),
+            )
+        logger.debug(f"GitHub budget: {raw_rate_limit}")
+
+    def _update_budget_from_headers(self, headers: dict[str, str]) -> None:
+        """Failed responses have no `rateLimit` in the body, but still carry the budget in headers."""
+        remaining = _get_header(headers, "X-RateLimit-Remaining")
+        reset = _get_header(headers, "X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+
+        with self._lock:
+            self._budget.remaining = int(remaining)
+            self._budget.reset_at = datetime.fromtimestamp(int(reset), tz=UTC)
+            self._budget.updated_at = datetime.now(tz=UTC)
+
+    def _retry_delay(self, exc: GitHubException, attempt: int) -> float | None:
+        """How long to wait before retrying the failed request, None if it should not be retried."""
+        if (retry_after := _parse_retry_after(_get_header(exc.headers, "Retry-After"))) is not None:
+            return retry_after
+
+        backoff = min(_BACKOFF_BASE_SECONDS * 2**attempt, _BACKOFF_MAX_SECONDS)
+        jittered_backoff = random.uniform(backoff / 2, backoff)
+
+        status_code = exc.status_code or 0
+        if status_code == 429:
+            return jittered_backoff
+
+        error_text = str(exc).lower()
+        if status_code == 403 and any(marker in error_text for marker in _SECONDARY_RATE_LIMIT_MARKERS):
+            # GitHub asks to wait at least a minute when there is no Retry-After
+            return max(jittered_backoff, 60.0)
+
+        if _is_rate_limited(exc) or _get_header(exc.headers, "X-RateLimit-Remaining") == "0":
+            # The primary budget is spent, nothing helps but waiting for the reset
+            with self._lock:
+                return self._budget.seconds_until_reset(datetime.now(tz=UTC)) + 1
+
+        if is_overload_error(exc):
+            return jittered_backoff
+
+        return None
+
+
+def is_overload_error(exc: GitHubException) -> bool:
+    """Did GitHub fail to answer in time? A smaller query would probably succeed."""
+    if isinstance(exc.__cause__, requests.Timeout | requests.ConnectionError):
+        return True
+
+    if (exc.status_code or 0) >= 500:
+        return True
+
+    error_text = str(exc).lower()
+    return bool(exc.gql_errors) and any(marker in error_text for marker in _TRANSIENT_GQL_ERROR_MARKERS)
+
+
+def _is_rate_limited(exc: GitHubException) -> bool:
+    return any((error.get("type") == "RATE_LIMITED") for error in exc.gql_errors or [])
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait by a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring a Retry-After header that is neither seconds nor a date: {value!r}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max((retry_at - datetime.now(tz=UTC)).total_seconds(), 0.0)
+
+
+def _get_header(headers: dict[str, str], name: str) -> str | None:
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+@cache
+def get_request_scheduler() -> RequestScheduler:
+    settings = get_settings()
+    return RequestScheduler(
+        client=get_github_client(),
+        max_retries=settings.GH_MAX_RETRIES,
+        min_remaining_points=settings.GH_MIN_REMAINING_POINTS,
+    )
+
+
+def post_gql_query(
+    query: str,
+    variables: dict | None = None,
+    max_retries: int | None = None,
+    retry_overloaded: bool = True,
+) -> GHResponse:
+    return get_request_scheduler().post_gql_query(
+        query, variables, max_retries=max_retries, retry_overloaded=retry_overloaded
+    )
+
+
+def get_rate_limit_budget() -> RateLimitBudget:
+    return get_request_scheduler().budget
@@ -0,0 +1,261 @@
+"""In-process metrics of the sync and the pages, exposed on /metrics in the Prometheus text format.
+
+Recording a value is a dict lookup and an addition under a lock, cheap enough to leave on in production.
+Metrics live in memory and start from 0 with every process, like the counters of any Prometheus client."""
+
+import bisect
+import math
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cached page render to a slow GitHub page
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_TLabels = tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _label_values(self, labels: dict[str, str]) -> _TLabels:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, label_values: _TLabels, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, label_values, strict=True)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list[tuple[str, float]]:
+        """(name with labels, value) of every sample, as they appear in the exposition."""
+        raise NotImplementedError
+
+    def summable_samples(self) -> list[tuple[str, float]]:
+        """Samples that only grow, so the difference of two snapshots is what happened in between."""
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name} {_format_value(value)}" for name, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests sent or bytes downloaded.
+
+    With a `function`, the value is read from it on every scrape instead, for what is counted elsewhere."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: dict[_TLabels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[tuple[str, float]]:
+        if self.function:
+            return [(self.name, float(self.function()))]
+        with self._lock:
+            return [(f"{self.name}{self._format_labels(key)}", value) for key, value in self._values.items()]
+
+    def summable_samples(self) -> list[tuple[str, float]]:
+        return self.samples()
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. requests in flight.
+
+    With a `function`, the value is read from it on every scrape instead."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: dict[_TLabels, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels: str) -> Generator[None]:
+        self.inc(1.0, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1.0, **labels)
+
+    def samples(self) -> list[tuple[str, float]]:
+        if self.function:
+            return [(self.name, float(self.function()))]
+        with self._lock:
+            return [(f"{self.name}{self._format_labels(key)}", value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Counts observations, e.g. request durations, into buckets of upper bounds, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: the count of each bucket, the last one is +Inf, and the sum of the observations
+        self._counts: dict[_TLabels, list[int]] = {}
+        self._sums: dict[_TLabels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Generator[None]:
+        """Observe how long the block takes, also works as a decorator."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list[tuple[str, float]]:
+        samples: list[tuple[str, float]] = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    samples.append((f"{self.name}_bucket{self._format_labels(key, le)}", cumulative))
+                samples.append((f"{self.name}_sum{self._format_labels(key)}", self._sums[key]))
+                samples.append((f"{self.name}_count{self._format_labels(key)}", cumulative))
+        return samples
+
+    def summable_samples(self) -> list[tuple[str, float]]:
+        return [(name, value) for name, value in self.samples() if "_bucket" not in name]
+
+
+_REGISTRY: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+def snapshot() -> dict[str, float]:
+    """Current values of all counters and histogram sums and counts, by sample name."""
+    return {name: value for metric in _REGISTRY for name, value in metric.summable_samples()}
+
+
+def diff_snapshots(before: dict[str, float], after: dict[str, float]) -> dict[str, float]:
+    """What changed between two snapshots, samples that didn't change are left out."""
+    return {
+        name: round(value - before.get(name, 0.0), 6) for name, value in after.items() if value != before.get(name)
+    }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# GitHub
+GH_REQUESTS = Counter("prsload_github_requests_total", "GraphQL requests sent to GitHub.", ["status"])
+GH_REQUESTS_IN_FLIGHT = Gauge("prsload_github_requests_in_flight", "GraphQL requests waiting for GitHub.")
+GH_REQUEST_SECONDS = Histogram(
+    "prsload_github_request_seconds", "Time of a GraphQL request by phase: connect, ttfb, download.", ["phase"]
+)
+GH_JSON_DECODE_SECONDS = Histogram("prsload_github_json_decode_seconds", "Time to decode a response body.")
+GH_WIRE_BYTES = Counter("prsload_github_wire_bytes_total", "Response bytes downloaded, before decompression.")
+GH_BODY_BYTES = Counter("prsload_github_body_bytes_total", "Response bytes after decompression.")
+GH_POINTS_SPENT = Counter("prsload_github_points_spent_total", "GraphQL rate limit points GitHub charged.")
+GH_RETRIES = Counter("prsload_github_retries_total", "Requests retried after a failure.")
+GH_BUDGET_WAIT_SECONDS = Counter(
+    "prsload_github_budget_wait_seconds_total", "Time spent waiting for the rate limit budget."
+)
+
+# Parsing GitHub pages into PRs
+SYNC_PAGES = Counter("prsload_sync_pages_total", "Pages of PRs parsed.")
+SYNC_PRS = Counter("prsload_sync_prs_total", "PRs parsed.")
+SYNC_REVIEWS = Counter("prsload_sync_reviews_total", "Reviews and review requests parsed, one per reviewer.")
+SYNC_PARSE_SECONDS = Histogram("prsload_sync_parse_seconds", "Time to parse a page of PRs.")
+SYNC_QUEUE_DEPTH = Gauge("prsload_sync_queue_depth", "Pages fetched and waiting for the DuckDB writer.")
+SYNCS_IN_PROGRESS = Gauge("prsload_syncs_in_progress", "Syncs running.")
+SYNC_STAGE_SECONDS = Counter(
+    "prsload_sync_stage_seconds_total", "Time spent per stage of the sync pipeline, see SyncResult.", ["stage"]
+)
+SYNC_WRITE_BATCH_PAGES = Histogram(
+    "prsload_sync_write_batch_pages", "Pages committed together by the writer.", buckets=(1, 2, 4, 8, 16, 32)
+)
+
+# DuckDB
+DUCKDB_SECONDS = Histogram("prsload_duckdb_seconds", "Time of DuckDB operations.", ["operation"])
+DUCKDB_WRITER_WAIT_SECONDS = Histogram(
+    "prsload_duckdb_writer_wait_seconds", "Time a writer waited for the previous one to commit."
+)
+DUCKDB_PRS_STORED = Counter("prsload_duckdb_prs_stored_total", "PRs written to DuckDB.")
+DUCKDB_REVIEWS_STORED = Counter("prsload_duckdb_reviews_stored_total", "Reviews written to DuckDB.")
+
+# Flask
+HTTP_REQUESTS = Counter("prsload_http_requests_total", "Requests served.", ["endpoint", "status"])
+HTTP_REQUESTS_IN_FLIGHT = Gauge("prsload_http_requests_in_flight", "Requests being served.")
+HTTP_REQUEST_SECONDS = Histogram("prsload_http_request_seconds", "Time to serve a request.", ["endpoint"])
+TEMPLATE_RENDER_SECONDS = Histogram("prsload_template_render_seconds", "Time to render a template.", ["template"])
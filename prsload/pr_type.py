@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Iterable
+from collections.abc import Iterator
 from dataclasses import dataclass
 from dataclasses import field
 from datetime import datetime
+from itertools import compress
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class PRReview:
     user: str
     requested_at: datetime | None
@@ -16,7 +19,7 @@ class PRReview:
     first_approve_or_disapprove: datetime | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PR:
     number: int
     repo_slug: str
@@ -25,8 +28,159 @@ class PR:
     author: str
     created_at: datetime
     merged_at: datetime | None
+    updated_at: datetime | None = None
     reviews: list[PRReview] = field(default_factory=list)
 
     @property
     def uid(self):
         return f"{self.repo_slug}/pull/{self.number}"
+
+
+# The columns of a PRBatch
+_PR_COLUMNS = ("numbers", "repo_slugs", "titles", "urls", "authors", "created_ats", "merged_ats", "updated_ats")
+_REVIEW_COLUMNS = (
+    "review_prs",
+    "review_users",
+    "review_requested_ats",
+    "review_first_signs_of_life",
+    "review_first_approves_or_disapproves",
+)
+
+
+class PRBatch:
+    """PRs and their reviews as parallel columns, the form the sync passes from the parser to DuckDB.
+
+    Row `i` of the PR columns is one PR, row `j` of the review columns one review of the PR
+    at row `review_prs[j]`. Cleaning selects rows with masks over whole columns instead of
+    rebuilding PR objects, see `select()`. Iterating yields `PR` objects, as a convenience view."""
+
+    __slots__ = (*_PR_COLUMNS, *_REVIEW_COLUMNS)
+
+    def __init__(self) -> None:
+        self.numbers: list[int] = []
+        self.repo_slugs: list[str] = []
+        self.titles: list[str] = []
+        self.urls: list[str] = []
+        self.authors: list[str] = []
+        self.created_ats: list[datetime] = []
+        self.merged_ats: list[datetime | None] = []
+        self.updated_ats: list[datetime | None] = []
+        self.review_prs: list[int] = []
+        self.review_users: list[str] = []
+        self.review_requested_ats: list[datetime | None] = []
+        self.review_first_signs_of_life: list[datetime | None] = []
+        self.review_first_approves_or_disapproves: list[datetime | None] = []
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    @property
+    def num_of_reviews(self) -> int:
+        return len(self.review_prs)
+
+    def __iter__(self) -> Iterator[PR]:
+        prs = [
+            PR(
+                number=number,
+                repo_slug=repo_slug,
+                title=title,
+                url=url,
+                author=author,
+                created_at=created_at,
+                merged_at=merged_at,
+                updated_at=updated_at,
+            )
+            for number, repo_slug, title, url, author, created_at, merged_at, updated_at in zip(
+                self.numbers,
+                self.repo_slugs,
+                self.titles,
+                self.urls,
+                self.authors,
+                self.created_ats,
+                self.merged_ats,
+                self.updated_ats,
+                strict=True,
+            )
+        ]
+        for pr_index, user, requested_at, first_sign_of_life, first_approve_or_disapprove in zip(
+            self.review_prs,
+            self.review_users,
+            self.review_requested_ats,
+            self.review_first_signs_of_life,
+            self.review_first_approves_or_disapproves,
+            strict=True,
+        ):
+            prs[pr_index].reviews.append(
+                PRReview(
+                    user=user,
+                    requested_at=requested_at,
+                    first_sign_of_life=first_sign_of_life,
+                    first_approve_or_disapprove=first_approve_or_disapprove,
+                )
+            )
+        return iter(prs)
+
+    def append_pr(self, pr: PR) -> None:
+        """Add a PR with its reviews as the last rows."""
+        pr_index = len(self.numbers)
+        self.numbers.append(pr.number)
+        self.repo_slugs.append(pr.repo_slug)
+        self.titles.append(pr.title)
+        self.urls.append(pr.url)
+        self.authors.append(pr.author)
+        self.created_ats.append(pr.created_at)
+        self.merged_ats.append(pr.merged_at)
+        self.updated_ats.append(pr.updated_at)
+        for review in pr.reviews:
+            self.review_prs.append(pr_index)
+            self.review_users.append(review.user)
+            self.review_requested_ats.append(review.requested_at)
+            self.review_first_signs_of_life.append(review.first_sign_of_life)
+            self.review_first_approves_or_disapproves.append(review.first_approve_or_disapprove)
+
+    @classmethod
+    def from_prs(cls, prs: Iterable[PR]) -> PRBatch:
+        batch = cls()
+        for pr in prs:
+            batch.append_pr(pr)
+        return batch
+
+    @classmethod
+    def concat(cls, batches: Iterable[PRBatch]) -> PRBatch:
+        """One batch with the rows of all `batches`, in order."""
+        result = cls()
+        for batch in batches:
+            offset = len(result)
+            for name in cls.__slots__:
+                column = getattr(batch, name)
+                if name == "review_prs" and offset:
+                    column = [pr_index + offset for pr_index in column]
+                getattr(result, name).extend(column)
+        return result
+
+    def select(self, pr_mask: Iterable[bool], review_mask: Iterable[bool] | None = None) -> PRBatch:
+        """A batch with the PRs where `pr_mask` is true, and the reviews of those PRs where `review_mask` is."""
+        pr_mask = list(pr_mask)
+        # Where each kept PR ends up, dropped PRs map to -1
+        new_indexes: list[int] = []
+        kept = 0
+        for keep in pr_mask:
+            new_indexes.append(kept if keep else -1)
+            kept += keep
+
+        review_prs = [new_indexes[pr_index] for pr_index in self.review_prs]
+        review_keep = [new_index >= 0 for new_index in review_prs]
+        if review_mask is not None:
+            review_keep = [keep and keep_review for keep, keep_review in zip(review_keep, review_mask, strict=True)]
+
+        result = PRBatch()
+        for name in _PR_COLUMNS:
+            setattr(result, name, list(compress(getattr(self, name), pr_mask)))
+        result.review_prs = list(compress(review_prs, review_keep))
+        for name in _REVIEW_COLUMNS[1:]:
+            setattr(result, name, list(compress(getattr(self, name), review_keep)))
+        return result
+
+    def head(self, num_of_prs: int) -> PRBatch:
+        """A batch with the first `num_of_prs` PRs."""
+        return self.select(index < num_of_prs for index in range(len(self)))
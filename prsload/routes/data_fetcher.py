@@ -1,15 +1,23 @@
 import logging
 
 from flask import Blueprint
+from flask import abort
+from flask import jsonify
+from flask import redirect
 from flask import render_template
+from flask import request
+from flask import url_for
 
 from prsload import duckdb_client
-from prsload import github
+from prsload.cache import cached_by_data_generation
+from prsload.cache import cached_page
 from prsload.duckdb_client import PRStats
-from prsload.pr_type import PR
-from prsload.pr_type import PRReview
-from prsload.settings import Settings
+from prsload.github import github_scheduler
 from prsload.settings import get_settings
+from prsload.sync import SyncJob
+from prsload.sync import SyncResult
+from prsload.sync import get_sync_job
+from prsload.sync import start_sync_job
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +25,7 @@ data_fetcher_bp = Blueprint("data_fetcher", __name__)
 
 
 @data_fetcher_bp.route("/db_view")
+@cached_page(extra_key=lambda: github_scheduler.get_rate_limit_budget().updated_at)
 def db_view():
     logger.info("Viewing PR analytics from DuckDB")
     return _render_template_data_fetcher(
@@ -26,89 +35,58 @@ def db_view():
     )
 
 
-class PRCleaner:
-
-    @classmethod
-    def is_pr_too_old(cls, pr: PR, settings: Settings) -> bool:
-        merge_too_old = bool(pr.merged_at and pr.merged_at < settings.OLDEST_VALID_PR_MERGE_DATE)
-        create_too_old = bool(pr.created_at < settings.OLDEST_VALID_PR_CREATE_DATE)
-        return merge_too_old and create_too_old
-
-    @classmethod
-    def sanitize_pr(cls, pr: PR, settings: Settings) -> PR | None:
-        if pr.merged_at and pr.merged_at < settings.OLDEST_VALID_PR_MERGE_DATE:
-            return None
-        if pr.author in settings.PR_AUTHORS_TO_IGNORE:
-            return None
-
-        # we are keeping the PR, but still need to clean its' data
-        cls._remove_blocklisted_reviewers(pr, settings)
-        cls._remove_self_review(pr)
-        cls._remove_vacation_reviews(pr, settings)
-        return pr
-
-    @classmethod
-    def _remove_vacation_reviews(cls, pr: PR, settings: Settings) -> None:
-        pr.reviews = [review for review in pr.reviews if not cls._was_reviewer_on_vacation(review, settings)]
-
-    @staticmethod
-    def _was_reviewer_on_vacation(review: PRReview, settings: Settings) -> bool:
-        if (review_requested := review.requested_at) and (
-            user_vacation_periods := settings.VACATION.get(review.user)
-        ):
-            for vacation_start, vacation_end in user_vacation_periods:
-                if vacation_start <= review_requested <= vacation_end:
-                    logger.info(f"Vacation time, skipping, {review.user}, {review.requested_at}")
-                    return True
-        return False
-
-    @staticmethod
-    def _remove_blocklisted_reviewers(pr: PR, settings: Settings) -> None:
-        pr.reviews = [review for review in pr.reviews if review.user not in settings.REVIEWERS_TO_IGNORE]
-
-    @staticmethod
-    def _remove_self_review(pr: PR) -> None:
-        pr.reviews = [review for review in pr.reviews if review.user != pr.author]
-
-
 @data_fetcher_bp.route("/sync_from_github")
 def sync_from_github():
-    """Sync data from GitHub to DuckDB database."""
-    settings = get_settings()
-    blocklisted_repos: list[str] = []
-    synced_prs = 0
-
-    logger.info(f"Starting GitHub sync for all repositories {settings.NUM_OF_DAYS=} {settings.GH_LOGIN=}")
-
-    for repo in github.fetch_all_repos():
-        if repo.slug in settings.BLOCKLISTED_REPOS:
-            blocklisted_repos.append(repo.slug)
-            continue
-
-        if repo.total_prs == 0:
-            # logger.info(f"Found repo {repo.slug}, but it has no PRs at all")
-            continue
-
-        logger.info(f"****OK**** Syncing PRs from GitHub for repo: {repo.slug} {repo.total_prs=}")
+    """Start syncing data from GitHub to DuckDB database in the background.
 
-        for raw_pr in github.fetch_prs_with_reviews(repo):
-            if PRCleaner.is_pr_too_old(raw_pr, settings):
-                # Hm... this is just an idea: probably all next PRs will also be too old, so we can stop
-                # fetching for this repo
-                break
-
-            pr: PR | None = PRCleaner.sanitize_pr(raw_pr, settings)
-            if pr is None:
-                continue
-            duckdb_client.store_pr(pr)
-            synced_prs += 1
-
-    logger.info(f"GitHub sync complete. Synced {synced_prs} PRs to DuckDB")
+    By default only PRs updated since the previous sync of each repo are fetched.
+    Pass `?full_resync=1` to ignore the stored watermarks and re-fetch everything.
+    If a sync is already running, we attach to it instead of starting another one."""
+    settings = get_settings()
+    full_resync = request.args.get("full_resync", "").lower() in {"1", "true", "yes"}
 
-    return _render_template_data_fetcher(
-        title="GitHub Sync Complete",
-        subtitle=f"Synced {synced_prs} PRs from GitHub to persistent DuckDB database.",
+    logger.info(
+        f"Starting GitHub sync for all repositories {settings.NUM_OF_DAYS=} {settings.GH_LOGIN=} {full_resync=}"
     )
+    job: SyncJob = start_sync_job(full_resync=full_resync)
+    return redirect(url_for("data_fetcher.sync_job", job_id=job.id))
+
+
+@data_fetcher_bp.route("/sync_jobs/<job_id>")
+def sync_job(job_id: str):
+    job = get_sync_job(job_id)
+    if job is None:
+        abort(404)
+
+    sync_result: SyncResult = job.result
+    sync_kind = "Full resync" if sync_result.full_resync else "Incremental sync"
+    if sync_result.resumed:
+        sync_kind = f"Resumed {sync_kind.lower()}"
+    if job.is_running:
+        title = "GitHub Sync Running"
+        subtitle = f"{sync_kind} is running in the background. This page updates when it's done."
+    elif job.status == "failed":
+        title = "GitHub Sync Failed"
+        subtitle = f"{sync_kind} failed after syncing {sync_result.synced_prs} PRs: {job.error_msg}"
+    else:
+        title = "GitHub Sync Complete"
+        subtitle = (
+            f"{sync_kind}: synced {sync_result.synced_prs} PRs from {len(sync_result.synced_repos)} repos "
+            f"from GitHub to persistent DuckDB database."
+        )
+        if sync_result.failed_repos:
+            subtitle += f" {len(sync_result.failed_repos)} repos failed."
+
+    return _render_template_data_fetcher(title=title, subtitle=subtitle, sync_result=sync_result, sync_job=job)
+
+
+@data_fetcher_bp.route("/sync_jobs/<job_id>/status")
+def sync_job_status(job_id: str):
+    """Progress of a sync job as JSON, polled by the sync page."""
+    job = get_sync_job(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.as_dict())
 
 
 @data_fetcher_bp.route("/recreate_db")
@@ -133,8 +111,40 @@ def delete_all_prs():
     )
 
 
-def _render_template_data_fetcher(*, title: str, subtitle: str):
-    stats: PRStats = duckdb_client.get_pr_stats()
+@data_fetcher_bp.route("/export_parquet")
+def export_parquet():
+    """Export all PRs and reviews to Parquet files in the configured directory."""
+    directory = get_settings().PARQUET_DIRECTORY
+    logger.info(f"Exporting PRs to Parquet files in {directory}")
+    transfer = duckdb_client.export_parquet(directory)
+    return _render_template_data_fetcher(
+        title="Parquet Export Complete",
+        subtitle=f"Exported {transfer.prs_count} PRs and {transfer.reviews_count} reviews to {transfer.directory}.",
+    )
+
+
+@data_fetcher_bp.route("/import_parquet")
+def import_parquet():
+    """Import PRs and reviews from Parquet files in the configured directory, on top of the stored ones."""
+    directory = get_settings().PARQUET_DIRECTORY
+    logger.info(f"Importing PRs from Parquet files in {directory}")
+    transfer = duckdb_client.import_parquet(directory)
+    return _render_template_data_fetcher(
+        title="Parquet Import Complete",
+        subtitle=f"Imported {transfer.prs_count} PRs and {transfer.reviews_count} reviews from {transfer.directory}.",
+    )
+
+
+def _render_template_data_fetcher(
+    *,
+    title: str,
+    subtitle: str,
+    sync_result: SyncResult | None = None,
+    sync_job: SyncJob | None = None,
+):
+    stats: PRStats = cached_by_data_generation(
+        "pr_stats", duckdb_client.get_pr_stats, cache_if=lambda pr_stats: not pr_stats.error_msg
+    )
     settings = get_settings()
     return render_template(
         "data_fetcher.html",
@@ -142,4 +152,7 @@ def _render_template_data_fetcher(*, title: str, subtitle: str):
         subtitle=subtitle,
         stats=stats,
         settings=settings,
+        sync_result=sync_result,
+        sync_job=sync_job,
+        gh_budget=github_scheduler.get_rate_limit_budget(),
     )
@@ -1,18 +1,32 @@
+import dataclasses
+from datetime import UTC
+from datetime import datetime
+
 from flask import Blueprint
 from flask import render_template
 
+from prsload.cache import cached_page
 from prsload.constants import DEFAULT_NUM_OF_DAYS
 from prsload.duckdb_client import duckdb_health_check
 from prsload.exceptions import GitHubException
 from prsload.exceptions import SettingsError
-from prsload.github import github_client
+from prsload.github import github_scheduler
 from prsload.settings import Settings
 from prsload.settings import get_settings
 
 home_bp = Blueprint("home", __name__)
 
+# The page shows all settings. The token only comes from the environment, which doesn't change while running
+_SHOWN_SETTINGS = tuple(field.name for field in dataclasses.fields(Settings) if field.name != "GH_TOKEN")
+
+
+def _this_minute() -> datetime:
+    """The GitHub check and rate limit budget on the page are checked again at most once a minute."""
+    return datetime.now(tz=UTC).replace(second=0, microsecond=0)
+
 
 @home_bp.route("/")
+@cached_page(*_SHOWN_SETTINGS, extra_key=_this_minute)
 def index():
     gh_query = "{ viewer { login } }"
     gh_response = None
@@ -25,7 +39,8 @@ def index():
         duckdb_health = duckdb_health_check()
 
         try:
-            gh_response = github_client.post_gql_query(gh_query)
+            # The page is a quick check, so fail right away instead of retrying
+            gh_response = github_scheduler.post_gql_query(gh_query, max_retries=0)
         except GitHubException as exc:
             gh_exc = exc
 
@@ -38,6 +53,7 @@ def index():
         gh_response=gh_response.data if gh_response else None,
         gh_exc=gh_exc if gh_exc else None,
         gh_query=gh_query,
+        gh_budget=github_scheduler.get_rate_limit_budget() if settings else None,
         duckdb_health=duckdb_health,
         default_num_of_days=DEFAULT_NUM_OF_DAYS,
     )
@@ -0,0 +1,61 @@
+import time
+
+from flask import Blueprint
+from flask import Flask
+from flask import Response
+from flask import g
+from flask import request
+from flask.signals import before_render_template
+from flask.signals import template_rendered
+
+from prsload import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+def metrics_view():
+    """All metrics in the Prometheus text format, for scraping."""
+    return Response(metrics.render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@metrics_bp.before_app_request
+def _start_request_timer() -> None:
+    g.metrics_started = time.perf_counter()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+
+
+@metrics_bp.after_app_request
+def _count_request(response: Response) -> Response:
+    metrics.HTTP_REQUESTS.inc(endpoint=_endpoint(), status=str(response.status_code))
+    return response
+
+
+@metrics_bp.teardown_app_request
+def _stop_request_timer(_exc: BaseException | None) -> None:
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+    metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=_endpoint())
+
+
+@metrics_bp.record_once
+def _time_template_renders(state) -> None:
+    app: Flask = state.app
+
+    def start(_app: Flask, template, context: dict) -> None:
+        g.setdefault("metrics_render_started", {})[template.name] = time.perf_counter()
+
+    def stop(_app: Flask, template, context: dict) -> None:
+        started = g.get("metrics_render_started", {}).pop(template.name, None)
+        if started is not None:
+            metrics.TEMPLATE_RENDER_SECONDS.observe(time.perf_counter() - started, template=template.name or "")
+
+    before_render_template.connect(start, app, weak=False)
+    template_rendered.connect(stop, app, weak=False)
+
+
+def _endpoint() -> str:
+    # Endpoints, not paths, so a label never holds a job id or a typo of a URL
+    return request.endpoint or "unmatched"
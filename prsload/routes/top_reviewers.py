@@ -1,13 +1,24 @@
 import logging
 from dataclasses import dataclass
 from dataclasses import field
+from datetime import UTC
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
 from operator import attrgetter
-from statistics import median
 
 from flask import Blueprint
+from flask import abort
 from flask import render_template
-
-from prsload.duckdb_client.client import get_connection
+from flask import request
+
+from prsload import duckdb_client
+from prsload.cache import cached_by_data_generation
+from prsload.cache import cached_page
+from prsload.duckdb_client import ReviewerStats
+from prsload.duckdb_client import ReviewFilter
+from prsload.duckdb_client import ReviewTimeBucket
+from prsload.settings import Settings
 from prsload.settings import get_settings
 from prsload.templatetags.template_filters import ALL_COLORS
 
@@ -15,89 +26,122 @@ logger = logging.getLogger(__name__)
 
 analytics_bp = Blueprint("analytics", __name__)
 
+# Query args of the filters, all of them can be left out
+_FILTER_ARGS = ("from", "to", "repo", "reviewer", "author", "team", "author_team")
+
+
+def _today() -> date:
+    return datetime.now(tz=UTC).date()
+
 
 @analytics_bp.route("/top_reviewers")
+@cached_page("NUM_OF_DAYS", "REVIEW_TIME_THRESHOLDS_MINUTES", "TEAMS", extra_key=_today)
 def top_reviewers():
     settings = get_settings()
+    thresholds = settings.REVIEW_TIME_THRESHOLDS_MINUTES
+    review_filter = _get_review_filter(settings)
+    reviewer_stats = cached_by_data_generation(
+        ("reviewer_stats", tuple(thresholds), review_filter),
+        lambda: duckdb_client.get_reviewer_stats(thresholds, review_filter),
+    )
+    # Without a filter, the trends show the analysis window
+    trends_filter = review_filter or ReviewFilter(
+        since=_today() - timedelta(days=settings.NUM_OF_DAYS), until=_today()
+    )
+    trends = cached_by_data_generation(
+        ("weekly_trends", trends_filter), lambda: duckdb_client.get_weekly_trends(trends_filter)
+    )
 
+    if review_filter:
+        title = f"PRs stats from {review_filter.since} to {review_filter.until}"
+    else:
+        title = f"PRs stats for the last {settings.NUM_OF_DAYS} days"
     return render_template(
         "top_reviewers.html",
-        title=f"PRs stats for the last {settings.NUM_OF_DAYS} days",
+        title=title,
         subtitle="",
         settings=settings,
-        workload_stats=_get_workload_stats(),
-        speed_stats=_get_speed_stats(),
+        review_filter=trends_filter,
+        filter_args={name: ",".join(request.args.getlist(name)) for name in _FILTER_ARGS},
+        workload_stats=_get_workload_stats(reviewer_stats),
+        speed_stats=_get_speed_stats(reviewer_stats),
+        weekly_requested=trends.requested_by_reviewer,
         scale_colors=ALL_COLORS,
     )
 
 
+def _get_review_filter(settings: Settings) -> ReviewFilter | None:
+    """The filter of the query args, None without any. Bad dates and unknown teams are answered with 400."""
+    if not any(request.args.get(name) for name in _FILTER_ARGS):
+        return None
+
+    until = _get_date_arg("to", default=_today())
+    since = _get_date_arg("from", default=until - timedelta(days=settings.NUM_OF_DAYS))
+    if since > until:
+        abort(400, description=f"from {since} is after to {until}")
+
+    return ReviewFilter(
+        since=since,
+        until=until,
+        repos=tuple(_get_list_arg("repo")),
+        reviewers=tuple(sorted({*_get_list_arg("reviewer"), *_get_team_members(settings, "team")})),
+        authors=tuple(sorted({*_get_list_arg("author"), *_get_team_members(settings, "author_team")})),
+    )
+
+
+def _get_date_arg(name: str, default: date) -> date:
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f"{name} must be a date like 2025-01-31, got {value!r}")
+
+
+def _get_list_arg(name: str) -> list[str]:
+    """Values of a query arg, given repeatedly or comma separated."""
+    return sorted({value.strip() for arg in request.args.getlist(name) for value in arg.split(",") if value.strip()})
+
+
+def _get_team_members(settings: Settings, name: str) -> list[str]:
+    members: list[str] = []
+    for team in _get_list_arg(name):
+        if team not in settings.TEAMS:
+            abort(400, description=f"Unknown team {team!r}, teams are configured in {settings.CONFIG_FILE_NAME}")
+        members.extend(settings.TEAMS[team])
+    return members
+
+
 @dataclass
 class WorkloadForUser:
     user: str
-    prs_where_review_was_requested: set[int] = field(default_factory=set)
-    prs_where_commented: set[int] = field(default_factory=set)
-    prs_where_review_finished: set[int] = field(default_factory=set)
+    num_of_requested_reviews: int = 0
+    num_of_commented_reviews: int = 0
+    num_of_finished_reviews: int = 0
     prs_where_no_review_response: list[str] = field(default_factory=list)
 
-    @property
-    def num_of_finished_reviews(self):
-        return len(self.prs_where_review_finished)
-
     @property
     def percentage_of_prs_with_missing_review(self):
-        if len(self.prs_where_review_was_requested) == 0:
+        if self.num_of_requested_reviews == 0:
             return 0
-        return int(100 * len(self.prs_where_no_review_response) / len(self.prs_where_review_was_requested))
+        return int(100 * len(self.prs_where_no_review_response) / self.num_of_requested_reviews)
 
 
-def _get_workload_stats() -> list[WorkloadForUser]:
+def _get_workload_stats(reviewer_stats: list[ReviewerStats]) -> list[WorkloadForUser]:
     """Build stats about the workload of every dev.
     How many PRs are they assigned too and how many are they responding too."""
 
-    reviewers = []
-
-    with get_connection() as conn:
-        result = conn.execute("""
-            SELECT
-                r.reviewer,
-                -- PRs where review was requested (where reviewer is not null and requested_at is not null)
-                GROUP_CONCAT(CASE WHEN r.requested_at IS NOT NULL THEN p.id END) as requested_pr_ids,
-                -- PRs where they commented (first_sign_of_life is not null)
-                GROUP_CONCAT(CASE WHEN r.first_sign_of_life IS NOT NULL THEN p.id END) as commented_pr_ids,
-                -- PRs where they finished review (first_approve_or_disapprove is not null)
-                GROUP_CONCAT(CASE WHEN r.first_approve_or_disapprove IS NOT NULL THEN p.id END) as finished_pr_ids,
-                -- PRs where they were requested but didn't respond (requested_at not null but first_sign_of_life is null)
-                GROUP_CONCAT(CASE WHEN r.requested_at IS NOT NULL AND r.first_sign_of_life IS NULL THEN p.repo_slug || '/pull/' || p.number END) as no_response_pr_ids
-            FROM reviews r
-            JOIN prs p ON r.pr_id = p.id
-            WHERE r.reviewer IS NOT NULL
-            GROUP BY r.reviewer
-            """).fetchall()  # noqa: E501
-
-        for row in result:
-            reviewer, requested_ids, commented_ids, finished_ids, no_response_ids = row
-
-            requested_set: set[int] = set(
-                int(pr_id) for pr_id in (requested_ids or "").split(",") if pr_id and pr_id != "None"
-            )
-            commented_set: set[int] = set(
-                int(pr_id) for pr_id in (commented_ids or "").split(",") if pr_id and pr_id != "None"
-            )
-            finished_set: set[int] = set(
-                int(pr_id) for pr_id in (finished_ids or "").split(",") if pr_id and pr_id != "None"
-            )
-            no_response_set: list[str] = sorted(
-                set(str(pr_slug) for pr_slug in (no_response_ids or "").split(",") if pr_slug and pr_slug != "None")
-            )
-
-            user_data = WorkloadForUser(
-                user=reviewer,
-                prs_where_review_was_requested=requested_set,
-                prs_where_commented=commented_set,
-                prs_where_review_finished=finished_set,
-                prs_where_no_review_response=no_response_set,
-            )
-            reviewers.append(user_data)
+    reviewers = [
+        WorkloadForUser(
+            user=stats.reviewer,
+            num_of_requested_reviews=stats.requested_prs,
+            num_of_commented_reviews=stats.commented_prs,
+            num_of_finished_reviews=stats.finished_prs,
+            prs_where_no_review_response=stats.no_response_prs,
+        )
+        for stats in reviewer_stats
+    ]
 
     reviewers = sorted(reviewers, key=attrgetter("num_of_finished_reviews"), reverse=True)
     return reviewers
@@ -106,87 +150,35 @@ def _get_workload_stats() -> list[WorkloadForUser]:
 @dataclass
 class SpeedForUser:
     user: str
-    reaction_times_minutes: list[float] = field(default_factory=list)
+    num_of_prs_reviewed: int = 0
+    median_reaction_time_minutes: float = 0
     prs_with_no_review: list[str] = field(default_factory=list)
-
-    @property
-    def num_of_prs_reviewed(self) -> int:
-        return len(self.reaction_times_minutes)
-
-    @property
-    def median_reaction_time_minutes(self) -> float:
-        return median(self.reaction_times_minutes) if self.reaction_times_minutes else 0
+    reviews_within: list[ReviewTimeBucket] = field(default_factory=list)
 
     @property
     def avg_reaction_time_str(self) -> str:
-        if not self.reaction_times_minutes:
+        if not self.num_of_prs_reviewed:
             return "N/A"
 
-        median_minutes = median(self.reaction_times_minutes)
-        hours = int(median_minutes // 60)
-        minutes = int(median_minutes % 60)
+        hours = int(self.median_reaction_time_minutes // 60)
+        minutes = int(self.median_reaction_time_minutes % 60)
 
         if hours > 0:
             return f"{hours}h {minutes}m"
         return f"{minutes}m"
 
-    def get_num_of_reviews_below(self, minutes: int) -> tuple[int, float]:
-        if not self.reaction_times_minutes:
-            return (0, 0.0)
-
-        num_below = len([t for t in self.reaction_times_minutes if t <= minutes])
-        total_prs = len(self.reaction_times_minutes) + len(self.prs_with_no_review)
-        percentage = round((num_below * 100) / total_prs, 0) if total_prs > 0 else 0.0
-
-        return (num_below, percentage)
-
-
-def _get_speed_stats() -> list[SpeedForUser]:
-    speed_stats: list[SpeedForUser] = []
-    with get_connection() as conn:
-        result = conn.execute("""
-          SELECT
-              r.reviewer,
-              -- Reaction times in minutes for PRs where they reviewed
-              GROUP_CONCAT(CASE
-                  WHEN r.requested_at IS NOT NULL AND r.first_sign_of_life IS NOT NULL
-                  THEN CASE
-                      WHEN r.first_sign_of_life >= r.requested_at
-                      THEN EXTRACT(EPOCH FROM (r.first_sign_of_life - r.requested_at)) / 60.0
-                      ELSE 0
-                  END
-              END) as reaction_times_minutes,
-              -- PRs with no review (requested but no response)
-              GROUP_CONCAT(CASE
-                  WHEN r.requested_at IS NOT NULL AND r.first_sign_of_life IS NULL
-                  THEN p.repo_slug || '/pull/' || p.number
-              END) as prs_with_no_review
-          FROM reviews r
-          JOIN prs p ON r.pr_id = p.id
-          WHERE r.reviewer IS NOT NULL
-          GROUP BY r.reviewer
-        """).fetchall()
-
-        for row in result:
-            user, reaction_times_str, prs_with_no_review_str = row
-
-            reaction_times: list[float] = []
-            if reaction_times_str:
-                reaction_times = [float(t) for t in reaction_times_str.split(",") if t and t != "None"]
-
-            prs_with_no_review: list[str] = []
-            if prs_with_no_review_str:
-                prs_with_no_review = [pr for pr in prs_with_no_review_str.split(",") if pr and pr != "None"]
-
-            speed_data = SpeedForUser(
-                user=user,
-                reaction_times_minutes=reaction_times,
-                prs_with_no_review=prs_with_no_review,
-            )
-            speed_stats.append(speed_data)
-
-        x: SpeedForUser  # noqa
-        speed_stats = sorted(speed_stats, key=lambda x: x.user)
-        speed_stats = sorted(speed_stats, key=lambda x: x.median_reaction_time_minutes)
-
-        return speed_stats
+
+def _get_speed_stats(reviewer_stats: list[ReviewerStats]) -> list[SpeedForUser]:
+    speed_stats: list[SpeedForUser] = [
+        SpeedForUser(
+            user=stats.reviewer,
+            num_of_prs_reviewed=stats.reviewed_prs,
+            median_reaction_time_minutes=stats.median_reaction_minutes or 0,
+            prs_with_no_review=stats.no_response_prs,
+            reviews_within=stats.reviews_within,
+        )
+        for stats in reviewer_stats
+    ]
+
+    # Reviewers come sorted by name, so equally fast reviewers stay sorted by name
+    return sorted(speed_stats, key=attrgetter("median_reaction_time_minutes"))
@@ -1,23 +1,43 @@
 import dataclasses
 import logging
+import math
 import os
+import time
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import UTC
 from datetime import datetime
 from datetime import timedelta
-from functools import cache
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+from prsload.constants import DEFAULT_CACHE_MAX_ENTRIES
+from prsload.constants import DEFAULT_GH_CONNECT_TIMEOUT
+from prsload.constants import DEFAULT_GH_GRAPHQL_URL
+from prsload.constants import DEFAULT_GH_MAX_RETRIES
+from prsload.constants import DEFAULT_GH_MIN_REMAINING_POINTS
+from prsload.constants import DEFAULT_GH_POOL_SIZE
+from prsload.constants import DEFAULT_GH_READ_TIMEOUT
 from prsload.constants import DEFAULT_NUM_OF_DAYS
+from prsload.constants import DEFAULT_PARQUET_DIRECTORY
+from prsload.constants import DEFAULT_REVIEW_TIME_THRESHOLDS_MINUTES
+from prsload.constants import DEFAULT_SYNC_CONCURRENCY
+from prsload.constants import DEFAULT_SYNC_REPOS_PER_REQUEST
+from prsload.constants import DEFAULT_SYNC_WRITE_BATCH_PRS
+from prsload.constants import SYNC_STRATEGIES
+from prsload.constants import SYNC_STRATEGY_PULL_REQUESTS
 from prsload.exceptions import SettingsError
 
 logger = logging.getLogger(__name__)
 
 _CONFIG_FILE_NAME = "config.yml"
+# config.yml is looked at again at most this often, not on every get_settings() call
+_CONFIG_CHECK_INTERVAL_SECONDS = 1.0
+# When config.yml was last looked at, time.monotonic(), and its modification time then
+_config_checked: tuple[float, float | None] = (-math.inf, None)
 
 
 @dataclass
@@ -25,10 +45,27 @@ class Settings:
     GH_LOGIN: str
     GH_TOKEN: str
     NUM_OF_DAYS: int
+    REVIEW_TIME_THRESHOLDS_MINUTES: list[int]
     BLOCKLISTED_REPOS: list[str]
     REVIEWERS_TO_IGNORE: list[str]
     PR_AUTHORS_TO_IGNORE: list[str]
     VACATION: dict[str, list[tuple[datetime, datetime]]]
+    TEAMS: dict[str, list[str]]
+    SYNC_CONCURRENCY: int
+    SYNC_REPOS_PER_REQUEST: int
+    SYNC_STRATEGY: str
+    SYNC_WRITE_BATCH_PRS: int
+    DUCKDB_MEMORY_LIMIT: str | None
+    DUCKDB_THREADS: int | None
+    CACHE_MAX_ENTRIES: int
+    PARQUET_DIRECTORY: str
+    GH_GRAPHQL_URL: str
+    GH_RECORD_DIR: str | None
+    GH_POOL_SIZE: int
+    GH_CONNECT_TIMEOUT: float
+    GH_READ_TIMEOUT: float
+    GH_MAX_RETRIES: int
+    GH_MIN_REMAINING_POINTS: int
 
     @property
     def as_dict(self) -> dict[str, str | int | list[str]]:
@@ -77,8 +114,29 @@ def _parse_vacation_data(vacation_config: dict) -> dict[str, list[tuple[datetime
     return vacation
 
 
-@cache
 def get_settings() -> Settings:
+    """Settings from the environment and config.yml, read again within a second after config.yml changed."""
+    return _get_settings(_config_mtime())
+
+
+def _config_mtime() -> float | None:
+    global _config_checked  # noqa: PLW0603
+    checked_at, mtime = _config_checked
+    now = time.monotonic()
+    if now - checked_at < _CONFIG_CHECK_INTERVAL_SECONDS:
+        return mtime
+
+    try:
+        mtime = os.stat(_CONFIG_FILE_NAME).st_mtime
+    except OSError:
+        mtime = None
+    _config_checked = (now, mtime)
+    return mtime
+
+
+@lru_cache(maxsize=1)
+def _get_settings(config_mtime: float | None) -> Settings:
+    """`config_mtime` is only the cache key, a changed config.yml is a cache miss."""
     gh_token = os.getenv("GH_API_TOKEN")
     gh_login = os.getenv("GH_LOGIN")
 
@@ -91,18 +149,67 @@ def get_settings() -> Settings:
     users = config.get("users", {})
     repos = config.get("repositories", {})
     vacation_config = config.get("vacation", {})
+    sync = config.get("sync", {})
+    duckdb_config = config.get("duckdb", {})
+    github_config = config.get("github", {})
+    cache_config = config.get("cache", {})
+    parquet_config = config.get("parquet", {})
+    teams_config = config.get("teams", {})
 
     num_days: int = int(analysis.get("num_of_days", DEFAULT_NUM_OF_DAYS))
+    raw_thresholds = analysis.get("review_time_thresholds_minutes", DEFAULT_REVIEW_TIME_THRESHOLDS_MINUTES)
+    review_time_thresholds: list[int] = sorted(int(minutes) for minutes in raw_thresholds)
+    if any(minutes <= 0 for minutes in review_time_thresholds):
+        raise SettingsError(f"analysis.review_time_thresholds_minutes must be positive, got {review_time_thresholds}")
     blocklisted_repos: list[str] = repos.get("blocklisted", [])
     reviewers_ignore: list[str] = users.get("reviewers_to_ignore", [])
     authors_ignore: list[str] = users.get("pr_authors_to_ignore", [])
+    if not isinstance(teams_config, dict):
+        raise SettingsError(f"teams must map team names to lists of logins, got {teams_config!r}")
+    teams: dict[str, list[str]] = {
+        str(team): [str(login) for login in logins] for team, logins in teams_config.items()
+    }
+    sync_concurrency: int = int(sync.get("concurrency", DEFAULT_SYNC_CONCURRENCY))
+    sync_repos_per_request: int = int(sync.get("repos_per_request", DEFAULT_SYNC_REPOS_PER_REQUEST))
+    sync_strategy: str = sync.get("strategy", SYNC_STRATEGY_PULL_REQUESTS)
+    if sync_strategy not in SYNC_STRATEGIES:
+        raise SettingsError(f"sync.strategy must be one of {', '.join(SYNC_STRATEGIES)}, got {sync_strategy!r}")
+    sync_write_batch_prs: int = int(sync.get("write_batch_prs", DEFAULT_SYNC_WRITE_BATCH_PRS))
+    duckdb_memory_limit: str | None = duckdb_config.get("memory_limit")
+    duckdb_threads: int | None = int(duckdb_config["threads"]) if duckdb_config.get("threads") else None
+    cache_max_entries: int = int(cache_config.get("max_entries", DEFAULT_CACHE_MAX_ENTRIES))
+    parquet_directory: str = str(parquet_config.get("directory", DEFAULT_PARQUET_DIRECTORY))
+    gh_graphql_url: str = github_config.get("url", DEFAULT_GH_GRAPHQL_URL)
+    gh_record_dir: str | None = github_config.get("record_dir")
+    gh_pool_size: int = int(github_config.get("pool_size", DEFAULT_GH_POOL_SIZE))
+    gh_connect_timeout: float = float(github_config.get("connect_timeout", DEFAULT_GH_CONNECT_TIMEOUT))
+    gh_read_timeout: float = float(github_config.get("read_timeout", DEFAULT_GH_READ_TIMEOUT))
+    gh_max_retries: int = int(github_config.get("max_retries", DEFAULT_GH_MAX_RETRIES))
+    gh_min_remaining_points: int = int(github_config.get("min_remaining_points", DEFAULT_GH_MIN_REMAINING_POINTS))
 
     return Settings(
         GH_LOGIN=gh_login,
         GH_TOKEN=gh_token,
         NUM_OF_DAYS=num_days,
+        REVIEW_TIME_THRESHOLDS_MINUTES=review_time_thresholds,
         BLOCKLISTED_REPOS=blocklisted_repos,
         REVIEWERS_TO_IGNORE=reviewers_ignore,
         PR_AUTHORS_TO_IGNORE=authors_ignore,
         VACATION=_parse_vacation_data(vacation_config),
+        TEAMS=teams,
+        SYNC_CONCURRENCY=sync_concurrency,
+        SYNC_REPOS_PER_REQUEST=sync_repos_per_request,
+        SYNC_STRATEGY=sync_strategy,
+        SYNC_WRITE_BATCH_PRS=sync_write_batch_prs,
+        DUCKDB_MEMORY_LIMIT=duckdb_memory_limit,
+        DUCKDB_THREADS=duckdb_threads,
+        CACHE_MAX_ENTRIES=cache_max_entries,
+        PARQUET_DIRECTORY=parquet_directory,
+        GH_GRAPHQL_URL=gh_graphql_url,
+        GH_RECORD_DIR=gh_record_dir,
+        GH_POOL_SIZE=gh_pool_size,
+        GH_CONNECT_TIMEOUT=gh_connect_timeout,
+        GH_READ_TIMEOUT=gh_read_timeout,
+        GH_MAX_RETRIES=gh_max_retries,
+        GH_MIN_REMAINING_POINTS=gh_min_remaining_points,
     )
@@ -0,0 +1,17 @@
+from .cleaner import PRCleaner
+from .jobs import SyncJob
+from .jobs import get_current_sync_job
+from .jobs import get_sync_job
+from .jobs import start_sync_job
+from .runner import SyncResult
+from .runner import sync_all_repos
+
+__all__ = [
+    "PRCleaner",
+    "SyncJob",
+    "SyncResult",
+    "get_current_sync_job",
+    "get_sync_job",
+    "start_sync_job",
+    "sync_all_repos",
+]
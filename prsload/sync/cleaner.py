@@ -0,0 +1,41 @@
+import logging
+
+from prsload.pr_type import PR
+from prsload.pr_type import PRBatch
+from prsload.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class PRCleaner:
+    """Drops PRs outside of the analysis window before they are stored.
+
+    Ignored users, self-reviews and vacations are not cleaned here, PRs are stored with all
+    their reviews and the analytics apply that policy at query time, see duckdb_client/policy.py."""
+
+    @classmethod
+    def is_pr_too_old(cls, pr: PR, settings: Settings) -> bool:
+        merge_too_old = bool(pr.merged_at and pr.merged_at < settings.OLDEST_VALID_PR_MERGE_DATE)
+        create_too_old = bool(pr.created_at < settings.OLDEST_VALID_PR_CREATE_DATE)
+        return merge_too_old and create_too_old
+
+    @staticmethod
+    def too_old_mask(batch: PRBatch, settings: Settings) -> list[bool]:
+        """`is_pr_too_old()` of every PR of the batch."""
+        merge_date, create_date = settings.OLDEST_VALID_PR_MERGE_DATE, settings.OLDEST_VALID_PR_CREATE_DATE
+        return [
+            bool(merged_at and merged_at < merge_date and created_at < create_date)
+            for merged_at, created_at in zip(batch.merged_ats, batch.created_ats, strict=True)
+        ]
+
+    @classmethod
+    def sanitize_pr(cls, pr: PR, settings: Settings) -> PR | None:
+        if pr.merged_at and pr.merged_at < settings.OLDEST_VALID_PR_MERGE_DATE:
+            return None
+        return pr
+
+    @classmethod
+    def clean_batch(cls, batch: PRBatch, settings: Settings) -> PRBatch:
+        """`sanitize_pr()` for a whole batch, as one mask over the PR columns."""
+        merge_date = settings.OLDEST_VALID_PR_MERGE_DATE
+        return batch.select(not (merged_at and merged_at < merge_date) for merged_at in batch.merged_ats)
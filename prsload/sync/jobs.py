@@ -0,0 +1,133 @@
+import logging
+import threading
+import uuid
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import UTC
+from datetime import datetime
+
+from prsload.github import github_scheduler
+from prsload.settings import get_settings
+from prsload.sync.runner import SyncResult
+from prsload.sync.runner import sync_all_repos
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept around, so their status page keeps working for a while
+MAX_KEPT_JOBS = 20
+
+
+@dataclass
+class SyncJob:
+    """A sync running in a background thread; `result` is its live progress."""
+
+    result: SyncResult
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "running"  # running, finished or failed
+    started_at: datetime = field(default_factory=lambda: datetime.now(tz=UTC))
+    finished_at: datetime | None = None
+    error_msg: str = ""
+
+    @property
+    def is_running(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def elapsed_seconds(self) -> float:
+        end = self.finished_at or datetime.now(tz=UTC)
+        return (end - self.started_at).total_seconds()
+
+    @property
+    def eta_seconds(self) -> float | None:
+        """Extrapolated from the repos done so far, None until the first repo finished.
+
+        When the search API reported how many PRs there are, from the PRs fetched so far instead."""
+        if not self.is_running:
+            return 0.0
+        if self.result.prs_expected and self.result.prs_fetched:
+            prs_remaining = max(self.result.prs_expected - self.result.prs_fetched, 0)
+            return self.elapsed_seconds / self.result.prs_fetched * prs_remaining
+        if not self.result.repos_done:
+            return None
+        repos_remaining = self.result.repos_total - self.result.repos_done
+        return self.elapsed_seconds / self.result.repos_done * repos_remaining
+
+    def as_dict(self) -> dict:
+        budget = github_scheduler.get_rate_limit_budget()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "full_resync": self.result.full_resync,
+            "run_id": self.result.run_id,
+            "resumed": self.result.resumed,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": round(self.elapsed_seconds, 1),
+            "eta_seconds": None if self.eta_seconds is None else round(self.eta_seconds, 1),
+            "repos_total": self.result.repos_total,
+            "repos_done": self.result.repos_done,
+            "repos_remaining": max(self.result.repos_total - self.result.repos_done, 0),
+            "prs_expected": self.result.prs_expected,
+            "prs_fetched": self.result.prs_fetched,
+            "synced_prs": self.result.synced_prs,
+            "failed_repos": dict(self.result.failed_repos),
+            "error_msg": self.error_msg,
+            "metrics": dict(self.result.metrics),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.result.stage_seconds.items()},
+            "gh_budget": {
+                "limit": budget.limit,
+                "remaining": budget.remaining,
+                "reset_at": budget.reset_at.isoformat() if budget.reset_at else None,
+            },
+        }
+
+
+_jobs: dict[str, SyncJob] = {}
+_current_job: SyncJob | None = None
+_jobs_lock = threading.Lock()
+
+
+def start_sync_job(full_resync: bool = False) -> SyncJob:
+    """Start syncing in a background thread and return the job.
+
+    Only one sync runs at a time: while a job is running, it is returned instead
+    of starting another one, whether or not it is a full resync."""
+    global _current_job  # noqa: PLW0603
+    with _jobs_lock:
+        if _current_job is not None and _current_job.is_running:
+            logger.info(f"Sync job {_current_job.id} is already running, attaching to it")
+            return _current_job
+
+        job = SyncJob(result=SyncResult(full_resync=full_resync))
+        _jobs[job.id] = job
+        _current_job = job
+        while len(_jobs) > MAX_KEPT_JOBS:
+            del _jobs[next(iter(_jobs))]
+
+    thread = threading.Thread(target=_run_sync_job, args=(job,), name=f"sync-job-{job.id[:8]}", daemon=True)
+    thread.start()
+    logger.info(f"Started sync job {job.id} {full_resync=}")
+    return job
+
+
+def get_sync_job(job_id: str) -> SyncJob | None:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def get_current_sync_job() -> SyncJob | None:
+    """The running job, or the last one if none is running."""
+    with _jobs_lock:
+        return _current_job
+
+
+def _run_sync_job(job: SyncJob) -> None:
+    try:
+        sync_all_repos(get_settings(), job.result)
+        job.status = "finished"
+    except Exception as exc:
+        logger.error(f"Sync job {job.id} failed: {exc}", exc_info=exc)
+        job.error_msg = str(exc)
+        job.status = "failed"
+    finally:
+        job.finished_at = datetime.now(tz=UTC)
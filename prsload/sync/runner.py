@@ -0,0 +1,494 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import replace
+from datetime import UTC
+from datetime import datetime
+
+import requests
+
+from prsload import duckdb_client
+from prsload import github
+from prsload import metrics
+from prsload.constants import SYNC_STRATEGY_SEARCH
+from prsload.duckdb_client import SyncCheckpoint
+from prsload.exceptions import GitHubException
+from prsload.github import PRPage
+from prsload.github.prs import MAX_PRS_OF_BATCHED_REPO
+from prsload.github.prs import MAX_REPOS_PER_REQUEST
+from prsload.github.repos import Repo
+from prsload.pr_type import PRBatch
+from prsload.settings import Settings
+from prsload.sync.cleaner import PRCleaner
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncResult:
+    """Filled in while the sync runs, so it doubles as the progress of a running sync."""
+
+    full_resync: bool
+    run_id: str = ""
+    # True when an interrupted sync run was resumed from its checkpoints
+    resumed: bool = False
+    repos_total: int = 0
+    repos_done: int = 0
+    # PRs the search API reported up front, 0 unless the sync uses the search strategy
+    prs_expected: int = 0
+    prs_fetched: int = 0
+    synced_prs: int = 0
+    synced_repos: list[str] = field(default_factory=list)
+    blocklisted_repos: list[str] = field(default_factory=list)
+    failed_repos: dict[str, str] = field(default_factory=dict)
+    # What the metrics counted during the sync, filled in when it is done
+    metrics: dict[str, float] = field(default_factory=dict)
+    # Time spent per pipeline stage, summed over the threads of the stage, see `_StageTimes`
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+
+
+class _StageTimes:
+    """Adds up the time of the sync pipeline stages into `result.stage_seconds`:
+    - fetch: waiting for GitHub, parse: turning responses into PRs, both in the fetch workers,
+    - fetch_blocked: fetch workers waiting for the cleaner, i.e. backpressure,
+    - clean: the cleaner running `PRCleaner`, clean_blocked: the cleaner waiting for the writer,
+    - write: committing to DuckDB, writer_idle: the writer waiting for cleaned PRs.
+
+    The stage that is busy most of the time is the bottleneck, the ones before it are blocked and
+    the ones after it idle."""
+
+    def __init__(self, result: SyncResult):
+        self._result = result
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        metrics.SYNC_STAGE_SECONDS.inc(seconds, stage=stage)
+        with self._lock:
+            self._result.stage_seconds[stage] = self._result.stage_seconds.get(stage, 0.0) + seconds
+
+    def put[T](self, stage: str, work_queue: queue.Queue[T], item: T) -> None:
+        """Put `item` into the bounded `work_queue`, the time it was full counts as `stage`."""
+        started = time.perf_counter()
+        work_queue.put(item)
+        self.add(stage, time.perf_counter() - started)
+
+
+@dataclass
+class _SyncPage:
+    """PRs of one GitHub page, stored together with the checkpoint after that page.
+
+    The fetch worker sends the PRs as parsed, up to the first one that is too old,
+    the cleaner passes a copy with the cleaned PRs on to the writer."""
+
+    repo_slug: str
+    prs: PRBatch
+    checkpoint: SyncCheckpoint
+    # PRs on the page before cleaning, and how many the search found if this page started a search
+    fetched_prs: int = 0
+    expected_prs: int = 0
+
+
+@dataclass
+class _RepoDone:
+    repo_slug: str
+    started_at: datetime
+    newest_updated_at: datetime | None
+
+
+@dataclass
+class _RepoFailed:
+    repo_slug: str
+    error: Exception
+
+
+_TWorkItem = _SyncPage | _RepoDone | _RepoFailed
+
+
+def sync_all_repos(settings: Settings, result: SyncResult) -> SyncResult:
+    """Sync PRs of all repos from GitHub into DuckDB, recording the progress in `result`.
+
+    The sync is a pipeline of stages connected by bounded queues, so GitHub, Python and
+    DuckDB are busy at the same time and a slow stage holds the ones before it back
+    instead of piling PRs up in memory:
+    - a pool of `settings.SYNC_CONCURRENCY` workers fetches and parses the pages of the repos,
+      a worker asks for the next page of its repo as soon as the last one is queued,
+    - a cleaner thread runs `PRCleaner` on every page,
+    - the calling thread is the single DuckDB writer, so the DB file lock is never contended.
+      Pages that queued up while it committed are committed together, up to
+      `settings.SYNC_WRITE_BATCH_PRS` PRs at once.
+    How long each stage was busy, blocked or idle is recorded in `result.stage_seconds`.
+    A failing repo is reported in the result and does not abort the other repos.
+
+    With the `pull_requests` strategy, the first page of PRs of up to
+    `settings.SYNC_REPOS_PER_REQUEST` small repos is fetched with one request, only repos
+    with more pages are then paginated one by one, like the bigger repos. With the `search` strategy, every
+    repo searches for the PRs updated within the analysis window on its own.
+
+    Every stored page of PRs is checkpointed in the sync run. If the sync is interrupted,
+    the next one resumes the run: finished repos are skipped, the others continue
+    after their last stored page. Once the run completes, only the checkpoints of failed
+    repos are kept, the next run continues those repos after their last stored page too.
+
+    Finally, the materialized reviewer and repo stats of everything this sync stored
+    are rebuilt, so the analytics pages read them without scanning all PRs, and
+    what the metrics counted meanwhile is stored as the summary of the sync run.
+    The metrics are process wide, pages served during the sync count into the summary too."""
+    with metrics.SYNCS_IN_PROGRESS.track_in_progress():
+        metrics_before = metrics.snapshot()
+        _sync_all_repos(settings, result)
+        result.metrics = metrics.diff_snapshots(metrics_before, metrics.snapshot())
+        duckdb_client.store_sync_metrics(result.run_id, result.metrics)
+    return result
+
+
+def _sync_all_repos(settings: Settings, result: SyncResult) -> None:
+    # The stats refreshed at the end of the sync apply the policy of the settings the sync runs with
+    duckdb_client.ensure_filtering_policy(settings)
+    sync_run, result.resumed = duckdb_client.start_sync_run(result.full_resync)
+    result.run_id = sync_run.id
+    result.full_resync = full_resync = sync_run.full_resync
+    checkpoints = duckdb_client.get_sync_checkpoints(sync_run.id)
+    watermarks = {} if full_resync else duckdb_client.get_repo_watermarks()
+
+    repos: list[Repo] = []
+    for repo in github.fetch_all_repos():
+        if repo.slug in settings.BLOCKLISTED_REPOS:
+            result.blocklisted_repos.append(repo.slug)
+            continue
+
+        if repo.total_prs == 0:
+            continue
+
+        checkpoint = checkpoints.get(repo.slug)
+        if checkpoint and checkpoint.is_done:
+            result.synced_repos.append(repo.slug)
+            continue
+
+        repos.append(repo)
+
+    result.repos_total = len(repos)
+    concurrency = max(1, settings.SYNC_CONCURRENCY)
+    repos_per_request = min(max(1, settings.SYNC_REPOS_PER_REQUEST), MAX_REPOS_PER_REQUEST)
+    logger.info(
+        f"Syncing {len(repos)} repos with {concurrency} worker(s) {full_resync=} "
+        f"run={sync_run.id} resumed={result.resumed}"
+    )
+
+    # Bounded, so fast fetchers wait for the cleaner and the cleaner for the writer
+    pages_queue: queue.Queue[_TWorkItem | None] = queue.Queue(maxsize=concurrency * 2)
+    work_queue: queue.Queue[_TWorkItem] = queue.Queue(maxsize=concurrency * 2)
+    stage_times = _StageTimes(result)
+    cleaner = threading.Thread(
+        target=_clean_pages,
+        args=(pages_queue, work_queue, settings, stage_times),
+        name="sync-cleaner",
+        daemon=True,
+    )
+    cleaner.start()
+
+    updated_since: dict[str, datetime | None] = {
+        repo.slug: watermark.last_updated_at if (watermark := watermarks.get(repo.slug)) else None for repo in repos
+    }
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sync") as executor:
+
+        def fetch_repo(repo: Repo, first_page: PRPage | None = None) -> None:
+            checkpoint = checkpoints.get(repo.slug) or SyncCheckpoint(run_id=sync_run.id, repo_slug=repo.slug)
+            executor.submit(
+                _fetch_repo,
+                repo,
+                updated_since[repo.slug],
+                checkpoint,
+                settings,
+                pages_queue,
+                stage_times=stage_times,
+                first_page=first_page,
+            )
+
+        # Only small repos are batched, repos resumed from a checkpoint are already past their first page
+        can_batch = repos_per_request > 1 and settings.SYNC_STRATEGY != SYNC_STRATEGY_SEARCH
+        repos_to_batch: list[Repo] = []
+        for repo in repos:
+            if can_batch and repo.total_prs <= MAX_PRS_OF_BATCHED_REPO and repo.slug not in checkpoints:
+                repos_to_batch.append(repo)
+            else:
+                fetch_repo(repo)
+
+        # Similar sized repos go together, so a batch of small repos asks for a small page
+        repos_to_batch.sort(key=lambda repo: repo.total_prs)
+        for repos_batch in itertools.batched(repos_to_batch, repos_per_request, strict=False):
+            executor.submit(_fetch_first_pages, repos_batch, updated_since, fetch_repo, stage_times=stage_times)
+
+        _write_until_all_repos_finished(
+            work_queue,
+            num_of_repos=len(repos),
+            result=result,
+            stage_times=stage_times,
+            max_batch_prs=max(1, settings.SYNC_WRITE_BATCH_PRS),
+        )
+        # Every repo got through the cleaner, nothing is left in its queue
+        pages_queue.put(None)
+        cleaner.join()
+
+    # Failed repos keep their old watermark and their checkpoints, the next sync continues them from there
+    duckdb_client.finish_sync_run(sync_run.id, unfinished_repos=result.failed_repos)
+    # Only reviewers and repos with stored PRs are rebuilt, failed repos included
+    duckdb_client.refresh_stats()
+
+    logger.info(
+        f"GitHub sync complete. Synced {result.synced_prs} PRs from {len(result.synced_repos)} repos, "
+        f"{len(result.failed_repos)} repos failed. Seconds per stage: {result.stage_seconds}"
+    )
+
+
+def _fetch_first_pages(
+    repos: Iterable[Repo],
+    updated_since: dict[str, datetime | None],
+    fetch_repo: Callable[[Repo, PRPage | None], None],
+    *,
+    stage_times: _StageTimes,
+) -> None:
+    """Runs in a worker thread: fetch the first page of several repos with one request.
+
+    Each repo then continues in its own task, which only talks to GitHub
+    again if the repo has more pages. The time of the request counts here, not in those tasks."""
+    repos = list(repos)
+    fetch_started = time.perf_counter()
+    try:
+        first_pages = github.fetch_first_pr_pages(repos, updated_since)
+    except (GitHubException, requests.RequestException) as exc:
+        stage_times.add("fetch", time.perf_counter() - fetch_started)
+        # One broken repo fails the whole request, let every repo try on its own
+        logger.warning(f"Fetching the first page of {len(repos)} repos at once failed, fetching one by one: {exc}")
+        for repo in repos:
+            fetch_repo(repo, None)
+        return
+
+    parse_seconds = sum(page.parse_seconds for page in first_pages.values())
+    stage_times.add("fetch", time.perf_counter() - fetch_started - parse_seconds)
+    stage_times.add("parse", parse_seconds)
+    for repo in repos:
+        fetch_repo(repo, first_pages[repo.slug])
+
+
+def _fetch_repo(  # noqa: PLR0913
+    repo: Repo,
+    updated_since: datetime | None,
+    checkpoint: SyncCheckpoint,
+    settings: Settings,
+    pages_queue: queue.Queue[_TWorkItem | None],
+    *,
+    stage_times: _StageTimes,
+    first_page: PRPage | None = None,
+) -> None:
+    """Runs in a worker thread: fetch PRs of one repo, hand them over to the cleaner page by page.
+
+    Fetching starts after the `checkpoint`, or after the `first_page` when it was
+    already fetched in a batch."""
+    logger.info(
+        f"****OK**** Syncing PRs from GitHub for repo: {repo.slug} {repo.total_prs=} "
+        f"resume_after={checkpoint.end_cursor}"
+    )
+
+    started_at = datetime.now(tz=UTC)
+    newest_updated_at: datetime | None = checkpoint.newest_updated_at
+    is_search = settings.SYNC_STRATEGY == SYNC_STRATEGY_SEARCH
+
+    try:
+        pages: Iterable[PRPage]
+        if is_search:
+            window_start = settings.OLDEST_VALID_PR_CREATE_DATE
+            search_since = max(window_start, updated_since) if updated_since else window_start
+            pages = github.search_pr_pages(repo, updated_since=search_since, after_cursor=checkpoint.end_cursor)
+        elif first_page is None:
+            pages = github.fetch_pr_pages(repo, updated_since=updated_since, after_cursor=checkpoint.end_cursor)
+        elif first_page.is_last:
+            pages = [first_page]
+        else:
+            next_pages = github.fetch_pr_pages(repo, updated_since=updated_since, after_cursor=first_page.end_cursor)
+            pages = itertools.chain([first_page], next_pages)
+
+        pages_iterator = iter(pages)
+        while True:
+            fetch_started = time.perf_counter()
+            page = next(pages_iterator, None)
+            fetch_seconds = time.perf_counter() - fetch_started
+            if page is None:
+                stage_times.add("fetch", fetch_seconds)
+                break
+            # A first page fetched by _fetch_first_pages was parsed, and counted, before this loop
+            parse_seconds = 0.0 if page is first_page else page.parse_seconds
+            stage_times.add("fetch", fetch_seconds - parse_seconds)
+            stage_times.add("parse", parse_seconds)
+
+            raw_prs = page.prs
+            updated_ats = raw_prs.updated_ats
+            reached_too_old_prs = False
+            # Search only returns PRs updated in the window, an old PR with a fresh comment
+            # says nothing about the PRs after it. The cleaner drops it.
+            if not is_search and True in (too_old_mask := PRCleaner.too_old_mask(raw_prs, settings)):
+                # Hm... this is just an idea: probably all next PRs will also be too old, so we can stop
+                # fetching for this repo
+                first_too_old = too_old_mask.index(True)
+                raw_prs = raw_prs.head(first_too_old)
+                updated_ats = updated_ats[: first_too_old + 1]
+                reached_too_old_prs = True
+
+            page_newest_updated_at = max(filter(None, updated_ats), default=None)
+            if page_newest_updated_at and (newest_updated_at is None or page_newest_updated_at > newest_updated_at):
+                newest_updated_at = page_newest_updated_at
+
+            # Sent even when empty, the checkpoint has to move past this page
+            page_checkpoint = SyncCheckpoint(
+                run_id=checkpoint.run_id,
+                repo_slug=repo.slug,
+                end_cursor=page.end_cursor,
+                newest_updated_at=newest_updated_at,
+            )
+            fetched_page = _SyncPage(
+                repo_slug=repo.slug,
+                prs=raw_prs,
+                checkpoint=page_checkpoint,
+                fetched_prs=len(page.prs),
+                expected_prs=page.total_count or 0,
+            )
+            stage_times.put("fetch_blocked", pages_queue, fetched_page)
+
+            if reached_too_old_prs:
+                break
+
+    except Exception as exc:
+        logger.warning(f"Syncing repo {repo.slug} failed: {exc}", exc_info=exc)
+        pages_queue.put(_RepoFailed(repo_slug=repo.slug, error=exc))
+        return
+
+    pages_queue.put(_RepoDone(repo_slug=repo.slug, started_at=started_at, newest_updated_at=newest_updated_at))
+
+
+def _clean_pages(
+    pages_queue: queue.Queue[_TWorkItem | None],
+    work_queue: queue.Queue[_TWorkItem],
+    settings: Settings,
+    stage_times: _StageTimes,
+) -> None:
+    """Runs in the cleaner thread: clean fetched pages into batches for the writer, until it gets None.
+
+    Items of a repo reach the writer in the order the fetch worker queued them. A repo whose
+    page could not be cleaned is failed, its later pages are dropped."""
+    failed_repos: set[str] = set()
+    while (item := pages_queue.get()) is not None:
+        if isinstance(item, _SyncPage):
+            if item.repo_slug in failed_repos:
+                continue
+            clean_started = time.perf_counter()
+            try:
+                prs = PRCleaner.clean_batch(item.prs, settings)
+            except Exception as exc:
+                logger.warning(f"Cleaning PRs of repo {item.repo_slug} failed: {exc}", exc_info=exc)
+                failed_repos.add(item.repo_slug)
+                stage_times.put("clean_blocked", work_queue, _RepoFailed(repo_slug=item.repo_slug, error=exc))
+                continue
+            finally:
+                stage_times.add("clean", time.perf_counter() - clean_started)
+
+            stage_times.put("clean_blocked", work_queue, replace(item, prs=prs))
+
+        elif item.repo_slug not in failed_repos:
+            # The writer counts a repo as finished once, the _RepoFailed sent above did that already
+            stage_times.put("clean_blocked", work_queue, item)
+
+
+def _write_until_all_repos_finished(
+    work_queue: queue.Queue[_TWorkItem],
+    num_of_repos: int,
+    result: SyncResult,
+    stage_times: _StageTimes,
+    max_batch_prs: int,
+) -> None:
+    """The single DuckDB writer: consume work items until every repo reported done or failed.
+
+    Batches are committed together while more of them are already waiting, up to `max_batch_prs` PRs.
+    Pending batches are always committed before a repo is finished, so its watermark never moves
+    past PRs that are not stored yet."""
+    num_finished = 0
+    pending: list[_SyncPage] = []
+    pending_prs = 0
+
+    while num_finished < num_of_repos:
+        idle_started = time.perf_counter()
+        item = work_queue.get()
+        stage_times.add("writer_idle", time.perf_counter() - idle_started)
+        metrics.SYNC_QUEUE_DEPTH.set(work_queue.qsize())
+
+        if isinstance(item, _SyncPage):
+            result.prs_fetched += item.fetched_prs
+            result.prs_expected += item.expected_prs
+            if item.repo_slug in result.failed_repos:
+                continue
+            pending.append(item)
+            pending_prs += len(item.prs)
+            if pending_prs < max_batch_prs and not work_queue.empty():
+                continue
+            _store_batches(pending, result, stage_times)
+            pending, pending_prs = [], 0
+            continue
+
+        if pending:
+            _store_batches(pending, result, stage_times)
+            pending, pending_prs = [], 0
+
+        if isinstance(item, _RepoDone):
+            num_finished += 1
+            result.repos_done = num_finished
+            if item.repo_slug in result.failed_repos:
+                # The writer failed, the watermark must not move past the PRs we did not store
+                continue
+            try:
+                duckdb_client.store_repo_watermark(
+                    item.repo_slug,
+                    item.newest_updated_at,
+                    synced_at=item.started_at,
+                    run_id=result.run_id,
+                )
+            except Exception as exc:
+                logger.warning(f"Storing sync watermark of repo {item.repo_slug} failed: {exc}", exc_info=exc)
+                result.failed_repos[item.repo_slug] = f"Storing sync watermark failed: {exc}"
+                continue
+            result.synced_repos.append(item.repo_slug)
+
+        elif isinstance(item, _RepoFailed):
+            num_finished += 1
+            result.repos_done = num_finished
+            result.failed_repos.setdefault(item.repo_slug, str(item.error))
+
+
+def _store_batches(batches: list[_SyncPage], result: SyncResult, stage_times: _StageTimes) -> None:
+    """Commit the PRs and checkpoints of `batches` in one transaction.
+
+    If that fails, every batch is stored on its own, so only the repo with the broken batch fails."""
+    write_started = time.perf_counter()
+    metrics.SYNC_WRITE_BATCH_PAGES.observe(len(batches))
+    try:
+        result.synced_prs += duckdb_client.store_prs(
+            PRBatch.concat(batch.prs for batch in batches),
+            checkpoints=[batch.checkpoint for batch in batches],
+        )
+    except Exception as exc:
+        stage_times.add("write", time.perf_counter() - write_started)
+        if len(batches) == 1:
+            logger.warning(f"Storing PRs of repo {batches[0].repo_slug} failed: {exc}", exc_info=exc)
+            result.failed_repos[batches[0].repo_slug] = f"Storing PRs failed: {exc}"
+            return
+        logger.warning(f"Storing {len(batches)} pages of PRs at once failed, storing them one by one: {exc}")
+        for batch in batches:
+            if batch.repo_slug not in result.failed_repos:
+                _store_batches([batch], result, stage_times)
+        return
+    stage_times.add("write", time.perf_counter() - write_started)
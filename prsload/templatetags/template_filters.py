@@ -71,3 +71,22 @@ def choose_color_for_missing_reviews(value: float) -> str:
     if value >= 31:
         return GREEN2
     return GREEN3
+
+
+def format_minutes(minutes: int) -> str:
+    """120 -> 2h, 1440 -> 1d, 90 -> 1h 30m"""
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = [f"{value}{unit}" for value, unit in ((days, "d"), (hours, "h"), (minutes, "m")) if value]
+    return " ".join(parts) or "0m"
+
+
+def sparkline_points(values: list[int], width: int, height: int) -> str:
+    """Points of an SVG polyline through the values, the highest at the top, 0 at the bottom."""
+    if not values:
+        return ""
+    highest = max(values) or 1
+    step = width / max(len(values) - 1, 1)
+    return " ".join(
+        f"{index * step:.1f},{height - value * height / highest:.1f}" for index, value in enumerate(values)
+    )
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from datetime import UTC
+from datetime import datetime
+from unittest import mock
+
+from prsload import duckdb_client
+from prsload.app import create_app
+from prsload.cache import LRUCache
+from prsload.cache import get_response_cache
+from prsload.settings import get_settings
+
+# Nothing listens there, the home page's GitHub check fails right away
+_CONFIG = """
+github:
+  url: http://127.0.0.1:9/graphql
+cache:
+  max_entries: {max_entries}
+"""
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_resize_drops_least_recently_used(self):
+        lru = LRUCache(max_entries=3)
+        for key in "abc":
+            lru.put(key, key.upper())
+        lru.get("a")
+
+        lru.resize(2)
+
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), "A")
+        self.assertEqual(lru.get("c"), "C")
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+
+        for patcher in (
+            mock.patch.dict(os.environ, {"GH_API_TOKEN": "token", "GH_LOGIN": "org"}),
+            # Look at config.yml on every call, not once a second
+            mock.patch("prsload.settings._CONFIG_CHECK_INTERVAL_SECONDS", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self._write_config(max_entries=10, mtime=1_000_000)
+
+        database = duckdb_client.using_database("cache.duckdb")
+        database.__enter__()
+        self.addCleanup(database.__exit__, None, None, None)
+
+    def _write_config(self, max_entries: int, mtime: int) -> None:
+        with open("config.yml", "w") as f:
+            f.write(_CONFIG.format(max_entries=max_entries))
+        os.utime("config.yml", (mtime, mtime))
+
+    def test_max_entries_change_resizes_the_cache(self):
+        response_cache = get_response_cache()
+        for key in range(10):
+            response_cache.put(key, key)
+
+        self._write_config(max_entries=4, mtime=1_000_100)
+
+        self.assertIs(get_response_cache(), response_cache)
+        self.assertEqual(response_cache.max_entries, 4)
+        self.assertEqual(len(response_cache), 4)
+
+    def test_home_page_is_revalidated_with_its_etag(self):
+        # Applying the policy of the new config.yml would bump the data generation between the requests
+        duckdb_client.ensure_filtering_policy(get_settings())
+        client = create_app().test_client()
+        # Within the same minute, the GitHub check on the page is not repeated
+        clock = mock.patch("prsload.routes.home.datetime", wraps=datetime)
+        clock.start().now.return_value = datetime(2026, 1, 15, 12, 0, 30, tzinfo=UTC)
+        self.addCleanup(clock.stop)
+
+        page = client.get("/")
+        self.assertEqual(page.status_code, 200)
+        self.assertIsNotNone(page.headers.get("ETag"))
+
+        revalidated = client.get("/", headers={"If-None-Match": page.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
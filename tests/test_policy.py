@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from prsload import duckdb_client
+from prsload.duckdb_client import policy
+from prsload.duckdb_client.client import get_reader
+from prsload.settings import get_settings
+
+_CONFIG = """
+users:
+  reviewers_to_ignore: [{reviewer}]
+"""
+
+
+class PolicyChangedWhileApplyingTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+
+        for patcher in (
+            mock.patch.dict(os.environ, {"GH_API_TOKEN": "token", "GH_LOGIN": "org"}),
+            # Look at config.yml on every call, not once a second
+            mock.patch("prsload.settings._CONFIG_CHECK_INTERVAL_SECONDS", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        database = duckdb_client.using_database("policy.duckdb")
+        database.__enter__()
+        self.addCleanup(database.__exit__, None, None, None)
+
+    def _write_config(self, reviewer: str, mtime: int) -> None:
+        with open("config.yml", "w") as f:
+            f.write(_CONFIG.format(reviewer=reviewer))
+        os.utime("config.yml", (mtime, mtime))
+
+    def _stored_fingerprint(self) -> str | None:
+        with get_reader() as conn:
+            return policy._get_stored_fingerprint(conn)
+
+    def test_change_during_apply_is_applied_after_it(self):
+        first_store_started, finish_first_store = threading.Event(), threading.Event()
+        store = policy._store_filtering_policy
+
+        def slow_first_store(settings, fingerprint):
+            if not first_store_started.is_set():
+                first_store_started.set()
+                finish_first_store.wait(timeout=30)
+            return store(settings, fingerprint)
+
+        self._write_config("bot", mtime=1_000_000)
+        with mock.patch.object(policy, "_store_filtering_policy", side_effect=slow_first_store):
+            policy.apply_filtering_policy_in_background(get_settings())
+            applying = policy._applying
+            assert applying is not None
+            self.assertTrue(first_store_started.wait(timeout=30))
+
+            self._write_config("other-bot", mtime=1_000_100)
+            latest_settings = get_settings()
+            # Returns right away, the running thread picks the change up
+            policy.apply_filtering_policy_in_background(latest_settings)
+
+            finish_first_store.set()
+            applying.join(timeout=30)
+
+        self.assertFalse(applying.is_alive())
+        self.assertIsNone(policy._applying)
+        self.assertEqual(self._stored_fingerprint(), policy._policy_fingerprint(latest_settings))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from email.utils import format_datetime
+
+from prsload.github.scheduler import _parse_retry_after
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(_parse_retry_after("30"), 30.0)
+
+    def test_http_date(self):
+        retry_at = datetime.now(tz=UTC) + timedelta(seconds=120)
+        delay = _parse_retry_after(format_datetime(retry_at, usegmt=True))
+        assert delay is not None
+        self.assertAlmostEqual(delay, 120, delta=2)
+
+    def test_http_date_in_the_past(self):
+        self.assertEqual(_parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_unparsable_falls_back_to_backoff(self):
+        with self.assertLogs("prsload.github.scheduler", "WARNING"):
+            self.assertIsNone(_parse_retry_after("soon"))
+        self.assertIsNone(_parse_retry_after(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
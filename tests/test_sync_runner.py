@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from unittest import mock
+
+from prsload import duckdb_client
+from prsload.exceptions import GitHubException
+from prsload.github import PRPage
+from prsload.github.repos import Repo
+from prsload.pr_type import PR
+from prsload.pr_type import PRBatch
+from prsload.settings import get_settings
+from prsload.sync.runner import SyncResult
+from prsload.sync.runner import sync_all_repos
+
+_CONFIG = """
+sync:
+  concurrency: 1
+  repos_per_request: 1
+"""
+
+
+def _page(repo: Repo, numbers: list[int], end_cursor: str, is_last: bool) -> PRPage:
+    now = datetime.now(tz=UTC)
+    prs = PRBatch()
+    for number in numbers:
+        prs.append_pr(
+            PR(
+                number=number,
+                repo_slug=repo.slug,
+                title=f"PR {number}",
+                url=f"https://github.com/{repo.slug}/pull/{number}",
+                author="author",
+                created_at=now - timedelta(days=2),
+                merged_at=None,
+                updated_at=now - timedelta(hours=number),
+            )
+        )
+    return PRPage(prs=prs, end_cursor=end_cursor, is_last=is_last)
+
+
+class FakeGitHub:
+    """Two pages per repo, the `flaky` repo fails after its first page until `flaky_fails` is reset."""
+
+    def __init__(self):
+        self.repos = [Repo(owner="org", name="good", total_prs=4), Repo(owner="org", name="flaky", total_prs=4)]
+        self.flaky_fails = True
+        self.requested_cursors: list[tuple[str, str | None]] = []
+
+    def fetch_all_repos(self):
+        yield from self.repos
+
+    def fetch_pr_pages(self, repo, updated_since=None, after_cursor=None):
+        self.requested_cursors.append((repo.slug, after_cursor))
+        if after_cursor is None:
+            yield _page(repo, [1, 2], end_cursor="page1", is_last=False)
+        if repo.name == "flaky" and self.flaky_fails:
+            raise GitHubException("Response did not contain any data.")
+        yield _page(repo, [3, 4], end_cursor="page2", is_last=True)
+
+
+class FailedRepoCheckpointsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        with open("config.yml", "w") as f:
+            f.write(_CONFIG)
+
+        for patcher in (
+            mock.patch.dict(os.environ, {"GH_API_TOKEN": "token", "GH_LOGIN": "org"}),
+            # Look at config.yml on every call, not once a second
+            mock.patch("prsload.settings._CONFIG_CHECK_INTERVAL_SECONDS", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        database = duckdb_client.using_database("sync.duckdb")
+        database.__enter__()
+        self.addCleanup(database.__exit__, None, None, None)
+
+        self.github = FakeGitHub()
+        for name in ("fetch_all_repos", "fetch_pr_pages"):
+            patcher = mock.patch(f"prsload.sync.runner.github.{name}", getattr(self.github, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _sync(self) -> SyncResult:
+        return sync_all_repos(get_settings(), SyncResult(full_resync=False))
+
+    def test_failed_repo_continues_after_its_last_stored_page(self):
+        first = self._sync()
+        self.assertEqual(first.synced_repos, ["org/good"])
+        self.assertEqual(list(first.failed_repos), ["org/flaky"])
+        self.assertEqual(first.synced_prs, 6)
+
+        self.github.flaky_fails = False
+        self.github.requested_cursors.clear()
+        second = self._sync()
+
+        self.assertEqual(sorted(second.synced_repos), ["org/flaky", "org/good"])
+        self.assertEqual(second.failed_repos, {})
+        # The good repo starts over from its watermark, the flaky one after the page stored before it failed
+        self.assertEqual(sorted(self.github.requested_cursors), [("org/flaky", "page1"), ("org/good", None)])
+        self.assertEqual(duckdb_client.get_sync_checkpoints(second.run_id), {})
+        self.assertIsNotNone(duckdb_client.get_repo_watermarks()["org/flaky"].last_updated_at)
+
+    def test_full_resync_drops_checkpoints_of_failed_repos(self):
+        self._sync()
+
+        self.github.flaky_fails = False
+        self.github.requested_cursors.clear()
+        sync_all_repos(get_settings(), SyncResult(full_resync=True))
+
+        self.assertEqual(sorted(self.github.requested_cursors), [("org/flaky", None), ("org/good", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import UTC
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter, DuckDB picks up the host time zone once per process
+_ROUND_TRIP = """
+import json
+from datetime import UTC, datetime
+
+from prsload import duckdb_client
+
+with duckdb_client.using_database("watermarks.duckdb"):
+    duckdb_client.store_repo_watermark(
+        "org/repo", datetime(2026, 1, 15, 12, 0, tzinfo=UTC), synced_at=datetime(2026, 1, 15, 12, 5, tzinfo=UTC)
+    )
+    watermark = duckdb_client.get_repo_watermarks()["org/repo"]
+    generation = duckdb_client.get_data_generation()
+print(json.dumps({
+    "last_updated_at": watermark.last_updated_at.isoformat(),
+    "synced_at": watermark.synced_at.isoformat(),
+    "changed_at": generation.changed_at.isoformat(),
+}))
+"""
+
+
+class TimestampsInNonUTCTimeZoneTest(unittest.TestCase):
+    def _round_trip(self, time_zone: str) -> dict[str, str]:
+        env = os.environ | {
+            "TZ": time_zone,
+            "GH_API_TOKEN": "token",
+            "GH_LOGIN": "org",
+            "PYTHONPATH": str(REPO_ROOT),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run(
+                [sys.executable, "-c", _ROUND_TRIP],
+                cwd=directory,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_watermarks_come_back_in_utc(self):
+        for time_zone in ("America/New_York", "Europe/Berlin"):
+            with self.subTest(time_zone=time_zone):
+                stored = self._round_trip(time_zone)
+                self.assertEqual(stored["last_updated_at"], "2026-01-15T12:00:00+00:00")
+                self.assertEqual(stored["synced_at"], "2026-01-15T12:05:00+00:00")
+
+    def test_data_generation_changed_at_is_utc(self):
+        started_at = datetime.now(tz=UTC)
+        changed_at = datetime.fromisoformat(self._round_trip("Europe/Berlin")["changed_at"])
+        self.assertLess(abs((changed_at - started_at).total_seconds()), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()